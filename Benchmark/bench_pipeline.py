@@ -0,0 +1,43 @@
+import os
+import sys
+import warnings
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backtest.benchmark import run_case, warmup_jit, bench_history, check_regressions, BENCH_DIR
+
+# Breakout / Trend 流水线的基准测试：合成行情（不需要 Binance 数据和 vbt），按阶段记录耗时和内存
+# 每个规模的数据生成一次放在 data_root 下，之后重复运行直接复用；结果在 bench/<run_id>/profile.json
+# 默认只跑小规模，800 币对 x 8 年要加 --large
+# 运行后打印每个规模各阶段的耗时，并和之前的 run 比较，fail_on_regression = True 时有回归就返回非 0（给 CI 用）
+
+data_root = 'synthetic_data'
+strategies = ['breakout', 'trend']
+sizes = [(50, 1), (200, 4)] # (币对数, 年数)
+large_sizes = [(800, 8)] # 生成数据和跑一遍都要很久，默认不跑
+run_large = '--large' in sys.argv # python bench_pipeline.py --large 时加跑 large_sizes
+seed = 0
+trace_memory = False # True 时额外记录 tracemalloc 峰值，会慢一些
+tolerance = 1.5 # 某个阶段比之前的中位数慢 tolerance 倍以上算回归
+fail_on_regression = False
+
+if __name__ == '__main__':
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    warmup_jit(os.path.join(data_root, 'warmup'))
+    for n_pairs, years in sizes + (large_sizes if run_large else []):
+        for strategy in strategies:
+            print(f"Benchmark {strategy}: {n_pairs} pairs x {years} years")
+            profiler = run_case(strategy, n_pairs, years, os.path.join(data_root, f'{n_pairs}x{years}'), seed=seed,
+                                trace_memory=trace_memory)
+            print(profiler.table().to_string(index=False))
+            print(f"Total: {profiler.wall_total:.2f} s, peak RSS {profiler.peak_rss:.0f} MB")
+
+    history = bench_history()
+    latest = history.groupby(['strategy', 'n_pairs', 'years'])['run_id'].transform('last') == history['run_id']
+    print(history[latest].pivot_table(index=['strategy', 'n_pairs', 'years'], columns='stage', values='wall_s', sort=False)
+          .round(3).to_string())
+    regressions = check_regressions(tolerance=tolerance)
+    if len(regressions):
+        print(f"Regressions against earlier runs in {BENCH_DIR}:")
+        print(regressions.to_string(index=False))
+        if fail_on_regression:
+            sys.exit(1)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import vectorbtpro as vbt
+import os
+import time
+import warnings
+import sys
+from pandas import Timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backtest.store import load_ohlcv_dict, pair_windows
+from backtest.universe import pair_filter, default_rules
+from backtest.align import DailyToHourly
+from backtest.regime import BtcRegime
+from backtest.sweep import param_grid, run_sweep, MAX_WORKERS
+from backtest.strategies import breakout_task, universe_panels, breakout_panels
+from backtest.walkforward import walk_forward_folds, walk_forward, walk_forward_stats
+
+# BreakoutCatcher 参数扫描：数据只加载一次，参数组合在进程池里并行回测，结果汇总到 sweep_breakout.csv
+# mode = 'walkforward' 时按滚动窗口做 walk-forward：样本内选参数，样本外净值拼接到 walkforward_breakout_equity.csv
+# 规则和 BreakoutCatcher_vbt.py 一样，这里只改参数
+
+mode = 'sweep' # 'sweep' 或 'walkforward'
+data_folder = '../ft_userdata/user_data/data/binance/allpairs/1d/'
+data_folder_1h = '../ft_userdata/user_data/data/binance/allpairs/1h/'
+start_date = pd.to_datetime("2017-08-18 00:00:00+00:00")
+end_date = pd.to_datetime("2024-01-19 00:00:00+00:00")
+change_date = pd.to_datetime('2020-09-04 00:00:00+00:00')
+blacklist = ['USDC_USDT', 'BUSD_USDT', 'TUSD_USDT', 'FDUSD_USDT'] # 排除特定币对
+btc_ma_window = 50
+initial_cash = 10000
+fees = 0.001
+
+# universe 参数：x 日累计成交额，前 top_n 个
+universe_grid = param_grid(window=[7, 11, 15], top_n=[24, 32])
+# 回测参数：突破高点窗口、跌破低点窗口、最多持仓数
+strategy_grid = param_grid(high_window=[20*24, 30*24, 40*24], low_window=[14*24, 21*24], max_slots=[8, 10, 12])
+# walk-forward：1 年样本内，之后 3 个月样本外，每次往后滚 3 个月
+train_period = Timedelta(days=365)
+test_period = Timedelta(days=90)
+wf_metric = 'Sharpe Ratio'
+
+if __name__ == '__main__':
+    start_time = time.time()
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    universes = {(u['window'], u['top_n']): pair_filter(data_folder, start_date, end_date, window=u['window'],
+                                                       blacklist=blacklist, rules=default_rules(change_date, top_n=u['top_n']))
+                 for u in universe_grid}
+
+    # 所有 universe 用到的币对一起读，warmup 要覆盖最长的高点窗口
+    all_filtered = pd.concat(universes.values())
+    warmup = Timedelta(days=max(btc_ma_window, max(p['high_window'] for p in strategy_grid) // 24))
+    pair_starts = pair_windows(all_filtered, warmup)
+    ohlcv_dict = load_ohlcv_dict(data_folder_1h, all_filtered['coin_pair'].unique(), start=pair_starts)
+    data = vbt.Data.from_data(ohlcv_dict, silence_warnings=True)
+
+    high = data.get('High')
+    close = data.get('Close')
+    low = data.get('Low')
+    close_1d = close.resample('D').last()
+    to_hourly = DailyToHourly(close.index, close_1d.index)
+    btc_regime = BtcRegime(close_1d['BTC_USDT'], to_hourly)
+
+    panels = {
+        'close': close.to_numpy(dtype=float),
+        'high': high.to_numpy(dtype=float),
+        'low': low.to_numpy(dtype=float),
+        'bull': btc_regime.bull(btc_ma_window).to_numpy(dtype=bool),
+        'bear': btc_regime.bear(btc_ma_window).to_numpy(dtype=bool),
+        'tradable': np.asarray(close.columns != 'BTC_USDT'),
+        'timestamps': close.index.as_unit('ns').asi8,
+    }
+    panels.update(universe_panels(universes, close.index, close.columns))
+    # 每个窗口的突破/跌破信号只算一次，所有组合（和 walk-forward 的所有 fold）共用
+    panels.update(breakout_panels(panels['high'], panels['low'], [p['high_window'] for p in strategy_grid],
+                                  [p['low_window'] for p in strategy_grid]))
+
+    grid = [{**u, **p, 'fees': fees} for u in universe_grid for p in strategy_grid]
+    if mode == 'walkforward':
+        folds = walk_forward_folds(close.index, train_period, test_period, start=start_date)
+        print(f"Running {len(grid)} combinations x {len(folds)} folds on {MAX_WORKERS} workers")
+        in_sample, summary, equity = walk_forward(breakout_task, grid, panels, folds, close.index, metric=wf_metric,
+                                                  init_cash=initial_cash)
+        print(summary.to_string(index=False))
+        print(walk_forward_stats(equity, initial_cash))
+        in_sample.to_csv('walkforward_breakout_in_sample.csv', index=False)
+        summary.to_csv('walkforward_breakout.csv', index=False)
+        equity.rename('Value').to_csv('walkforward_breakout_equity.csv')
+    else:
+        grid = [{**params, 'init_cash': initial_cash} for params in grid]
+        print(f"Running {len(grid)} combinations on {MAX_WORKERS} workers")
+        results = run_sweep(breakout_task, grid, panels)
+        results = results.drop(columns=['init_cash', 'fees']).sort_values('Total Return [%]', ascending=False)
+        print(results.head(20).to_string(index=False))
+        results.to_csv('sweep_breakout.csv', index=False)
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+    print(f"Execution time: {execution_time} seconds")
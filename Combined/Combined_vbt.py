@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+import vectorbtpro as vbt
+import os
+from pandas import Timedelta
+import warnings
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backtest.store import load_ohlcv_dict, load_daily_bars, pair_windows
+from backtest.universe import pair_filter, default_rules, rank_index
+from backtest.ledger import ledger_frame
+from backtest.indicators import rolling_max, rolling_min
+from backtest.align import DailyToHourly
+from backtest.regime import BtcRegime
+from backtest.stats import pnl_attribution
+from backtest.engine import simulate_combined_nb
+from backtest.journal import Journal, JOURNAL_CAPACITY, journal_frame
+from backtest.artifacts import RunArtifacts
+from backtest.report import write_report
+from backtest.profiling import Profiler
+
+# BreakoutCatcher + TrendCatcher 共用一个账户：一次 bar 循环、同一份资金，和实盘一样
+# 两个策略的信号、universe 和仓位规则和各自的 _vbt.py 一致，weight 是每个策略按账户价值的多少比例计算仓位
+# 输出组合的 pf.stats()，资金台账、每个策略的累计盈亏归因写到 runs/ 下的 parquet
+
+profiler = Profiler('combined')
+warnings.filterwarnings('ignore', category=FutureWarning)
+change_date = pd.to_datetime('2020-09-04 00:00:00+00:00')
+
+data_folder = '../ft_userdata/user_data/data/binance/allpairs/1d/'
+data_folder_1h = '../ft_userdata/user_data/data/binance/allpairs/1h/'
+start_date = pd.to_datetime("2017-08-18 00:00:00+00:00")
+end_date = pd.to_datetime("2024-01-19 00:00:00+00:00")
+warmup = Timedelta(days=50) # BTC MA50 的预热期最长，同时覆盖两个策略的其他指标窗口（ATR 用完整历史单独算）
+breakout_blacklist = ['USDC_USDT', 'BUSD_USDT', 'TUSD_USDT', 'FDUSD_USDT']
+trend_blacklist = ['USDC_USDT', 'BUSD_USDT', 'TUSD_USDT', 'FDUSD_USDT', 'ERD_USDT']
+btc_ma_window = 50
+atr_window = 14
+
+initial_cash = 10000
+fees = 0.001
+breakout_weight = 0.5
+trend_weight = 0.5
+verbose = False # True 时记录两个策略每笔成交和出场原因，写到 run 的 events artifact
+export_csv = False # True 时另外导出 events 的 csv；分析用 runs/ 下的 parquet
+qs_report = False # True 时另外生成 quantstats 的完整 html 报告（很慢），默认只写精简报告
+run = RunArtifacts('combined', {'start_date': start_date, 'end_date': end_date, 'breakout_weight': breakout_weight,
+                                'trend_weight': trend_weight, 'initial_cash': initial_cash, 'fees': fees})
+
+profiler.stage('universe')
+breakout_filtered = pair_filter(data_folder, start_date, end_date, window=11, blacklist=breakout_blacklist, rules=default_rules(change_date))
+trend_filtered = pair_filter(data_folder, start_date, end_date, window=3, blacklist=trend_blacklist, rules=default_rules(change_date))
+
+profiler.stage('load_ohlcv')
+# 两个 universe 用到的币对一起读，所有面板对齐到同一组 (小时, 币对)
+all_filtered = pd.concat([breakout_filtered, trend_filtered])
+pair_starts = pair_windows(all_filtered, warmup)
+ohlcv_dict = load_ohlcv_dict(data_folder_1h, all_filtered['coin_pair'].unique(), start=pair_starts)
+data = vbt.Data.from_data(ohlcv_dict, silence_warnings=True)
+
+profiler.stage('indicators')
+high = data.get('High')
+close = data.get('Close')
+low = data.get('Low')
+close_1d = close.resample('D').last()
+# ATR 是递归平滑的，用每个币对完整历史的日线算，不受 warmup 截断
+high_1d, low_1d, atr_close_1d = load_daily_bars(data_folder_1h, close.columns)
+to_hourly = DailyToHourly(close.index, close_1d.index)
+btc_regime = BtcRegime(close_1d['BTC_USDT'], to_hourly)
+bull = btc_regime.bull(btc_ma_window).to_numpy(dtype=bool)
+bear = btc_regime.bear(btc_ma_window).to_numpy(dtype=bool)
+
+profiler.stage('signals')
+# Breakout：突破 30 日高点且 BTC > MA50 入场，BTC 本身不做；跌破 21 日低点、BTC < MA50 或第三天出场
+breakout = (high >= rolling_max(high, 30*24)).to_numpy(dtype=bool)
+breakout_mask = breakout & bull[:, None]
+breakout_mask[:, close.columns.get_loc('BTC_USDT')] = False
+breakdown = (low <= rolling_min(low, 21*24)).to_numpy(dtype=bool)
+
+# Trend：收盘价上穿 MA20 且 BTC > MA50 入场，下穿 MA20 或 BTC < MA50 出场，ATR 定仓位
+ma20 = vbt.MA.run(close_1d, 20)
+trend_entry = ma20.ma_crossed_below(close_1d)
+trend_entry.columns = trend_entry.columns.droplevel('ma_window')
+trend_exit = ma20.ma_crossed_above(close_1d)
+trend_exit.columns = trend_exit.columns.droplevel('ma_window')
+trend_mask = to_hourly(trend_entry).to_numpy(dtype=bool) & bull[:, None]
+trend_exit_mask = to_hourly(trend_exit).to_numpy(dtype=bool) | bear[:, None]
+atr_1d = vbt.ATR.run(high_1d, low_1d, atr_close_1d, window=atr_window).atr
+atr = DailyToHourly(close.index, atr_1d.index, offset='0h')(atr_1d, fill_value=np.nan)
+
+profiler.stage('simulation')
+profiler.meta.update(bars=close.shape[0], pairs=close.shape[1])
+breakout_ptr, breakout_codes, bar_day = rank_index(breakout_filtered, close.index, close.columns)
+trend_ptr, trend_codes, _ = rank_index(trend_filtered, close.index, close.columns)
+breakout_journal = Journal(JOURNAL_CAPACITY) if verbose else None
+trend_journal = Journal(JOURNAL_CAPACITY) if verbose else None
+breakout_size, trend_size, capital_arr = simulate_combined_nb(
+    close.to_numpy(dtype=float),
+    close.index.as_unit('ns').asi8,
+    bar_day,
+    breakdown,
+    bear,
+    breakout_mask,
+    breakout_ptr,
+    breakout_codes,
+    atr[atr_window].reindex(columns=close.columns).to_numpy(dtype=float),
+    trend_exit_mask,
+    trend_mask,
+    trend_ptr,
+    trend_codes,
+    breakout_slots=10,
+    hold_days=2,
+    breakout_weight=breakout_weight,
+    trend_slots=10,
+    position_count=3,
+    add_atr=0.25,
+    risk_factor=0.01,
+    stop_loss=0.5,
+    trend_weight=trend_weight,
+    init_cash=float(initial_cash),
+    fees=fees,
+    breakout_journal=breakout_journal,
+    trend_journal=trend_journal,
+)
+size = pd.DataFrame(breakout_size + trend_size, index=close.index, columns=close.columns)
+capital_df = ledger_frame(capital_arr, close.index)
+run.write('capital', capital_df)
+if verbose:
+    events = pd.concat([journal_frame(breakout_journal, close.index, close.columns, book='Breakout'),
+                        journal_frame(trend_journal, close.index, close.columns, book='Trend')])
+    events = events.sort_values('date', kind='stable').reset_index(drop=True)
+    run.write('events', events)
+    if export_csv:
+        events.to_csv('events_combined.csv', index=False)
+
+profiler.stage('attribution')
+attribution = pnl_attribution({'Breakout': breakout_size, 'Trend': trend_size}, close.to_numpy(dtype=float),
+                              initial_cash, fees, index=close.index)
+run.write('attribution', attribution)
+print(attribution.iloc[-1])
+
+profiler.stage('portfolio')
+pf = vbt.Portfolio.from_orders(
+    close=close,
+    price=close,
+    size=size,
+    size_type='amount',
+    cash_sharing=True,
+    init_cash=initial_cash,
+    direction='longonly',
+    fees=fees,
+    freq='1h'
+)
+
+print(pf.stats())
+
+profiler.stage('report')
+daily_returns = pf.daily_returns
+btc_returns = close['BTC_USDT'].pct_change(fill_method=None)
+btc_returns.fillna(0, inplace=True)
+btc_returns.name = 'btc'
+daily_returns.index = daily_returns.index.tz_localize(None)
+btc_returns.index = btc_returns.index.tz_localize(None)
+
+write_report(daily_returns, btc_returns, 'report_combined.html', title='Combined')
+if qs_report:
+    import quantstats as qs
+    qs.reports.html(daily_returns, benchmark=btc_returns, output='report_combined_qs.html')
+
+profiler.finish()
+print(profiler.table().to_string(index=False))
+profiler.write(run.path)
+print(f"Execution time: {profiler.wall_total} seconds")
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+import vectorbtpro as vbt
+import os
+from pandas import Timedelta
+import warnings
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backtest.store import load_ohlcv_dict, load_daily_bars, pair_windows
+from backtest.universe import pair_filter, default_rules, rank_index
+from backtest.ledger import ledger_frame
+from backtest.align import DailyToHourly
+from backtest.regime import BtcRegime
+from backtest.stats import pnl_attribution, portfolio_stats
+from backtest.engine import simulate_long_short_nb
+from backtest.journal import Journal, JOURNAL_CAPACITY, journal_frame
+from backtest.artifacts import RunArtifacts
+from backtest.report import write_report
+from backtest.profiling import Profiler
+
+# TrendCatcher 多头 + TrendCatcherShort 空头一次跑完：数据只读一次，MA20 穿越、ATR、BTC MA50 只算一次，两个方向各取所需
+# 两边的规则、universe 和仓位参数和 TrendCatcher_vbt.py / TrendCatcherShort_vbt.py 一致
+# shared_capital = False：两个账户各 initial_cash，多头和单独跑 TrendCatcher_vbt.py 一样；True：共用一个账户，看对冲后的组合
+# 空头账户按真实空头记账（开空收现金、未平空头按市值计负债），台账和下面 direction=-1 的统计是同一套口径，
+# 所以和 TrendCatcherShort_vbt.py 按买入方式记账的资金曲线、仓位不一样
+# 输出每边和组合的统计，资金台账、每边的累计盈亏归因写到 runs/ 下的 parquet
+
+profiler = Profiler('long_short')
+warnings.filterwarnings('ignore', category=FutureWarning)
+change_date = pd.to_datetime('2020-09-04 00:00:00+00:00')
+
+data_folder = '../ft_userdata/user_data/data/binance/allpairs/1d/'
+data_folder_1h = '../ft_userdata/user_data/data/binance/allpairs/1h/'
+start_date = pd.to_datetime("2017-08-18 00:00:00+00:00")
+end_date = pd.to_datetime("2024-01-19 00:00:00+00:00")
+warmup = Timedelta(days=50) # BTC MA50 的预热期最长，同时覆盖 MA20（ATR 用完整历史单独算）
+long_blacklist = ['USDC_USDT', 'BUSD_USDT', 'TUSD_USDT', 'FDUSD_USDT', 'ERD_USDT']
+short_blacklist = ['USDC_USDT', 'BUSD_USDT', 'TUSD_USDT', 'FDUSD_USDT']
+btc_ma_window = 50
+atr_window = 14
+
+shared_capital = False
+initial_cash = 10000
+fees = 0.001
+long_weight = 0.5 if shared_capital else 1.0
+short_weight = 0.5 if shared_capital else 1.0
+verbose = False # True 时记录两边每笔成交和出场原因，写到 run 的 events artifact
+export_csv = False # True 时另外导出 events 的 csv；分析用 runs/ 下的 parquet
+qs_report = False # True 时另外生成 quantstats 的完整 html 报告（很慢），默认只写精简报告
+run = RunArtifacts('long_short', {'start_date': start_date, 'end_date': end_date, 'shared_capital': shared_capital,
+                                  'long_weight': long_weight, 'short_weight': short_weight, 'initial_cash': initial_cash, 'fees': fees})
+
+profiler.stage('universe')
+long_filtered = pair_filter(data_folder, start_date, end_date, window=3, blacklist=long_blacklist, rules=default_rules(change_date))
+short_filtered = pair_filter(data_folder, start_date, end_date, window=3, blacklist=short_blacklist, rules=default_rules(change_date))
+
+profiler.stage('load_ohlcv')
+# 两个 universe 用到的币对一起读，所有面板对齐到同一组 (小时, 币对)
+all_filtered = pd.concat([long_filtered, short_filtered])
+pair_starts = pair_windows(all_filtered, warmup)
+ohlcv_dict = load_ohlcv_dict(data_folder_1h, all_filtered['coin_pair'].unique(), start=pair_starts)
+data = vbt.Data.from_data(ohlcv_dict, silence_warnings=True)
+
+profiler.stage('indicators')
+high = data.get('High')
+close = data.get('Close')
+low = data.get('Low')
+close_1d = close.resample('D').last()
+# ATR 是递归平滑的，用每个币对完整历史的日线算，不受 warmup 截断
+high_1d, low_1d, atr_close_1d = load_daily_bars(data_folder_1h, close.columns)
+to_hourly = DailyToHourly(close.index, close_1d.index)
+btc_regime = BtcRegime(close_1d['BTC_USDT'], to_hourly)
+bull = btc_regime.bull(btc_ma_window).to_numpy(dtype=bool)
+bear = btc_regime.bear(btc_ma_window).to_numpy(dtype=bool)
+
+profiler.stage('signals')
+# MA20 的两个穿越方向只算一次：多头的入场就是空头的出场，反之亦然
+ma20 = vbt.MA.run(close_1d, 20)
+crossed_below = ma20.ma_crossed_below(close_1d)
+crossed_below.columns = crossed_below.columns.droplevel('ma_window')
+crossed_above = ma20.ma_crossed_above(close_1d)
+crossed_above.columns = crossed_above.columns.droplevel('ma_window')
+crossed_below = to_hourly(crossed_below).to_numpy(dtype=bool)
+crossed_above = to_hourly(crossed_above).to_numpy(dtype=bool)
+
+# 多头：收盘价上穿 MA20 且 BTC > MA50 入场，下穿 MA20 或 BTC < MA50 出场
+long_mask = crossed_below & bull[:, None]
+long_exit = crossed_above | bear[:, None]
+# 空头：收盘价下穿 MA20 且 BTC < MA50 入场，BTC 本身不做空；上穿 MA20 或 BTC > MA50 出场
+short_mask = crossed_above & bear[:, None]
+short_mask[:, close.columns.get_loc('BTC_USDT')] = False
+short_exit = crossed_below | bull[:, None]
+
+atr_1d = vbt.ATR.run(high_1d, low_1d, atr_close_1d, window=atr_window).atr
+atr = DailyToHourly(close.index, atr_1d.index, offset='0h')(atr_1d, fill_value=np.nan)
+
+profiler.stage('simulation')
+profiler.meta.update(bars=close.shape[0], pairs=close.shape[1])
+long_ptr, long_codes, bar_day = rank_index(long_filtered, close.index, close.columns)
+short_ptr, short_codes, _ = rank_index(short_filtered, close.index, close.columns)
+close_arr = close.to_numpy(dtype=float)
+long_journal = Journal(JOURNAL_CAPACITY) if verbose else None
+short_journal = Journal(JOURNAL_CAPACITY) if verbose else None
+long_size, short_size, long_capital, short_capital = simulate_long_short_nb(
+    close_arr,
+    atr[atr_window].reindex(columns=close.columns).to_numpy(dtype=float),
+    bar_day,
+    long_exit,
+    long_mask,
+    long_ptr,
+    long_codes,
+    short_exit,
+    short_mask,
+    short_ptr,
+    short_codes,
+    long_slots=10,
+    long_risk=0.01,
+    long_stop=0.5,
+    long_weight=long_weight,
+    short_slots=20,
+    short_risk=0.005,
+    short_stop=0.0, # 空头暂不止损
+    short_weight=short_weight,
+    position_count=3,
+    add_atr=0.25,
+    shared_capital=shared_capital,
+    init_cash=float(initial_cash),
+    fees=fees,
+    long_journal=long_journal,
+    short_journal=short_journal,
+)
+if shared_capital:
+    run.write('capital', ledger_frame(long_capital, close.index))
+else:
+    run.write('capital_long', ledger_frame(long_capital, close.index))
+    run.write('capital_short', ledger_frame(short_capital, close.index))
+
+if verbose:
+    events = pd.concat([journal_frame(long_journal, close.index, close.columns, book='Long'),
+                        journal_frame(short_journal, close.index, close.columns, book='Short')])
+    events = events.sort_values('date', kind='stable').reset_index(drop=True)
+    run.write('events', events)
+    if export_csv:
+        events.to_csv('events_long_short.csv', index=False)
+
+profiler.stage('attribution')
+# 分开记账时组合 = 两个账户相加，初始资金也是两份
+book_cash = initial_cash if shared_capital else 2 * initial_cash
+attribution = pnl_attribution({'Long': long_size, 'Short': short_size}, close_arr, book_cash, fees,
+                              index=close.index, directions={'Short': -1})
+run.write('attribution', attribution)
+print(attribution.iloc[-1])
+
+books = {
+    'Long': portfolio_stats(long_size, close_arr, initial_cash, fees, direction=1),
+    'Short': portfolio_stats(short_size, close_arr, initial_cash, fees, direction=-1),
+}
+print(pd.DataFrame(books))
+
+profiler.stage('portfolio')
+# 对冲后的组合：同一个币的多空仓位在 vbt 里按净头寸记
+pf = vbt.Portfolio.from_orders(
+    close=close,
+    price=close,
+    size=pd.DataFrame(long_size - short_size, index=close.index, columns=close.columns),
+    size_type='amount',
+    cash_sharing=True,
+    init_cash=book_cash,
+    direction='both',
+    fees=fees,
+    freq='1h'
+)
+
+print(pf.stats())
+
+profiler.stage('report')
+daily_returns = pf.daily_returns
+btc_returns = close['BTC_USDT'].pct_change(fill_method=None)
+btc_returns.fillna(0, inplace=True)
+btc_returns.name = 'btc'
+daily_returns.index = daily_returns.index.tz_localize(None)
+btc_returns.index = btc_returns.index.tz_localize(None)
+
+write_report(daily_returns, btc_returns, 'report_long_short.html', title='TrendCatcher Long/Short')
+if qs_report:
+    import quantstats as qs
+    qs.reports.html(daily_returns, benchmark=btc_returns, output='report_long_short_qs.html')
+
+profiler.finish()
+print(profiler.table().to_string(index=False))
+profiler.write(run.path)
+print(f"Execution time: {profiler.wall_total} seconds")
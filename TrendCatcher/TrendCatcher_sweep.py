@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import vectorbtpro as vbt
+import os
+import time
+import warnings
+import sys
+from pandas import Timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backtest.store import load_ohlcv_dict, load_daily_bars, pair_windows
+from backtest.universe import pair_filter, default_rules
+from backtest.align import DailyToHourly
+from backtest.regime import BtcRegime
+from backtest.sweep import param_grid, run_sweep, MAX_WORKERS
+from backtest.strategies import trend_task, universe_panels
+from backtest.walkforward import walk_forward_folds, walk_forward, walk_forward_stats
+
+# TrendCatcher 参数扫描：数据只加载一次，参数组合在进程池里并行回测，结果汇总到 sweep_trend.csv / sweep_trend_short.csv
+# mode = 'walkforward' 时按滚动窗口做 walk-forward：样本内选参数，样本外净值拼接后输出
+# direction = 1 对应 TrendCatcher_vbt.py，direction = -1 对应 TrendCatcherShort_vbt.py，规则一样，这里只改参数
+
+mode = 'sweep' # 'sweep' 或 'walkforward'
+direction = 1
+data_folder = '../ft_userdata/user_data/data/binance/allpairs/1d/'
+data_folder_1h = '../ft_userdata/user_data/data/binance/allpairs/1h/'
+start_date = pd.to_datetime("2017-08-18 00:00:00+00:00")
+end_date = pd.to_datetime("2024-01-19 00:00:00+00:00")
+change_date = pd.to_datetime('2020-09-04 00:00:00+00:00')
+warmup = Timedelta(days=50) # BTC MA50 的预热期最长，同时覆盖 MA20（ATR 用完整历史单独算）
+blacklist = ['USDC_USDT', 'BUSD_USDT', 'TUSD_USDT', 'FDUSD_USDT'] + (['ERD_USDT'] if direction == 1 else [])
+btc_ma_window = 50
+initial_cash = 10000
+fees = 0.001
+
+# universe 参数：x 日累计成交额，前 top_n 个
+universe_grid = param_grid(window=[3, 5, 7], top_n=[24, 32])
+# 回测参数：每多少 ATR 加仓、单笔风险、最多持仓数
+if direction == 1:
+    strategy_grid = param_grid(add_atr=[0.25, 0.5, 1.0], risk_factor=[0.005, 0.01, 0.02], max_slots=[10, 15],
+                               stop_loss=[0.5])
+else:
+    strategy_grid = param_grid(add_atr=[0.25, 0.5, 1.0], risk_factor=[0.0025, 0.005, 0.01], max_slots=[20],
+                               stop_loss=[0.0])
+# walk-forward：1 年样本内，之后 3 个月样本外，每次往后滚 3 个月
+train_period = Timedelta(days=365)
+test_period = Timedelta(days=90)
+wf_metric = 'Sharpe Ratio'
+
+if __name__ == '__main__':
+    start_time = time.time()
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    universes = {(u['window'], u['top_n']): pair_filter(data_folder, start_date, end_date, window=u['window'],
+                                                       blacklist=blacklist, rules=default_rules(change_date, top_n=u['top_n']))
+                 for u in universe_grid}
+
+    # 所有 universe 用到的币对一起读
+    all_filtered = pd.concat(universes.values())
+    pair_starts = pair_windows(all_filtered, warmup)
+    ohlcv_dict = load_ohlcv_dict(data_folder_1h, all_filtered['coin_pair'].unique(), start=pair_starts)
+    data = vbt.Data.from_data(ohlcv_dict, silence_warnings=True)
+
+    high = data.get('High')
+    close = data.get('Close')
+    low = data.get('Low')
+    close_1d = close.resample('D').last()
+    # ATR 是递归平滑的，用每个币对完整历史的日线算，不受 warmup 截断
+    high_1d, low_1d, atr_close_1d = load_daily_bars(data_folder_1h, close.columns)
+    to_hourly = DailyToHourly(close.index, close_1d.index)
+    btc_regime = BtcRegime(close_1d['BTC_USDT'], to_hourly)
+
+    # 和参数无关的信号：MA20 穿越 + BTC 过滤，做空时方向反过来，BTC 本身不做空
+    ma20 = vbt.MA.run(close_1d, 20)
+    if direction == 1:
+        trend_entry, trend_exit = ma20.ma_crossed_below(close_1d), ma20.ma_crossed_above(close_1d)
+        entry_filter, exit_filter = btc_regime.bull(btc_ma_window), btc_regime.bear(btc_ma_window)
+    else:
+        trend_entry, trend_exit = ma20.ma_crossed_above(close_1d), ma20.ma_crossed_below(close_1d)
+        entry_filter, exit_filter = btc_regime.bear(btc_ma_window), btc_regime.bull(btc_ma_window)
+    trend_entry.columns = trend_entry.columns.droplevel('ma_window')
+    trend_exit.columns = trend_exit.columns.droplevel('ma_window')
+    entry = to_hourly(trend_entry).to_numpy(dtype=bool) & entry_filter.to_numpy(dtype=bool)[:, None]
+    if direction == -1:
+        entry[:, close.columns.get_loc('BTC_USDT')] = False
+    exit_mask = to_hourly(trend_exit).to_numpy(dtype=bool) | exit_filter.to_numpy(dtype=bool)[:, None]
+
+    atr_1d = vbt.ATR.run(high_1d, low_1d, atr_close_1d, window=14).atr
+    atr = DailyToHourly(close.index, atr_1d.index, offset='0h')(atr_1d, fill_value=np.nan)
+
+    panels = {
+        'close': close.to_numpy(dtype=float),
+        'atr': atr[14].reindex(columns=close.columns).to_numpy(dtype=float),
+        'entry': entry,
+        'exit': exit_mask,
+    }
+    panels.update(universe_panels(universes, close.index, close.columns))
+
+    grid = [{**u, **p, 'direction': direction, 'fees': fees} for u in universe_grid for p in strategy_grid]
+    name = 'trend' if direction == 1 else 'trend_short'
+    if mode == 'walkforward':
+        folds = walk_forward_folds(close.index, train_period, test_period, start=start_date)
+        print(f"Running {len(grid)} combinations x {len(folds)} folds on {MAX_WORKERS} workers")
+        in_sample, summary, equity = walk_forward(trend_task, grid, panels, folds, close.index, metric=wf_metric,
+                                                  init_cash=initial_cash)
+        print(summary.to_string(index=False))
+        print(walk_forward_stats(equity, initial_cash))
+        in_sample.to_csv(f'walkforward_{name}_in_sample.csv', index=False)
+        summary.to_csv(f'walkforward_{name}.csv', index=False)
+        equity.rename('Value').to_csv(f'walkforward_{name}_equity.csv')
+    else:
+        grid = [{**params, 'init_cash': initial_cash} for params in grid]
+        print(f"Running {len(grid)} combinations on {MAX_WORKERS} workers")
+        results = run_sweep(trend_task, grid, panels)
+        results = results.drop(columns=['direction', 'init_cash', 'fees']).sort_values('Total Return [%]', ascending=False)
+        print(results.head(20).to_string(index=False))
+        results.to_csv(f'sweep_{name}.csv', index=False)
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+    print(f"Execution time: {execution_time} seconds")
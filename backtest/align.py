@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from backtest.store import load_ohlcv_dict, pair_windows
+
+# 日线信号对齐到 1h：小时 → 日线行号的映射只算一次，之后任何日线矩阵都用整数索引 gather 过去
+# 等价于原来的 daily.shift(1, freq=offset).reindex(hourly_index, method='ffill').fillna(fill_value)
+
+class DailyToHourly:
+    def __init__(self, hourly_index, daily_index, offset='23h'):
+        '''
+        offset: 日线 bar 在多久之后才能用。vbt 在 bar 的 close 成交，日线 00:00 的 bar 要到 23:00 那根小时线才收盘，
+        所以默认 23h，避免 lookahead；offset='0h' 表示当天 00:00 起就用当天的值
+        '''
+        self.hourly_index = hourly_index
+        self.daily_index = daily_index
+        available_at = (daily_index + pd.Timedelta(offset)).as_unit('ns').asi8
+        self.positions = np.searchsorted(available_at, hourly_index.as_unit('ns').asi8, side='right') - 1
+        self.missing = self.positions < 0
+
+    def __call__(self, daily, fill_value=False):
+        values = np.asarray(daily)
+        if not daily.index.equals(self.daily_index):
+            values = np.asarray(daily.reindex(self.daily_index))
+        out = values[np.maximum(self.positions, 0)]
+        if self.missing.any():
+            if pd.isna(fill_value) and out.dtype.kind in 'biu':
+                out = out.astype(float)
+            out[self.missing] = fill_value
+        if isinstance(daily, pd.DataFrame):
+            return pd.DataFrame(out, index=self.hourly_index, columns=daily.columns)
+        return pd.Series(out, index=self.hourly_index, name=daily.name)
+
+def load_panels(data_folder_1h, df_filtered, warmup, fields=('high', 'low', 'close')):
+    '''和 vbt.Data.from_data(...).get(...) 一样：所有币对对齐到小时的并集'''
+    ohlcv_dict = load_ohlcv_dict(data_folder_1h, df_filtered['coin_pair'].unique(), start=pair_windows(df_filtered, warmup))
+    return [pd.concat({pair: frame[field] for pair, frame in ohlcv_dict.items()}, axis=1).sort_index() for field in fields]
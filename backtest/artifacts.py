@@ -0,0 +1,84 @@
+import os
+import json
+import pandas as pd
+from backtest.universe import cache_key
+
+# 回测输出（订单、交易、资金台账、universe、事件日志…）按 run 保存成带类型、压缩的 parquet：
+# runs/<run_id>/<name>.parquet，run_id = 策略名_时间_参数 key，manifest.json 记录参数和每个文件的行数、列类型
+# 之后分析直接 load_artifact 读回 DataFrame，不用再解析 "12.34%" 这样的字符串；给人看的 csv 是可选导出
+
+ARTIFACT_DIR = 'runs'
+MANIFEST_FILE = 'manifest.json'
+COMPRESSION = 'zstd'
+
+def new_run_id(strategy, params):
+    return f"{strategy}_{pd.Timestamp.now(tz='UTC'):%Y%m%d_%H%M%S}_{cache_key(params)[:8]}"
+
+class RunArtifacts:
+    '''一次回测的所有输出文件，每写一个就更新 manifest，中途出错也能看到已经写了哪些'''
+    def __init__(self, strategy, params, folder=ARTIFACT_DIR, run_id=None):
+        self.run_id = run_id or new_run_id(strategy, params)
+        self.path = os.path.join(folder, self.run_id)
+        os.makedirs(self.path, exist_ok=True)
+        self.manifest = {
+            'run_id': self.run_id,
+            'strategy': strategy,
+            'params': params,
+            'created': pd.Timestamp.now(tz='UTC').isoformat(),
+            'artifacts': {},
+        }
+        self.save_manifest()
+
+    def write(self, name, frame):
+        '''frame 是 DataFrame 或 Series，index 一起保存（时间索引读回来还是 DatetimeIndex）'''
+        if isinstance(frame, pd.Series):
+            frame = frame.to_frame()
+        file = f'{name}.parquet'
+        frame.to_parquet(os.path.join(self.path, file), compression=COMPRESSION)
+        self.manifest['artifacts'][name] = {
+            'file': file,
+            'rows': len(frame),
+            'columns': {str(col): str(dtype) for col, dtype in frame.dtypes.items()},
+        }
+        self.save_manifest()
+        return os.path.join(self.path, file)
+
+    def save_manifest(self):
+        tmp_path = os.path.join(self.path, MANIFEST_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_FILE))
+
+def read_manifest(run_path):
+    with open(os.path.join(run_path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+def list_runs(folder=ARTIFACT_DIR, strategy=None):
+    '''所有 run 的 manifest 概要，按创建时间排序'''
+    runs = []
+    if os.path.isdir(folder):
+        for run_id in os.listdir(folder):
+            if not os.path.exists(os.path.join(folder, run_id, MANIFEST_FILE)):
+                continue
+            manifest = read_manifest(os.path.join(folder, run_id))
+            if strategy is None or manifest['strategy'] == strategy:
+                runs.append({'run_id': manifest['run_id'], 'strategy': manifest['strategy'], 'created': manifest['created'],
+                             'artifacts': sorted(manifest['artifacts'])})
+    runs = pd.DataFrame(runs, columns=['run_id', 'strategy', 'created', 'artifacts'])
+    return runs.sort_values('created', kind='stable').reset_index(drop=True)
+
+def load_artifact(name, run_id=None, strategy=None, folder=ARTIFACT_DIR):
+    '''
+    读回一个 artifact；run_id 不给时取 strategy（或所有策略）最新的一次 run
+    例如 load_artifact('trades', strategy='trend')；给 Monte Carlo 用的交易列表是 montecarlo.trades_from_run
+    '''
+    if run_id is None:
+        runs = list_runs(folder, strategy)
+        runs = runs[runs['artifacts'].apply(lambda names: name in names)]
+        if runs.empty:
+            raise FileNotFoundError(f"No run with artifact {name} in {folder}")
+        run_id = runs['run_id'].iloc[-1]
+    manifest = read_manifest(os.path.join(folder, run_id))
+    if name not in manifest['artifacts']:
+        raise KeyError(f"Run {run_id} has no artifact {name}")
+    return pd.read_parquet(os.path.join(folder, run_id, manifest['artifacts'][name]['file']))
@@ -0,0 +1,169 @@
+import os
+import numpy as np
+import pandas as pd
+from backtest.store import build_store, load_daily_bars
+from backtest.universe import pair_filter, default_rules, membership_matrix, rank_index
+from backtest.align import DailyToHourly, load_panels
+from backtest.regime import BtcRegime
+from backtest.indicators import rolling_max, rolling_min, crossed_above, average_true_range
+from backtest.engine import simulate_breakout_nb, simulate_trend_nb
+from backtest.stats import portfolio_value, portfolio_stats
+from backtest.report import render_report
+from backtest.tradelog import trade_table
+from backtest.montecarlo import monte_carlo_summary
+from backtest.synthetic import write_synthetic_market
+from backtest.profiling import Profiler, profile_history, read_profile
+from backtest.artifacts import RunArtifacts
+
+# Breakout / Trend 整条流水线的基准测试：在合成行情上按阶段计时（build_store、universe、读 OHLCV、指标、信号、模拟、
+# 组合净值、报告、tradelog、Monte Carlo），不需要 vbt 和真实数据，CI 机器上离线就能跑
+# vbt 的部分用等价的 numpy/pandas 代替：vbt.Data 对齐 → pd.concat，MA/ATR → rolling/ewm，Portfolio.from_orders → stats.portfolio_value
+# 每个 (策略, 币对数, 年数) 是一个 run，profile.json 写到 bench/<run_id>/，check_regressions 和之前的 run 比较
+
+BENCH_DIR = 'bench'
+BTC_MA_WINDOW = 50
+BUY, SELL = 0, 1
+ORDER_DTYPE = np.dtype([('col', np.int64), ('idx', np.int64), ('size', np.float64), ('price', np.float64),
+                        ('fees', np.float64), ('side', np.int64)])
+
+def order_records(size, close, fees=0.001):
+    '''size 矩阵 → 和 vbt pf.orders.values 一样字段的订单记录，成交价是收盘价'''
+    idx, col = np.nonzero(size)
+    amount = size[idx, col]
+    price = close[idx, col]
+    records = np.empty(len(idx), dtype=ORDER_DTYPE)
+    records['col'] = col
+    records['idx'] = idx
+    records['size'] = np.abs(amount)
+    records['price'] = price
+    records['fees'] = np.abs(amount) * price * fees
+    records['side'] = np.where(amount > 0, BUY, SELL)
+    return records
+
+def build_inputs(profiler, data_folder, data_folder_1h, start_date, end_date, window, warmup):
+    '''两个策略共用的前几个阶段：建 store、选 universe、读小时线、BTC 过滤'''
+    profiler.stage('build_store')
+    build_store(data_folder)
+    build_store(data_folder_1h)
+    profiler.stage('universe')
+    change_date = start_date + (end_date - start_date) / 2
+    df_filtered = pair_filter(data_folder, start_date, end_date, window=window, blacklist=[],
+                              rules=default_rules(change_date), cache=False)
+    profiler.stage('load_ohlcv')
+    high, low, close = load_panels(data_folder_1h, df_filtered, warmup)
+    profiler.stage('indicators')
+    close_1d = close.resample('D').last()
+    to_hourly = DailyToHourly(close.index, close_1d.index)
+    btc_regime = BtcRegime(close_1d['BTC_USDT'], to_hourly)
+    profiler.meta.update(bars=close.shape[0], pairs=close.shape[1], universe_rows=len(df_filtered))
+    return df_filtered, high, low, close, close_1d, to_hourly, btc_regime
+
+def finish_pipeline(profiler, size, close, direction, init_cash, fees, max_tranches, n_sims):
+    '''模拟之后的阶段：净值和统计、报告、tradelog、Monte Carlo'''
+    profiler.stage('portfolio')
+    close_arr = close.to_numpy(dtype=float)
+    value = pd.Series(portfolio_value(size, close_arr, init_cash, fees, direction), index=close.index)
+    stats = portfolio_stats(size, close_arr, init_cash, fees, direction)
+    profiler.stage('report')
+    render_report(value.pct_change().fillna(0.0), close['BTC_USDT'].pct_change(fill_method=None))
+    profiler.stage('tradelog')
+    trades = trade_table(order_records(size, close_arr, fees), direction=direction, init_cash=init_cash,
+                         max_tranches=max_tranches, index=close.index, columns=close.columns)
+    profiler.stage('montecarlo')
+    if len(trades) > 1:
+        monte_carlo_summary(trades.sort_values('exit_time', kind='stable'), init_cash=init_cash, n_sims=n_sims, seed=0)
+    profiler.meta.update(trades=len(trades))
+    return stats
+
+def bench_breakout(profiler, data_folder, data_folder_1h, start_date, end_date, window=11, high_window=30*24,
+                   low_window=21*24, max_slots=10, hold_days=2, init_cash=10000.0, fees=0.001, n_sims=10000):
+    '''和 BreakoutCatcher_vbt.py 一样的流程'''
+    warmup = pd.Timedelta(days=max(BTC_MA_WINDOW, high_window // 24))
+    df_filtered, high, low, close, close_1d, to_hourly, btc_regime = build_inputs(
+        profiler, data_folder, data_folder_1h, start_date, end_date, window, warmup)
+    breakout = high >= rolling_max(high, high_window)
+    breakdown = low <= rolling_min(low, low_window)
+    profiler.stage('signals')
+    coin_filter = membership_matrix(df_filtered, close.index, close.columns)
+    coin_filter['BTC_USDT'] = False
+    mask = breakout & coin_filter & btc_regime.bull(BTC_MA_WINDOW).to_numpy()[:, None]
+    profiler.stage('simulation')
+    day_ptr, day_codes, bar_day = rank_index(df_filtered, close.index, close.columns)
+    size, _ = simulate_breakout_nb(close.to_numpy(dtype=float), breakdown.to_numpy(dtype=bool),
+                                   btc_regime.bear(BTC_MA_WINDOW).to_numpy(dtype=bool), mask.to_numpy(dtype=bool),
+                                   day_ptr, day_codes, bar_day, close.index.as_unit('ns').asi8,
+                                   max_slots=max_slots, hold_days=hold_days, init_cash=float(init_cash), fees=fees)
+    return finish_pipeline(profiler, size, close, 1, init_cash, fees, 1, n_sims)
+
+def bench_trend(profiler, data_folder, data_folder_1h, start_date, end_date, window=3, max_slots=10, position_count=3,
+                add_atr=0.25, risk_factor=0.01, init_cash=10000.0, fees=0.001, n_sims=10000):
+    '''和 TrendCatcher_vbt.py 一样的流程'''
+    warmup = pd.Timedelta(days=BTC_MA_WINDOW)
+    df_filtered, high, low, close, close_1d, to_hourly, btc_regime = build_inputs(
+        profiler, data_folder, data_folder_1h, start_date, end_date, window, warmup)
+    ma20 = close_1d.rolling(20).mean()
+    atr_1d = average_true_range(*load_daily_bars(data_folder_1h, close.columns))
+    atr = DailyToHourly(close.index, atr_1d.index, offset='0h')(atr_1d, fill_value=np.nan)
+    profiler.stage('signals')
+    coin_filter = membership_matrix(df_filtered, close.index, close.columns)
+    mask = to_hourly(crossed_above(close_1d, ma20)) & coin_filter & btc_regime.bull(BTC_MA_WINDOW).to_numpy()[:, None]
+    exit_mask = to_hourly(crossed_above(ma20, close_1d)) | btc_regime.bear(BTC_MA_WINDOW).to_numpy()[:, None]
+    profiler.stage('simulation')
+    day_ptr, day_codes, bar_day = rank_index(df_filtered, close.index, close.columns)
+    size, _ = simulate_trend_nb(close.to_numpy(dtype=float), atr.to_numpy(dtype=float), exit_mask.to_numpy(dtype=bool),
+                                mask.to_numpy(dtype=bool), day_ptr, day_codes, bar_day, max_slots=max_slots,
+                                position_count=position_count, add_atr=add_atr, risk_factor=risk_factor, stop_loss=0.5,
+                                direction=1, init_cash=float(init_cash), fees=fees)
+    return finish_pipeline(profiler, size, close, 1, init_cash, fees, position_count, n_sims)
+
+BENCHMARKS = {'breakout': bench_breakout, 'trend': bench_trend}
+
+def run_case(strategy, n_pairs, years, data_root, folder=BENCH_DIR, seed=0, trace_memory=False):
+    '''生成（或复用）合成数据，跑一次完整流水线，profile 写到 folder/<run_id>/，返回 Profiler'''
+    folder_1d, folder_1h, start_date, end_date = write_synthetic_market(data_root, n_pairs, years, seed=seed)
+    params = {'strategy': strategy, 'n_pairs': n_pairs, 'years': years, 'seed': seed}
+    run = RunArtifacts(f'bench_{strategy}', params, folder=folder)
+    profiler = Profiler(f'bench_{strategy}', trace_memory=trace_memory)
+    profiler.meta.update(params)
+    stats = BENCHMARKS[strategy](profiler, folder_1d, folder_1h, start_date, end_date)
+    profiler.finish()
+    run.write('stats', pd.Series(stats, name='value').astype(float))
+    profiler.write(run.path)
+    return profiler
+
+def warmup_jit(data_root):
+    '''numba 第一次调用要编译（cache=True 之后会读缓存），先在很小的数据上跑一遍，不计入结果'''
+    folder_1d, folder_1h, start_date, end_date = write_synthetic_market(data_root, n_pairs=5, years=0.3)
+    for bench in BENCHMARKS.values():
+        bench(Profiler('warmup'), folder_1d, folder_1h, start_date, end_date, n_sims=10)
+
+def bench_history(folder=BENCH_DIR):
+    '''所有基准 run 的阶段耗时，带 n_pairs / years 方便按规模分组'''
+    history = profile_history(folder)
+    if history.empty:
+        return history
+    cases = {}
+    for run_id in history['run_id'].unique():
+        meta = read_profile(os.path.join(folder, run_id))['meta']
+        cases[run_id] = (meta.get('n_pairs'), meta.get('years'))
+    history['n_pairs'] = history['run_id'].map(lambda run_id: cases[run_id][0])
+    history['years'] = history['run_id'].map(lambda run_id: cases[run_id][1])
+    return history
+
+def check_regressions(folder=BENCH_DIR, tolerance=1.5, min_seconds=0.05):
+    '''
+    每个 (策略, 币对数, 年数, 阶段) 最新一次的 wall time 和之前所有 run 的中位数比较
+    超过 tolerance 倍（且超过 min_seconds，太短的阶段噪声大）的算回归，返回这些行
+    '''
+    history = bench_history(folder)
+    columns = ['strategy', 'n_pairs', 'years', 'stage', 'wall_s', 'baseline_s', 'ratio']
+    if history.empty:
+        return pd.DataFrame(columns=columns)
+    keys = ['strategy', 'n_pairs', 'years', 'stage']
+    latest_run = history.groupby(['strategy', 'n_pairs', 'years'])['run_id'].transform('last')
+    latest = history[history['run_id'] == latest_run]
+    baseline = history[history['run_id'] != latest_run].groupby(keys)['wall_s'].median().rename('baseline_s')
+    compared = latest.join(baseline, on=keys, how='inner')
+    compared['ratio'] = compared['wall_s'] / compared['baseline_s']
+    slow = (compared['ratio'] > tolerance) & (compared['wall_s'] > min_seconds)
+    return compared.loc[slow, columns].reset_index(drop=True)
@@ -0,0 +1,235 @@
+import os
+import glob
+import hashlib
+import numpy as np
+from backtest.ledger import Ledger
+from backtest.universe import cache_key
+from backtest.engine import run_breakout_nb, run_trend_nb
+
+# 长回测的断点续跑：每隔 every 根 bar 把完整状态（持仓、加仓的每一笔、Ledger、已经下过的单）存成 npz
+# 下次运行时从最新的、输入前缀没变的 checkpoint 接着跑，追加一周 K 线只需要模拟新增的 bar
+# 输入按 every 分段做指纹，保存时只算新的一段；币对按名字对齐，追加数据后新增币对、列顺序变化都不影响续跑
+# exited（同一根 bar 平仓的币不马上再进场）每根 bar 结束时都会清空，checkpoint 之间总是空的，所以不用存
+# 最后一根 bar 会强制平仓，所以最后一个 checkpoint 停在倒数第二根 bar 之后
+# 传了 journal 时不续跑（照样保存 checkpoint）：journal 要记录每一根 bar，续跑的话 events 里只有新跑的部分
+
+CHECKPOINT_DIR = 'checkpoints'
+
+class Checkpoints:
+    '''
+    一个策略 + 一组参数的 checkpoint 文件，文件名带参数的 key，只保留最新的 keep 个
+    bar_panels: 每个 bar 一个值的输入；col_panels: (bar, 币对) 的输入；entry_mask: 入场信号，用来确认新增的币对没有影响过去
+    '''
+    def __init__(self, name, params, timestamps, columns, bar_panels, col_panels, entry_mask, day_ptr, day_codes, bar_day,
+                 folder=CHECKPOINT_DIR, keep=3):
+        self.folder = folder
+        self.prefix = f'{name}_{cache_key(params)}_'
+        self.keep = keep
+        self.timestamps = timestamps
+        self.columns = columns
+        self.bar_panels = bar_panels
+        self.col_panels = col_panels
+        self.entry_mask = entry_mask
+        self.day_ptr = day_ptr
+        self.day_codes = day_codes
+        self.bar_day = bar_day
+        self.bounds = []
+        self.digests = []
+
+    def chunk_digest(self, lo, hi, idx):
+        '''[lo, hi) 这段 bar 的输入指纹，idx 是参与指纹的币对在当前列里的位置（按 checkpoint 里的币对顺序）'''
+        h = hashlib.sha1(np.ascontiguousarray(self.timestamps[lo:hi]).tobytes())
+        for arr in self.bar_panels:
+            h.update(np.ascontiguousarray(arr[lo:hi]).tobytes())
+        for arr in self.col_panels:
+            h.update(np.ascontiguousarray(arr[lo:hi][:, idx]).tobytes())
+        # 这段 bar 覆盖的每一天里，这些币对的排名先后
+        first_day, last_day = self.bar_day[lo], self.bar_day[hi - 1]
+        codes = self.day_codes[self.day_ptr[first_day]:self.day_ptr[last_day + 1]]
+        code_day = np.repeat(np.arange(first_day, last_day + 1), np.diff(self.day_ptr[first_day:last_day + 2]))
+        position = np.full(len(self.columns), -1, dtype=np.int64)
+        position[idx] = np.arange(len(idx))
+        keep = position[codes] >= 0
+        h.update(np.ascontiguousarray(self.bar_day[lo:hi]).tobytes())
+        h.update(code_day[keep].tobytes())
+        h.update(position[codes][keep].tobytes())
+        return h.hexdigest()
+
+    def chain(self, bounds, idx):
+        lows = [0] + list(bounds[:-1])
+        return [self.chunk_digest(lo, hi, idx) for lo, hi in zip(lows, bounds)]
+
+    def paths(self):
+        '''按 checkpoint 的 bar 从新到旧'''
+        return sorted(glob.glob(os.path.join(self.folder, self.prefix + '*.npz')), reverse=True)
+
+    def resume(self):
+        '''
+        找最新的能续跑的 checkpoint，返回 (stop, state)，状态里的币对列号已经换成当前的列号；没有就返回 (0, None)
+        能续跑的条件：checkpoint 的币对都还在、前 stop 根 bar 每一段输入指纹都一样、新增的币对在这之前没有入场信号
+        '''
+        n_bars = len(self.timestamps)
+        all_idx = np.arange(len(self.columns))
+        for path in self.paths():
+            with np.load(path, allow_pickle=False) as ck:
+                state = {key: ck[key] for key in ck.files}
+            stop = int(state['stop'])
+            idx = self.columns.get_indexer(state['names'])
+            if stop >= n_bars or (idx < 0).any():
+                continue
+            if self.entry_mask[:stop][:, np.setdiff1d(all_idx, idx)].any():
+                continue
+            bounds = [int(b) for b in state['bounds']]
+            if self.chain(bounds, idx) != list(state['digests']):
+                continue
+            state['hold_col'] = idx[state['hold_col']]
+            state['order_col'] = idx[state['order_col']]
+            self.bounds = bounds
+            # 之后的 checkpoint 按当前的列保存，列没变时直接沿用原来的指纹
+            same = len(idx) == len(self.columns) and (idx == all_idx).all()
+            self.digests = list(state['digests']) if same else self.chain(bounds, all_idx)
+            return stop, state
+        return 0, None
+
+    def save(self, stop, state):
+        lo = self.bounds[-1] if self.bounds else 0
+        self.bounds.append(stop)
+        self.digests.append(self.chunk_digest(lo, stop, np.arange(len(self.columns))))
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f'{self.prefix}{stop:09d}.npz')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, stop=stop, names=np.asarray(self.columns, dtype=str), bounds=np.asarray(self.bounds),
+                     digests=np.asarray(self.digests), **state)
+        os.replace(tmp_path, path)
+        for old in self.paths()[self.keep:]:
+            os.remove(old)
+
+def chunk_stops(start, n_bars, every):
+    '''start 之后每个 every 的整数倍存一次，最后一根 bar 之前再存一次'''
+    stops = list(range((start // every + 1) * every, n_bars - 1, every))
+    if start < n_bars - 1:
+        stops.append(n_bars - 1)
+    return stops + [n_bars]
+
+def ledger_state(ledger, size, stop):
+    order_bar, order_col = np.nonzero(size[:stop])
+    return {
+        'cash': ledger.cash,
+        'available': ledger.available,
+        'invested': ledger.invested,
+        'records': ledger.records[:stop],
+        'order_bar': order_bar,
+        'order_col': order_col,
+        'order_size': size[order_bar, order_col],
+    }
+
+def restore_ledger(ledger, size, state):
+    ledger.cash = float(state['cash'])
+    ledger.available = float(state['available'])
+    ledger.invested = float(state['invested'])
+    records = ledger.records
+    records[:len(state['records'])] = state['records']
+    size[state['order_bar'], state['order_col']] = state['order_size']
+
+def resume_state(checkpoints, name, n_bars, journal):
+    '''续跑时打印从哪根 bar 开始；要记 journal 时即使有能续跑的 checkpoint 也从头跑'''
+    start, state = checkpoints.resume()
+    if state is None:
+        return 0, None
+    if journal is not None:
+        print(f"Found {name} checkpoint at bar {start}/{n_bars}, but a journal was requested: simulating from bar 0")
+        checkpoints.bounds, checkpoints.digests = [], []
+        return 0, None
+    print(f"Resuming {name} from checkpoint at bar {start}/{n_bars}")
+    return start, state
+
+def simulate_breakout_resumable(close, breakdown, exit_filter, mask, day_ptr, day_codes, bar_day, timestamps, columns,
+                                max_slots=10, hold_days=2, init_cash=10000.0, fees=0.001, cash_ratio=0.99,
+                                every=30*24, folder=CHECKPOINT_DIR, keep=3, journal=None):
+    '''
+    和 engine.simulate_breakout_nb 结果一样，columns 是币对名（close 的列）
+    传了 journal 时不从 checkpoint 续跑，journal 里是完整的每一根 bar
+    '''
+    params = {'strategy': 'breakout', 'max_slots': max_slots, 'hold_days': hold_days, 'init_cash': init_cash, 'fees': fees,
+              'cash_ratio': cash_ratio}
+    checkpoints = Checkpoints('breakout', params, timestamps, columns, [exit_filter], [close, breakdown, mask], mask,
+                              day_ptr, day_codes, bar_day, folder, keep)
+    n_bars, n_cols = close.shape
+    size = np.zeros((n_bars, n_cols))
+    ledger = Ledger(n_bars, init_cash, fees, cash_ratio)
+    hold_col = np.empty(max_slots, np.int64)
+    hold_date = np.empty(max_slots, np.int64)
+    hold_price = np.empty(max_slots)
+    hold_size = np.empty(max_slots)
+    in_holdings = np.zeros(n_cols, np.bool_)
+    exited = np.zeros(n_cols, np.bool_)
+    exited_list = np.empty(max_slots, np.int64)
+    n_hold = 0
+
+    start, state = resume_state(checkpoints, 'breakout', n_bars, journal)
+    if state is not None:
+        restore_ledger(ledger, size, state)
+        n_hold = len(state['hold_col'])
+        hold_col[:n_hold] = state['hold_col']
+        hold_date[:n_hold] = state['hold_date']
+        hold_price[:n_hold] = state['hold_price']
+        hold_size[:n_hold] = state['hold_size']
+        in_holdings[hold_col[:n_hold]] = True
+
+    for stop in chunk_stops(start, n_bars, every):
+        n_hold = run_breakout_nb(start, stop, close, breakdown, exit_filter, mask, day_ptr, day_codes, bar_day, timestamps,
+                                 max_slots, hold_days, ledger, size, hold_col, hold_date, hold_price, hold_size, n_hold,
+                                 in_holdings, exited, exited_list, journal)
+        if stop < n_bars:
+            checkpoints.save(stop, {**ledger_state(ledger, size, stop), 'hold_col': hold_col[:n_hold],
+                                    'hold_date': hold_date[:n_hold], 'hold_price': hold_price[:n_hold],
+                                    'hold_size': hold_size[:n_hold]})
+        start = stop
+    return size, ledger.records
+
+def simulate_trend_resumable(close, atr, exit_mask, mask, day_ptr, day_codes, bar_day, timestamps, columns,
+                             max_slots=10, position_count=3, add_atr=0.25, risk_factor=0.01, stop_loss=0.5,
+                             direction=1, init_cash=10000.0, fees=0.001, cash_ratio=0.99,
+                             every=30*24, folder=CHECKPOINT_DIR, keep=3, journal=None):
+    '''
+    和 engine.simulate_trend_nb 结果一样，timestamps 只用来做输入指纹，columns 是币对名
+    每个持仓的加仓记录（每一笔的价格和数量）都在 checkpoint 里
+    '''
+    params = {'strategy': 'trend', 'max_slots': max_slots, 'position_count': position_count, 'add_atr': add_atr,
+              'risk_factor': risk_factor, 'stop_loss': stop_loss, 'direction': direction, 'init_cash': init_cash,
+              'fees': fees, 'cash_ratio': cash_ratio}
+    name = 'trend' if direction == 1 else 'trend_short'
+    checkpoints = Checkpoints(name, params, timestamps, columns, [], [close, atr, exit_mask, mask], mask,
+                              day_ptr, day_codes, bar_day, folder, keep)
+    n_bars, n_cols = close.shape
+    size = np.zeros((n_bars, n_cols))
+    ledger = Ledger(n_bars, init_cash, fees, cash_ratio)
+    hold_col = np.empty(max_slots, np.int64)
+    tr_price = np.empty((max_slots, position_count))
+    tr_size = np.empty((max_slots, position_count))
+    tr_count = np.zeros(max_slots, np.int64)
+    in_holdings = np.zeros(n_cols, np.bool_)
+    exited = np.zeros(n_cols, np.bool_)
+    exited_list = np.empty(max_slots, np.int64)
+    n_hold = 0
+
+    start, state = resume_state(checkpoints, name, n_bars, journal)
+    if state is not None:
+        restore_ledger(ledger, size, state)
+        n_hold = len(state['hold_col'])
+        hold_col[:n_hold] = state['hold_col']
+        tr_price[:n_hold] = state['tr_price']
+        tr_size[:n_hold] = state['tr_size']
+        tr_count[:n_hold] = state['tr_count']
+        in_holdings[hold_col[:n_hold]] = True
+
+    for stop in chunk_stops(start, n_bars, every):
+        n_hold = run_trend_nb(start, stop, close, atr, exit_mask, mask, day_ptr, day_codes, bar_day,
+                              max_slots, position_count, add_atr, risk_factor, stop_loss, direction, ledger,
+                              size, hold_col, tr_price, tr_size, tr_count, n_hold, in_holdings, exited, exited_list, journal)
+        if stop < n_bars:
+            checkpoints.save(stop, {**ledger_state(ledger, size, stop), 'hold_col': hold_col[:n_hold],
+                                    'tr_price': tr_price[:n_hold], 'tr_size': tr_size[:n_hold], 'tr_count': tr_count[:n_hold]})
+        start = stop
+    return size, ledger.records
@@ -0,0 +1,427 @@
+import numpy as np
+from numba import njit
+from backtest.ledger import Ledger
+from backtest.journal import ENTRY, ADD, EXIT, SKIP, NO_REASON, BREAKDOWN, BTC_REGIME, HOLD_DAYS, FORCE_EXIT, STOP_LOSS, EXIT_SIGNAL, NO_CASH
+
+# 逐 bar 的组合模拟，规则和原来 vbt 脚本里 mask.iterrows() 的循环一致，输入全部是对齐好的 numpy 数组
+# 每个策略的出场/入场拆成独立的 njit 函数，持仓数组由调用方持有：单策略回测自己循环，
+# 多策略共用资金时在同一个 bar 循环里依次调用各策略的函数，共用一个 Ledger
+# 输出 size 矩阵（交给 vbt.Portfolio.from_orders）和资金台账 [Remaining Cash, Available Cash, Asset Value]
+# journal 传 journal.Journal 时记录每笔成交和出场原因；默认 None，numba 编译时会把记录的分支整个去掉
+
+HOUR_NS = 3600 * 10**9
+DAY_NS = 24 * HOUR_NS
+
+@njit(cache=True)
+def remove_slot(k, n_hold, hold_col, hold_date, hold_price, hold_size):
+    # 保持剩余持仓的进场顺序，和原来 dict 删除后的遍历顺序一样
+    for j in range(k, n_hold - 1):
+        hold_col[j] = hold_col[j + 1]
+        hold_date[j] = hold_date[j + 1]
+        hold_price[j] = hold_price[j + 1]
+        hold_size[j] = hold_size[j + 1]
+    return n_hold - 1
+
+@njit(cache=True)
+def remove_tranche_slot(k, n_hold, hold_col, tr_price, tr_size, tr_count):
+    for j in range(k, n_hold - 1):
+        hold_col[j] = hold_col[j + 1]
+        tr_price[j] = tr_price[j + 1]
+        tr_size[j] = tr_size[j + 1]
+        tr_count[j] = tr_count[j + 1]
+    return n_hold - 1
+
+@njit(cache=True)
+def clear_exited(exited, exited_list, n_exited):
+    # 同一根 bar 平掉的币不会马上再进场，下一根 bar 恢复
+    for k in range(n_exited):
+        exited[exited_list[k]] = False
+
+@njit(cache=True)
+def breakout_exits(i, date, last_bar, close, breakdown, exit_filter, hold_days, ledger, other_hold,
+                   size, hold_col, hold_date, hold_price, hold_size, n_hold, in_holdings, exited, exited_list, journal=None):
+    '''
+    BreakoutCatcher 持仓逐个检查出场：最后一根 bar、跌破低点、exit_filter（BTC < MA50），或者持有超过 hold_days 天后的 0 点
+    other_hold 是共用资金的其他策略的持仓数，全部空仓时 Ledger 才归零；返回 (n_hold, 这根 bar 平仓的个数)
+    '''
+    n_exited = 0
+    # 按进场顺序检查，平掉的持仓从数组里移走，后面的往前挪，所以平仓时 k 不加 1
+    k = 0
+    while k < n_hold:
+        c = hold_col[k]
+        current_price = close[i, c]
+        if last_bar or breakdown[i, c] or exit_filter[i] or (
+                date - hold_date[k] > hold_days * DAY_NS and (date // HOUR_NS) % 24 == 0):
+            exit_size = hold_size[k]
+            size[i, c] = -exit_size
+            cost_basis = hold_price[k] * exit_size
+            n_hold = remove_slot(k, n_hold, hold_col, hold_date, hold_price, hold_size)
+            ledger.sell(current_price, exit_size, cost_basis, n_hold == 0 and other_hold == 0)
+            if journal is not None:
+                if last_bar:
+                    reason = FORCE_EXIT
+                elif breakdown[i, c]:
+                    reason = BREAKDOWN
+                elif exit_filter[i]:
+                    reason = BTC_REGIME
+                else:
+                    reason = HOLD_DAYS
+                journal.log(i, c, EXIT, reason, current_price, exit_size, ledger.cash)
+            in_holdings[c] = False
+            exited[c] = True
+            exited_list[n_exited] = c
+            n_exited += 1
+        else:
+            k += 1
+    return n_hold, n_exited
+
+@njit(cache=True)
+def breakout_entries(i, date, close, mask, day_ptr, day_codes, bar_day, max_slots, weight, ledger,
+                     size, hold_col, hold_date, hold_price, hold_size, n_hold, in_holdings, exited, journal=None):
+    '''账户价值 * weight 均分 max_slots 份，每个币一份；返回新的 n_hold'''
+    # 当天 universe 按 rank 排好序，依次检查有没有入场信号
+    d = bar_day[i]
+    for j in range(day_ptr[d], day_ptr[d + 1]):
+        c = day_codes[j]
+        if mask[i, c] and n_hold < max_slots and not in_holdings[c] and not exited[c]:
+            stake_amount = ledger.asset_value * weight / max_slots
+            entry_price = close[i, c]
+            if stake_amount > ledger.available:
+                if journal is not None:
+                    journal.log(i, c, SKIP, NO_CASH, entry_price, stake_amount / entry_price, ledger.cash)
+                continue
+            trade_size = stake_amount / entry_price
+            size[i, c] = trade_size
+            hold_col[n_hold] = c
+            hold_date[n_hold] = date
+            hold_price[n_hold] = entry_price
+            hold_size[n_hold] = trade_size
+            n_hold += 1
+            in_holdings[c] = True
+            ledger.buy(entry_price, trade_size)
+            if journal is not None:
+                journal.log(i, c, ENTRY, NO_REASON, entry_price, trade_size, ledger.cash)
+    return n_hold
+
+@njit(cache=True)
+def trend_update(i, last_bar, close, atr, exit_mask, position_count, add_atr, stop_loss, direction, ledger, other_hold,
+                 size, hold_col, tr_price, tr_size, tr_count, n_hold, in_holdings, exited, exited_list, journal=None,
+                 short_cash=False):
+    '''
+    TrendCatcher 持仓逐个检查：出场（最后一根 bar、止损、exit_mask），否则满足条件时加仓
+    direction=1 做多：价格比上一笔高 add_atr 个 ATR 加仓；direction=-1 做空：低 add_atr 个 ATR 加仓
+    stop_loss: 做多时现价 <= stop_loss * 持仓均价、做空时现价 >= (2 - stop_loss) * 持仓均价 止损，0 表示不止损
+    返回 (n_hold, 这根 bar 平仓的个数)
+    short_cash: 空头按真实现金流记账（Ledger.short / cover），simulate_long_short_nb 的空头持仓簿用；默认和原来的脚本一样按 buy / sell 记
+    '''
+    n_exited = 0
+    # 按进场顺序检查，平掉的持仓从数组里移走，后面的往前挪，所以平仓时 k 不加 1
+    k = 0
+    while k < n_hold:
+        c = hold_col[k]
+        n_trades = tr_count[k]
+        exit_size = 0.0
+        cost = 0.0
+        for t in range(n_trades):
+            exit_size += tr_size[k, t]
+            cost += tr_price[k, t] * tr_size[k, t]
+        current_price = close[i, c]
+        atr_value = atr[i, c]
+        last_entry_price = tr_price[k, n_trades - 1]
+        entry_price = cost / exit_size
+
+        if direction == 1:
+            add_signal = current_price >= last_entry_price + add_atr * atr_value
+            stopped = stop_loss > 0 and current_price <= stop_loss * entry_price
+        else:
+            add_signal = current_price <= last_entry_price - add_atr * atr_value
+            stopped = stop_loss > 0 and current_price >= (2 - stop_loss) * entry_price
+
+        if last_bar or stopped or exit_mask[i, c]:
+            size[i, c] = -exit_size
+            n_hold = remove_tranche_slot(k, n_hold, hold_col, tr_price, tr_size, tr_count)
+            if short_cash:
+                ledger.cover(current_price, exit_size, n_hold == 0)
+            else:
+                ledger.sell(current_price, exit_size, cost, n_hold == 0 and other_hold == 0)
+            if journal is not None:
+                if last_bar:
+                    reason = FORCE_EXIT
+                elif stopped:
+                    reason = STOP_LOSS
+                else:
+                    reason = EXIT_SIGNAL
+                journal.log(i, c, EXIT, reason, current_price, exit_size, ledger.cash)
+            in_holdings[c] = False
+            exited[c] = True
+            exited_list[n_exited] = c
+            n_exited += 1
+            continue
+
+        if add_signal and 1 <= n_trades <= position_count - 1:
+            # 加仓金额和第一笔相同，可用资金不够就不加
+            stake_amount = tr_price[k, 0] * tr_size[k, 0]
+            if not stake_amount > ledger.available:
+                trade_size = stake_amount / current_price
+                size[i, c] = trade_size
+                tr_price[k, n_trades] = current_price
+                tr_size[k, n_trades] = trade_size
+                tr_count[k] = n_trades + 1
+                if short_cash:
+                    ledger.short(current_price, trade_size)
+                else:
+                    ledger.buy(current_price, trade_size)
+                if journal is not None:
+                    journal.log(i, c, ADD, NO_REASON, current_price, trade_size, ledger.cash)
+            elif journal is not None:
+                journal.log(i, c, SKIP, NO_CASH, current_price, stake_amount / current_price, ledger.cash)
+        k += 1
+    return n_hold, n_exited
+
+@njit(cache=True)
+def trend_entries(i, close, atr, mask, day_ptr, day_codes, bar_day, max_slots, position_count, risk_factor, weight, ledger,
+                  size, hold_col, tr_price, tr_size, tr_count, n_hold, in_holdings, exited, journal=None, short_cash=False):
+    '''
+    首笔按 账户价值 * weight * risk_factor / ATR 计算仓位，每个持仓最多 position_count 笔；返回新的 n_hold
+    short_cash: 这是空头持仓簿，按 Ledger.short 记账（见 trend_update）
+    '''
+    # 当天 universe 按 rank 排好序，依次检查有没有入场信号
+    d = bar_day[i]
+    for j in range(day_ptr[d], day_ptr[d + 1]):
+        c = day_codes[j]
+        if mask[i, c] and n_hold < max_slots and not in_holdings[c] and not exited[c]:
+            entry_price = close[i, c]
+            stake_amount = ledger.asset_value * weight * risk_factor * entry_price / (atr[i, c] * position_count)
+            if stake_amount > ledger.available:
+                if journal is not None:
+                    journal.log(i, c, SKIP, NO_CASH, entry_price, stake_amount / entry_price, ledger.cash)
+                continue
+            trade_size = stake_amount / entry_price
+            size[i, c] = trade_size
+            hold_col[n_hold] = c
+            tr_price[n_hold, 0] = entry_price
+            tr_size[n_hold, 0] = trade_size
+            tr_count[n_hold] = 1
+            n_hold += 1
+            in_holdings[c] = True
+            if short_cash:
+                ledger.short(entry_price, trade_size)
+            else:
+                ledger.buy(entry_price, trade_size)
+            if journal is not None:
+                journal.log(i, c, ENTRY, NO_REASON, entry_price, trade_size, ledger.cash)
+    return n_hold
+
+@njit(cache=True)
+def short_liability(i, close, hold_col, tr_size, tr_count, n_hold):
+    '''未平空头按这根 bar 收盘价的市值'''
+    value = 0.0
+    for k in range(n_hold):
+        for t in range(tr_count[k]):
+            value += tr_size[k, t] * close[i, hold_col[k]]
+    return value
+
+@njit(cache=True)
+def run_breakout_nb(start, stop, close, breakdown, exit_filter, mask, day_ptr, day_codes, bar_day, timestamps,
+                    max_slots, hold_days, ledger, size, hold_col, hold_date, hold_price, hold_size, n_hold,
+                    in_holdings, exited, exited_list, journal=None):
+    '''模拟 [start, stop) 这段 bar，持仓和 Ledger 原地更新，返回新的 n_hold；checkpoint 续跑时从保存的状态接着跑'''
+    n_bars = close.shape[0]
+    for i in range(start, stop):
+        date = timestamps[i]
+        # 持仓逐个检查出场，最后一根 bar 以收盘价强制平仓
+        last_bar = i == n_bars - 1
+        n_hold, n_exited = breakout_exits(i, date, last_bar, close, breakdown, exit_filter, hold_days, ledger, 0,
+                                          size, hold_col, hold_date, hold_price, hold_size, n_hold, in_holdings, exited, exited_list,
+                                          journal)
+        if not last_bar and n_hold < max_slots:
+            n_hold = breakout_entries(i, date, close, mask, day_ptr, day_codes, bar_day, max_slots, 1.0, ledger,
+                                      size, hold_col, hold_date, hold_price, hold_size, n_hold, in_holdings, exited, journal)
+        clear_exited(exited, exited_list, n_exited)
+        ledger.record(i)
+    return n_hold
+
+@njit(cache=True)
+def simulate_breakout_nb(close, breakdown, exit_filter, mask, day_ptr, day_codes, bar_day, timestamps,
+                         max_slots=10, hold_days=2, init_cash=10000.0, fees=0.001, cash_ratio=0.99, journal=None):
+    '''
+    close/breakdown/mask: (bar, 币对)；exit_filter: 每个 bar 一个值（BTC < MA50）
+    day_ptr/day_codes/bar_day: universe.rank_index 生成的每日排名索引
+    '''
+    n_bars, n_cols = close.shape
+    size = np.zeros((n_bars, n_cols))
+    ledger = Ledger(n_bars, init_cash, fees, cash_ratio)
+    hold_col = np.empty(max_slots, np.int64)
+    hold_date = np.empty(max_slots, np.int64)
+    hold_price = np.empty(max_slots)
+    hold_size = np.empty(max_slots)
+    in_holdings = np.zeros(n_cols, np.bool_)
+    exited = np.zeros(n_cols, np.bool_)
+    exited_list = np.empty(max_slots, np.int64)
+    run_breakout_nb(0, n_bars, close, breakdown, exit_filter, mask, day_ptr, day_codes, bar_day, timestamps,
+                    max_slots, hold_days, ledger, size, hold_col, hold_date, hold_price, hold_size, 0,
+                    in_holdings, exited, exited_list, journal)
+    return size, ledger.records
+
+@njit(cache=True)
+def run_trend_nb(start, stop, close, atr, exit_mask, mask, day_ptr, day_codes, bar_day,
+                 max_slots, position_count, add_atr, risk_factor, stop_loss, direction, ledger,
+                 size, hold_col, tr_price, tr_size, tr_count, n_hold, in_holdings, exited, exited_list, journal=None):
+    '''模拟 [start, stop) 这段 bar，持仓（含加仓的每一笔）和 Ledger 原地更新，返回新的 n_hold'''
+    n_bars = close.shape[0]
+    for i in range(start, stop):
+        last_bar = i == n_bars - 1
+        n_hold, n_exited = trend_update(i, last_bar, close, atr, exit_mask, position_count, add_atr, stop_loss, direction, ledger, 0,
+                                        size, hold_col, tr_price, tr_size, tr_count, n_hold, in_holdings, exited, exited_list,
+                                        journal)
+        if not last_bar and n_hold < max_slots:
+            n_hold = trend_entries(i, close, atr, mask, day_ptr, day_codes, bar_day, max_slots, position_count, risk_factor, 1.0, ledger,
+                                   size, hold_col, tr_price, tr_size, tr_count, n_hold, in_holdings, exited, journal)
+        clear_exited(exited, exited_list, n_exited)
+        ledger.record(i)
+    return n_hold
+
+@njit(cache=True)
+def simulate_trend_nb(close, atr, exit_mask, mask, day_ptr, day_codes, bar_day,
+                      max_slots=10, position_count=3, add_atr=0.25, risk_factor=0.01, stop_loss=0.5,
+                      direction=1, init_cash=10000.0, fees=0.001, cash_ratio=0.99, journal=None):
+    '''TrendCatcher 的加仓模拟，每个持仓最多 position_count 笔（首次 + 加仓），按 ATR 计算仓位，规则见 trend_update / trend_entries'''
+    n_bars, n_cols = close.shape
+    size = np.zeros((n_bars, n_cols))
+    ledger = Ledger(n_bars, init_cash, fees, cash_ratio)
+    hold_col = np.empty(max_slots, np.int64)
+    tr_price = np.empty((max_slots, position_count))
+    tr_size = np.empty((max_slots, position_count))
+    tr_count = np.zeros(max_slots, np.int64)
+    in_holdings = np.zeros(n_cols, np.bool_)
+    exited = np.zeros(n_cols, np.bool_)
+    exited_list = np.empty(max_slots, np.int64)
+    run_trend_nb(0, n_bars, close, atr, exit_mask, mask, day_ptr, day_codes, bar_day,
+                 max_slots, position_count, add_atr, risk_factor, stop_loss, direction, ledger,
+                 size, hold_col, tr_price, tr_size, tr_count, 0, in_holdings, exited, exited_list, journal)
+    return size, ledger.records
+
+@njit(cache=True)
+def simulate_combined_nb(close, timestamps, bar_day,
+                         breakdown, exit_filter, breakout_mask, breakout_ptr, breakout_codes,
+                         atr, trend_exit, trend_mask, trend_ptr, trend_codes,
+                         breakout_slots=10, hold_days=2, breakout_weight=0.5,
+                         trend_slots=10, position_count=3, add_atr=0.25, risk_factor=0.01, stop_loss=0.5,
+                         trend_weight=0.5, init_cash=10000.0, fees=0.001, cash_ratio=0.99,
+                         breakout_journal=None, trend_journal=None):
+    '''
+    Breakout 和 Trend（做多）共用一个账户：同一个 bar 循环、同一个 Ledger，所有面板按同一组 (bar, 币对) 对齐
+    每根 bar 先处理两个策略的出场（和 Trend 的加仓），释放出来的资金再给入场用，入场时 Breakout 优先
+    weight: 每个策略按账户价值的多少比例计算仓位；两个策略的持仓分开记，各自输出 size，方便分别归因
+    '''
+    n_bars, n_cols = close.shape
+    ledger = Ledger(n_bars, init_cash, fees, cash_ratio)
+    b_size = np.zeros((n_bars, n_cols))
+    b_hold_col = np.empty(breakout_slots, np.int64)
+    b_hold_date = np.empty(breakout_slots, np.int64)
+    b_hold_price = np.empty(breakout_slots)
+    b_hold_size = np.empty(breakout_slots)
+    b_n_hold = 0
+    b_in_holdings = np.zeros(n_cols, np.bool_)
+    b_exited = np.zeros(n_cols, np.bool_)
+    b_exited_list = np.empty(breakout_slots, np.int64)
+    t_size = np.zeros((n_bars, n_cols))
+    t_hold_col = np.empty(trend_slots, np.int64)
+    t_price = np.empty((trend_slots, position_count))
+    t_tr_size = np.empty((trend_slots, position_count))
+    t_count = np.zeros(trend_slots, np.int64)
+    t_n_hold = 0
+    t_in_holdings = np.zeros(n_cols, np.bool_)
+    t_exited = np.zeros(n_cols, np.bool_)
+    t_exited_list = np.empty(trend_slots, np.int64)
+
+    for i in range(n_bars):
+        date = timestamps[i]
+        last_bar = i == n_bars - 1
+        b_n_hold, b_n_exited = breakout_exits(i, date, last_bar, close, breakdown, exit_filter, hold_days, ledger, t_n_hold,
+                                              b_size, b_hold_col, b_hold_date, b_hold_price, b_hold_size, b_n_hold,
+                                              b_in_holdings, b_exited, b_exited_list, breakout_journal)
+        t_n_hold, t_n_exited = trend_update(i, last_bar, close, atr, trend_exit, position_count, add_atr, stop_loss, 1, ledger,
+                                            b_n_hold, t_size, t_hold_col, t_price, t_tr_size, t_count, t_n_hold,
+                                            t_in_holdings, t_exited, t_exited_list, trend_journal)
+        if not last_bar:
+            if b_n_hold < breakout_slots:
+                b_n_hold = breakout_entries(i, date, close, breakout_mask, breakout_ptr, breakout_codes, bar_day, breakout_slots,
+                                            breakout_weight, ledger, b_size, b_hold_col, b_hold_date, b_hold_price, b_hold_size,
+                                            b_n_hold, b_in_holdings, b_exited, breakout_journal)
+            if t_n_hold < trend_slots:
+                t_n_hold = trend_entries(i, close, atr, trend_mask, trend_ptr, trend_codes, bar_day, trend_slots, position_count,
+                                         risk_factor, trend_weight, ledger, t_size, t_hold_col, t_price, t_tr_size, t_count,
+                                         t_n_hold, t_in_holdings, t_exited, trend_journal)
+        clear_exited(b_exited, b_exited_list, b_n_exited)
+        clear_exited(t_exited, t_exited_list, t_n_exited)
+        ledger.record(i)
+
+    return b_size, t_size, ledger.records
+
+@njit(cache=True)
+def simulate_long_short_nb(close, atr, bar_day,
+                           long_exit, long_mask, long_ptr, long_codes,
+                           short_exit, short_mask, short_ptr, short_codes,
+                           long_slots=10, long_risk=0.01, long_stop=0.5, long_weight=1.0,
+                           short_slots=20, short_risk=0.005, short_stop=0.0, short_weight=1.0,
+                           position_count=3, add_atr=0.25, shared_capital=False,
+                           init_cash=10000.0, fees=0.001, cash_ratio=0.99, long_journal=None, short_journal=None):
+    '''
+    TrendCatcher 多头和空头两个持仓簿在同一个 bar 循环里跑，close/atr 和排名索引的 bar_day 共用
+    shared_capital=False：两个账户各自 init_cash，多头的结果和 simulate_trend_nb 一样
+    shared_capital=True：共用一个账户，weight 是每边按账户价值的多少比例计算仓位，每根 bar 先处理两边的出场和加仓，再入场，多头优先
+    两种方式空头都按真实现金流记账：开空收入现金、平空付出现金，未平空头每根 bar 按收盘价计负债，
+    空头赚钱时账户价值增加（和 direction=-1 的 portfolio_value、vbt 的净值一致），所以空头账户和单独的
+    simulate_trend_nb(direction=-1)（按原来脚本的 buy / sell 方式记账）的仓位不一样
+    返回 (long_size, short_size, long_records, short_records)，共用账户时两份 records 是同一个台账
+    '''
+    n_bars, n_cols = close.shape
+    long_ledger = Ledger(n_bars, init_cash, fees, cash_ratio)
+    short_ledger = long_ledger if shared_capital else Ledger(n_bars, init_cash, fees, cash_ratio)
+    l_size = np.zeros((n_bars, n_cols))
+    l_hold_col = np.empty(long_slots, np.int64)
+    l_price = np.empty((long_slots, position_count))
+    l_tr_size = np.empty((long_slots, position_count))
+    l_count = np.zeros(long_slots, np.int64)
+    l_n_hold = 0
+    l_in_holdings = np.zeros(n_cols, np.bool_)
+    l_exited = np.zeros(n_cols, np.bool_)
+    l_exited_list = np.empty(long_slots, np.int64)
+    s_size = np.zeros((n_bars, n_cols))
+    s_hold_col = np.empty(short_slots, np.int64)
+    s_price = np.empty((short_slots, position_count))
+    s_tr_size = np.empty((short_slots, position_count))
+    s_count = np.zeros(short_slots, np.int64)
+    s_n_hold = 0
+    s_in_holdings = np.zeros(n_cols, np.bool_)
+    s_exited = np.zeros(n_cols, np.bool_)
+    s_exited_list = np.empty(short_slots, np.int64)
+
+    for i in range(n_bars):
+        last_bar = i == n_bars - 1
+        short_ledger.mark_short(short_liability(i, close, s_hold_col, s_tr_size, s_count, s_n_hold))
+        # 空头不计入 invested，多头空仓时就可以把台账的持仓成本归零
+        l_n_hold, l_n_exited = trend_update(i, last_bar, close, atr, long_exit, position_count, add_atr, long_stop, 1,
+                                            long_ledger, 0, l_size, l_hold_col, l_price,
+                                            l_tr_size, l_count, l_n_hold, l_in_holdings, l_exited, l_exited_list, long_journal)
+        s_n_hold, s_n_exited = trend_update(i, last_bar, close, atr, short_exit, position_count, add_atr, short_stop, -1,
+                                            short_ledger, 0, s_size, s_hold_col, s_price,
+                                            s_tr_size, s_count, s_n_hold, s_in_holdings, s_exited, s_exited_list, short_journal,
+                                            True)
+        if not last_bar:
+            if l_n_hold < long_slots:
+                l_n_hold = trend_entries(i, close, atr, long_mask, long_ptr, long_codes, bar_day, long_slots, position_count,
+                                         long_risk, long_weight, long_ledger, l_size, l_hold_col, l_price, l_tr_size, l_count,
+                                         l_n_hold, l_in_holdings, l_exited, long_journal)
+            if s_n_hold < short_slots:
+                s_n_hold = trend_entries(i, close, atr, short_mask, short_ptr, short_codes, bar_day, short_slots, position_count,
+                                         short_risk, short_weight, short_ledger, s_size, s_hold_col, s_price, s_tr_size, s_count,
+                                         s_n_hold, s_in_holdings, s_exited, short_journal, True)
+        clear_exited(l_exited, l_exited_list, l_n_exited)
+        clear_exited(s_exited, s_exited_list, s_n_exited)
+        long_ledger.record(i)
+        if not shared_capital:
+            short_ledger.record(i)
+
+    return l_size, s_size, long_ledger.records, short_ledger.records
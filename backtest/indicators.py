@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from numba import njit, prange
+
+# 滚动最高/最低价：按窗口长度分块，块内前缀/后缀极值（van Herk/Gil-Werman），每个值固定 3 次比较，和窗口长短无关
+# 所有币对列并行一次算完，结果和 pandas rolling(window, min_periods).max()/min() 一致：窗口内非 NaN 个数不足 min_periods 时为 NaN
+
+@njit(cache=True)
+def better(x, y, is_max):
+    if is_max:
+        return x if x >= y else y
+    return x if x <= y else y
+
+@njit(cache=True, parallel=True)
+def rolling_extrema_nb(a, window, min_periods, is_max, skip):
+    '''a 是 (币对, 时间) 的转置布局，每列在内存里连续；skip: 前 skip 行只用来填充窗口（增量计算时传入的历史），不输出'''
+    n_cols, n_rows = a.shape
+    out = np.full((n_cols, n_rows - skip), np.nan, dtype=a.dtype)
+    fill = -np.inf if is_max else np.inf
+    for col in prange(n_cols):
+        prefix = np.empty(n_rows, dtype=a.dtype)
+        suffix = np.empty(n_rows, dtype=a.dtype)
+        valid = np.zeros(n_rows + 1, np.int64)
+        for i in range(n_rows):
+            x = a[col, i]
+            if np.isnan(x):
+                x = fill
+                valid[i + 1] = valid[i]
+            else:
+                valid[i + 1] = valid[i] + 1
+            prefix[i] = x if i % window == 0 else better(prefix[i - 1], x, is_max)
+        for i in range(n_rows - 1, -1, -1):
+            x = a[col, i]
+            if np.isnan(x):
+                x = fill
+            suffix[i] = x if i == n_rows - 1 or (i + 1) % window == 0 else better(suffix[i + 1], x, is_max)
+        for i in range(skip, n_rows):
+            start = i - window + 1
+            if start <= 0:
+                if valid[i + 1] >= min_periods:
+                    out[col, i - skip] = prefix[i]
+            elif valid[i + 1] - valid[start] >= min_periods:
+                # [start, i] 最多跨两个块：前一块的后缀 + 当前块的前缀
+                out[col, i - skip] = better(suffix[start], prefix[i], is_max)
+    return out
+
+def rolling_extrema(values, window, is_max, min_periods=None, history=None):
+    '''
+    values: DataFrame / Series / ndarray，float32 或 float64
+    history: 可选，values 之前的若干行（至少 window - 1 行才和全量计算一致），用于新增 K 线后的增量计算
+    '''
+    min_periods = window if min_periods is None else max(min_periods, 1)
+    arr = np.asarray(values)
+    if arr.dtype not in (np.float32, np.float64):
+        arr = arr.astype(np.float64)
+    one_dim = arr.ndim == 1
+    arr = arr.reshape(len(arr), -1)
+    skip = 0
+    if history is not None:
+        hist = np.asarray(history, dtype=arr.dtype).reshape(-1, arr.shape[1])[-(window - 1):] if window > 1 else arr[:0]
+        skip = len(hist)
+        arr = np.concatenate([hist, arr])
+    out = rolling_extrema_nb(np.ascontiguousarray(arr.T), window, min_periods, is_max, skip).T
+    if one_dim:
+        out = out[:, 0]
+    if isinstance(values, pd.DataFrame):
+        return pd.DataFrame(out, index=values.index, columns=values.columns)
+    if isinstance(values, pd.Series):
+        return pd.Series(out, index=values.index, name=values.name)
+    return out
+
+def rolling_max(values, window, min_periods=None, history=None):
+    return rolling_extrema(values, window, True, min_periods, history)
+
+def rolling_min(values, window, min_periods=None, history=None):
+    return rolling_extrema(values, window, False, min_periods, history)
+
+def crossed_above(a, b):
+    '''a 从下方穿过 b（vbt 的 a.vbt.crossed_above(b)）'''
+    return (a > b) & (a.shift(1) <= b.shift(1))
+
+def average_true_range(high, low, close, window=14):
+    '''Wilder ATR'''
+    prev_close = close.shift(1)
+    true_range = np.maximum(high - low, np.maximum((high - prev_close).abs(), (low - prev_close).abs()))
+    return true_range.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
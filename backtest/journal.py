@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from numba import int64, from_dtype
+from numba.experimental import jitclass
+
+# 回测的成交事件日志：入场、加仓、出场（带出场原因）、资金不够跳过的信号，逐条写进预分配的结构化数组
+# 引擎里不再逐笔 print，跑完后一次转成 DataFrame，写成 run 的 events artifact（脚本里 export_csv 时另外导出 csv）；引擎的 journal 参数默认 None，不记录也没有额外开销
+
+# 预分配的事件条数，几年的小时线回测一般用不完，满了会自动扩容
+JOURNAL_CAPACITY = 100000
+
+EVENTS = ['entry', 'add', 'exit', 'skip']
+ENTRY, ADD, EXIT, SKIP = range(len(EVENTS))
+
+# breakdown: 跌破 low_window 低点（默认 21 日）；btc_regime: BTC < MA50；hold_days: 持有满 hold_days 天；
+# force_exit: 最后一根 bar 强制平仓；exit_signal: TrendCatcher 的 exit_mask（MA20 穿越或 BTC 过滤）；no_cash: 可用资金不够
+REASONS = ['', 'breakdown', 'btc_regime', 'hold_days', 'force_exit', 'stop_loss', 'exit_signal', 'no_cash']
+NO_REASON, BREAKDOWN, BTC_REGIME, HOLD_DAYS, FORCE_EXIT, STOP_LOSS, EXIT_SIGNAL, NO_CASH = range(len(REASONS))
+
+EVENT_DTYPE = np.dtype([
+    ('bar', np.int64),
+    ('col', np.int64),
+    ('event', np.int64),
+    ('reason', np.int64),
+    ('price', np.float64),
+    ('size', np.float64),
+    ('cash', np.float64),
+])
+
+@jitclass([
+    ('n', int64),
+    ('events', from_dtype(EVENT_DTYPE)[:]),
+])
+class Journal:
+    def __init__(self, capacity):
+        self.n = 0
+        self.events = np.empty(max(capacity, 1), dtype=EVENT_DTYPE)
+
+    def log(self, bar, col, event, reason, price, size, cash):
+        # 满了就扩容一倍，capacity 给得够大时不会发生
+        if self.n == len(self.events):
+            events = np.empty(2 * len(self.events), dtype=EVENT_DTYPE)
+            events[:self.n] = self.events
+            self.events = events
+        record = self.events[self.n]
+        record.bar = bar
+        record.col = col
+        record.event = event
+        record.reason = reason
+        record.price = price
+        record.size = size
+        record.cash = cash
+        self.n += 1
+
+def journal_frame(journal, index, columns, book=None):
+    '''
+    index/columns: 引擎输入面板的时间索引和币对，bar/col 换成时间和币对名
+    book: 多个持仓簿共用一个回测时的名字（如 'Long' / 'Short'），会加一列方便合并
+    '''
+    events = journal.events[:journal.n]
+    frame = pd.DataFrame({
+        'date': np.asarray(index)[events['bar']],
+        'coin_pair': np.asarray(columns)[events['col']],
+        'event': np.asarray(EVENTS)[events['event']],
+        'reason': np.asarray(REASONS)[events['reason']],
+        'price': events['price'],
+        'size': events['size'],
+        'cash': events['cash'],
+    })
+    if book is not None:
+        frame.insert(0, 'book', book)
+    return frame
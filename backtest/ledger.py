@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from numba import float64
+from numba.experimental import jitclass
+
+# 回测资金台账：现金、可用现金、持仓成本都是累加维护的，成交时 O(1) 更新，不用每次把所有持仓重新求和
+# 每根 bar 结束时 record 一行，最后再转成 DataFrame
+# 多空一起跑（simulate_long_short_nb）时空头按真实现金流记账：开空收入现金，平空付出现金，未平的空头是一笔按市值计的负债（short_value）
+
+CAPITAL_COLUMNS = ['Remaining Cash', 'Available Cash', 'Asset Value']
+
+@jitclass([
+    ('cash', float64),
+    ('available', float64),
+    ('invested', float64),
+    ('short_value', float64),
+    ('fees', float64),
+    ('cash_ratio', float64),
+    ('records', float64[:, :]),
+])
+class Ledger:
+    def __init__(self, n_bars, init_cash, fees, cash_ratio):
+        self.cash = init_cash
+        self.available = init_cash * cash_ratio
+        self.invested = 0.0
+        self.short_value = 0.0
+        self.fees = fees
+        self.cash_ratio = cash_ratio
+        self.records = np.full((n_bars, 3), np.nan)
+
+    @property
+    def asset_value(self):
+        # 和原来一样按进场价计算多头持仓价值，空头负债按最近一次 mark_short 的市值
+        return self.cash + self.invested - self.short_value
+
+    def update_available(self):
+        # 开空收入的现金要留着平仓，不能拿来开新仓
+        self.available = (self.cash - self.short_value) * self.cash_ratio
+
+    def buy(self, price, size):
+        self.cash -= size * price * (1 + self.fees)
+        self.update_available()
+        self.invested += price * size
+
+    def sell(self, price, size, cost_basis, flat):
+        '''cost_basis 是这笔持仓所有进场的 价格*数量 之和，flat 表示卖完后已经空仓'''
+        self.cash += price * size * (1 - self.fees)
+        self.update_available()
+        # 空仓时直接归零，避免累加误差一直带下去
+        self.invested = 0.0 if flat else self.invested - cost_basis
+
+    def short(self, price, size):
+        '''开空（或空头加仓）：卖出收入扣掉手续费记入现金，负债按成交价加上'''
+        self.cash += price * size * (1 - self.fees)
+        self.short_value += price * size
+        self.update_available()
+
+    def cover(self, price, size, flat):
+        '''平空：买回付出现金，负债按成交价减掉（调用前已经 mark_short 到这根 bar），flat 表示空头已经全部平掉'''
+        self.cash -= price * size * (1 + self.fees)
+        self.short_value = 0.0 if flat else self.short_value - price * size
+        self.update_available()
+
+    def mark_short(self, value):
+        '''每根 bar 开始时把未平空头的负债更新成 数量 * 现价'''
+        self.short_value = value
+        self.update_available()
+
+    def record(self, i):
+        self.records[i, 0] = self.cash
+        self.records[i, 1] = self.available
+        self.records[i, 2] = self.asset_value
+
+def ledger_frame(records, index):
+    return pd.DataFrame(records, index=index, columns=CAPITAL_COLUMNS)
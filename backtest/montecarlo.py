@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from backtest.stats import trade_ids
+from backtest.artifacts import ARTIFACT_DIR, load_artifact
+
+# 交易记录的 Monte Carlo：把每笔交易的收益率（占当时资金的比例）重新抽样/打乱顺序，看回撤和年化的分布
+# 所有模拟按批做成 (模拟次数, 交易笔数) 的矩阵，用对数收益 cumsum 一次算出整条净值，几万次模拟几秒内完成
+
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+def trades_from_run(run_id=None, strategy=None, folder=ARTIFACT_DIR):
+    '''读 run 保存的 trades parquet（tradelog.trade_table 的输出），返回 [entry_time, exit_time, pnl]，按平仓时间排序'''
+    trades = load_artifact('trades', run_id=run_id, strategy=strategy, folder=folder)
+    trades = trades[['entry_time', 'exit_time', 'pnl']]
+    return trades.dropna().sort_values('exit_time', kind='stable').reset_index(drop=True)
+
+def trades_from_tradelog(csv_path):
+    '''读 gen_tradelog 生成的旧 tradelog csv（没有 parquet 的老结果），返回 [entry_time, exit_time, pnl]，按平仓时间排序'''
+    df = pd.read_csv(csv_path)
+    entry_col = next(col for col in df.columns if col == '买入时间' or (col.startswith('首次') and col.endswith('时间')))
+    exit_col = '买回时间' if '买回时间' in df.columns else '卖出时间'
+    trades = pd.DataFrame({
+        'entry_time': pd.to_datetime(df[entry_col], utc=True),
+        'exit_time': pd.to_datetime(df[exit_col], utc=True),
+        'pnl': pd.to_numeric(df['PnL'], errors='coerce'),
+    })
+    return trades.dropna().sort_values('exit_time', kind='stable').reset_index(drop=True)
+
+def trades_from_orders(orders, direction=1):
+    '''
+    orders: pf.orders.records_readable（Column / Index 或 Fill Index / Size / Price / Fees / Side）
+    做多时 Sell 是平仓单，做空（direction=-1）时 Buy 是平仓单，中间的加仓都算进同一笔交易
+    '''
+    time_col = 'Fill Index' if 'Fill Index' in orders.columns else 'Index'
+    orders = orders.assign(_time=pd.to_datetime(orders[time_col], utc=True))
+    orders = orders.sort_values(['Column', '_time'], kind='stable')
+    cols = orders['Column'].to_numpy()
+    is_sell = (orders['Side'] == 'Sell').to_numpy()
+    is_close = is_sell if direction == 1 else ~is_sell
+    trade_id = trade_ids(cols, is_close)
+    flow = np.where(is_sell, 1, -1) * orders['Size'].to_numpy(float) * orders['Price'].to_numpy(float) - orders['Fees'].to_numpy(float)
+    grouped = pd.DataFrame({'trade_id': trade_id, 'time': orders['_time'].to_numpy(), 'flow': flow, 'is_close': is_close})
+    trades = grouped.groupby('trade_id').agg(entry_time=('time', 'first'), exit_time=('time', 'last'), pnl=('flow', 'sum'),
+                                             closed=('is_close', 'any'))
+    trades = trades[trades['closed']].drop(columns='closed')
+    return trades.sort_values('exit_time', kind='stable').reset_index(drop=True)
+
+def trade_returns(trades, init_cash=10000.0):
+    '''每笔盈亏除以这笔交易之前的总资金（和 tradelog 里的 PnL Ratio 一样按顺序复利），资金已经亏光之后的交易算 -100%'''
+    pnl = trades['pnl'].to_numpy(float)
+    capital_before = init_cash + np.cumsum(pnl) - pnl
+    return np.divide(pnl, capital_before, out=np.full(len(pnl), -1.0), where=capital_before > 0)
+
+def trade_years(trades):
+    '''第一笔开仓到最后一笔平仓的年数；只有一笔交易、所有交易在同一时刻或者没有交易时是 0 / NaN，这时不算年化'''
+    return (trades['exit_time'].max() - trades['entry_time'].min()) / pd.Timedelta(days=365)
+
+def log_growth(returns):
+    '''每笔收益率的对数增长，亏损超过 100%（资金亏光还倒欠）按 -100% 算，对数是 -inf'''
+    with np.errstate(divide='ignore'):
+        return np.log1p(np.maximum(np.asarray(returns, dtype=float), -1))
+
+def path_stats(log_path, years):
+    '''log_path: (模拟次数, 交易笔数) 的对数净值，起点 0（净值 1）不在矩阵里'''
+    peak = np.maximum(np.maximum.accumulate(log_path, axis=1), 0)
+    max_drawdown = 1 - np.exp((log_path - peak).min(axis=1))
+    total_return = np.expm1(log_path[:, -1])
+    if years > 0:
+        cagr = (1 + total_return) ** (1 / years) - 1
+    else:
+        cagr = np.full(len(total_return), np.nan)
+    return total_return, cagr, max_drawdown
+
+def simulate(returns, years, n_sims=10000, method='bootstrap', seed=None, batch_size=2000):
+    '''
+    method='bootstrap': 有放回抽样，最终收益也会变化；method='shuffle': 只打乱顺序，最终收益不变，只看回撤
+    返回每次模拟一行的 DataFrame：Total Return [%] / CAGR [%] / Max Drawdown [%]
+    '''
+    rng = np.random.default_rng(seed)
+    log_returns = log_growth(returns)
+    n_trades = len(log_returns)
+    out = np.empty((n_sims, 3))
+    for lo in range(0, n_sims, batch_size):
+        k = min(batch_size, n_sims - lo)
+        if method == 'bootstrap':
+            sample = log_returns[rng.integers(0, n_trades, (k, n_trades))]
+        elif method == 'shuffle':
+            sample = rng.permuted(np.tile(log_returns, (k, 1)), axis=1)
+        else:
+            raise ValueError(f"Unknown method: {method}")
+        out[lo:lo + k] = np.column_stack(path_stats(np.cumsum(sample, axis=1), years))
+    return pd.DataFrame(out * 100, columns=['Total Return [%]', 'CAGR [%]', 'Max Drawdown [%]'])
+
+def monte_carlo_summary(trades, init_cash=10000.0, n_sims=10000, method='bootstrap', seed=None, quantiles=QUANTILES):
+    '''各指标的分位数，Actual 是原始交易顺序的结果，Loss Probability [%] 是模拟里最终亏损的比例'''
+    returns = trade_returns(trades, init_cash)
+    years = trade_years(trades)
+    sims = simulate(returns, years, n_sims, method, seed)
+    summary = sims.quantile(quantiles).T
+    summary.columns = [f'{q:.0%}' for q in quantiles]
+    summary.insert(0, 'Mean', sims.mean())
+    actual = path_stats(np.cumsum(log_growth(returns))[None, :], years)
+    summary.insert(0, 'Actual', [value[0] * 100 for value in actual])
+    summary.loc['Loss Probability [%]'] = np.nan
+    summary.loc['Loss Probability [%]', 'Mean'] = (sims['Total Return [%]'] < 0).mean() * 100
+    return summary
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import tracemalloc
+import pandas as pd
+from backtest.artifacts import ARTIFACT_DIR, read_manifest
+
+# 回测各阶段（universe、读 OHLCV、指标、信号、模拟、Portfolio.from_orders、报告、tradelog…）的耗时和内存
+# 每个阶段记录 wall time、CPU time（进程的 user + sys，numba / numpy 多线程时会大于 wall）、阶段内的峰值 RSS
+# trace_memory=True 时再用 tracemalloc 记录阶段内 Python + numpy 分配的峰值（有额外开销，默认关）
+# 每次 run 写一份 profile.json 到 runs/<run_id>/，profile_history 把所有 run 的结果拼起来看回归
+
+PROFILE_FILE = 'profile.json'
+MB = 1024 * 1024
+
+def current_rss():
+    '''当前 RSS（MB），只在 Linux 上有 /proc'''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError):
+        return float('nan')
+
+def peak_rss():
+    '''进程的峰值 RSS（MB）：Linux 上读 VmHWM（可以被 reset_peak_rss 清零），其他系统用 ru_maxrss'''
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 的单位是字节，Linux 是 KB
+    return maxrss / MB if sys.platform == 'darwin' else maxrss / 1024
+
+def reset_peak_rss():
+    '''把 VmHWM 重置成当前 RSS，之后读到的就是这个阶段的峰值；不支持时返回 False（峰值是整个进程到目前为止的）'''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+class Profiler:
+    '''
+    profiler.stage('load_ohlcv') 开始一个阶段，同时结束上一个；也可以 with profiler.stage('simulation'): ...
+    finish() 结束最后一个阶段，summary() 是可以写成 json 的 dict，table() 是每个阶段一行的 DataFrame
+    '''
+    def __init__(self, name, trace_memory=False):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.started = pd.Timestamp.now(tz='UTC')
+        self.meta = {}
+        self.stages = []
+        self.current = None
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.wall_total = None
+        self.cpu_total = None
+        self.peak_rss = None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name):
+        self.end()
+        rss_reset = reset_peak_rss()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.current = {
+            'stage': name,
+            'rss_start': current_rss(),
+            'rss_reset': rss_reset,
+            'wall': time.perf_counter(),
+            'cpu': time.process_time(),
+        }
+        return self
+
+    def end(self):
+        if self.current is None:
+            return
+        wall = time.perf_counter() - self.current['wall']
+        cpu = time.process_time() - self.current['cpu']
+        record = {
+            'stage': self.current['stage'],
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'cpu_util': cpu / wall if wall > 0 else float('nan'),
+            'rss_start_mb': self.current['rss_start'],
+            'rss_end_mb': current_rss(),
+            'peak_rss_mb': peak_rss(),
+            'peak_rss_is_stage': self.current['rss_reset'],
+        }
+        if self.trace_memory:
+            record['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / MB
+        self.stages.append(record)
+        self.current = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.end()
+
+    def finish(self):
+        self.end()
+        self.wall_total = time.perf_counter() - self.wall_start
+        self.cpu_total = time.process_time() - self.cpu_start
+        # VmHWM 每个阶段都重置过，进程的峰值取各阶段的最大值
+        peaks = [record['peak_rss_mb'] for record in self.stages]
+        self.peak_rss = max(peaks) if peaks else peak_rss()
+        if self.trace_memory:
+            tracemalloc.stop()
+        return self
+
+    def table(self):
+        columns = ['stage', 'wall_s', 'cpu_s', 'cpu_util', 'rss_start_mb', 'rss_end_mb', 'peak_rss_mb']
+        if self.trace_memory:
+            columns.append('traced_peak_mb')
+        table = pd.DataFrame(self.stages, columns=columns + ['peak_rss_is_stage'])[columns]
+        if self.wall_total:
+            table['wall_pct'] = table['wall_s'] / self.wall_total * 100
+        return table
+
+    def summary(self):
+        if self.wall_total is None:
+            self.finish()
+        return {
+            'name': self.name,
+            'started': self.started.isoformat(),
+            'wall_s': self.wall_total,
+            'cpu_s': self.cpu_total,
+            'peak_rss_mb': self.peak_rss,
+            'host': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'machine': platform.machine(),
+                'cpu_count': os.cpu_count(),
+            },
+            'meta': self.meta,
+            'stages': self.stages,
+        }
+
+    def write(self, path):
+        '''path 是目录时写到 目录/profile.json（例如 run.path）'''
+        if os.path.isdir(path):
+            path = os.path.join(path, PROFILE_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+def read_profile(path):
+    if os.path.isdir(path):
+        path = os.path.join(path, PROFILE_FILE)
+    with open(path) as f:
+        return json.load(f)
+
+def profile_history(folder=ARTIFACT_DIR, strategy=None):
+    '''
+    所有带 profile.json 的 run，一个阶段一行：run_id / strategy / started / stage / wall_s / cpu_s / peak_rss_mb…
+    按 started 排序，history.pivot(index='run_id', columns='stage', values='wall_s') 就能看每个阶段随时间的变化
+    '''
+    rows = []
+    if os.path.isdir(folder):
+        for run_id in os.listdir(folder):
+            run_path = os.path.join(folder, run_id)
+            if not os.path.exists(os.path.join(run_path, PROFILE_FILE)):
+                continue
+            profile = read_profile(run_path)
+            try:
+                run_strategy = read_manifest(run_path)['strategy']
+            except OSError:
+                run_strategy = profile['name']
+            if strategy is not None and run_strategy != strategy:
+                continue
+            for record in profile['stages']:
+                rows.append({'run_id': run_id, 'strategy': run_strategy, 'started': profile['started'], **record})
+    history = pd.DataFrame(rows)
+    if history.empty:
+        return history
+    history['started'] = pd.to_datetime(history['started'])
+    return history.sort_values('started', kind='stable').reset_index(drop=True)
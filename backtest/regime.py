@@ -0,0 +1,44 @@
+import hashlib
+import numpy as np
+
+# BTC 牛熊过滤：收盘价在 MA 上方为 bull，下方为 bear
+# 同一份 BTC 日线（数据快照）每个 MA 长度只算一次，入场、出场和几个策略脚本共用
+
+_daily_cache = {}
+
+def snapshot_key(btc_close_1d):
+    h = hashlib.sha1()
+    h.update(btc_close_1d.index.as_unit('ns').asi8.tobytes())
+    h.update(np.ascontiguousarray(btc_close_1d.to_numpy(dtype=float)).tobytes())
+    return h.hexdigest()
+
+def btc_regime(btc_close_1d, window=50, key=None):
+    '''返回日线 (bull, bear)：bull = MA < 收盘价，bear = MA > 收盘价，MA 还没有值的日期两者都是 False'''
+    key = (snapshot_key(btc_close_1d) if key is None else key, window)
+    if key not in _daily_cache:
+        # 简单移动平均，和 vbt.MA.run(btc_close_1d, window) 默认的 SMA 一样
+        ma = btc_close_1d.rolling(window).mean()
+        _daily_cache[key] = (ma < btc_close_1d, ma > btc_close_1d)
+    return _daily_cache[key]
+
+class BtcRegime:
+    def __init__(self, btc_close_1d, to_hourly):
+        self.btc_close_1d = btc_close_1d
+        self.to_hourly = to_hourly
+        self.key = snapshot_key(btc_close_1d)
+        self._hourly_cache = {}
+
+    def daily(self, window=50):
+        return btc_regime(self.btc_close_1d, window, self.key)
+
+    def hourly(self, window=50):
+        if window not in self._hourly_cache:
+            bull, bear = self.daily(window)
+            self._hourly_cache[window] = (self.to_hourly(bull), self.to_hourly(bear))
+        return self._hourly_cache[window]
+
+    def bull(self, window=50):
+        return self.hourly(window)[0]
+
+    def bear(self, window=50):
+        return self.hourly(window)[1]
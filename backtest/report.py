@@ -0,0 +1,178 @@
+import html
+import numpy as np
+import pandas as pd
+
+# 轻量的回测报告：代替 qs.reports.html 生成的几万行 html，只算常看的指标
+# CAGR / Sharpe / Sortino / 回撤 / 月度收益表 / 和 BTC 的对比，全部对整个 DataFrame 向量化计算
+# 一列一个策略（或一组参数），sweep 里几百个组合一起算也只要几毫秒；输出精简的 html 或 markdown
+# 加密货币 7x24 交易，按一年 365 天年化
+
+PERIODS_PER_YEAR = 365
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+def to_daily(returns):
+    '''小时（或更细）的收益率按天复利合成日收益率，已经是日线时原样返回；NaN 当 0'''
+    returns = returns.fillna(0.0)
+    if len(returns.index) > 1 and (returns.index[1:] - returns.index[:-1]).min() < pd.Timedelta(days=1):
+        returns = np.expm1(np.log1p(returns).groupby(returns.index.normalize()).sum())
+    return returns
+
+def drawdown_series(returns):
+    '''每天相对之前最高净值的回撤（负数），起始净值 1 也算高点'''
+    wealth = (1 + returns).cumprod()
+    return wealth / np.maximum(wealth.cummax(), 1.0) - 1
+
+def longest_run(flags):
+    '''每列连续 True 的最长天数'''
+    count = flags.cumsum()
+    return (count - count.where(~flags).ffill().fillna(0)).max()
+
+def performance_metrics(returns, periods_per_year=PERIODS_PER_YEAR):
+    '''returns: 日收益率，Series 或一列一个策略的 DataFrame；返回 指标 × 策略 的 DataFrame'''
+    returns = to_daily(returns.to_frame() if isinstance(returns, pd.Series) else returns)
+    n = returns.count()
+    total = np.expm1(np.log1p(returns).sum())
+    years = n / periods_per_year
+    cagr = (1 + total) ** (1 / years) - 1
+    std = returns.std(ddof=1)
+    downside = np.sqrt((returns.clip(upper=0) ** 2).sum() / n)
+    drawdown = drawdown_series(returns)
+    max_drawdown = drawdown.min()
+    traded = returns != 0
+    return pd.DataFrame({
+        'Total Return [%]': total * 100,
+        'CAGR [%]': cagr * 100,
+        'Volatility (ann.) [%]': std * np.sqrt(periods_per_year) * 100,
+        'Sharpe Ratio': returns.mean() / std * np.sqrt(periods_per_year),
+        'Sortino Ratio': returns.mean() / downside * np.sqrt(periods_per_year),
+        'Max Drawdown [%]': max_drawdown * 100,
+        'Longest Drawdown [days]': longest_run(drawdown < 0),
+        'Calmar Ratio': cagr / -max_drawdown,
+        'Win Days [%]': (returns > 0).sum() / traded.sum() * 100,
+        'Best Day [%]': returns.max() * 100,
+        'Worst Day [%]': returns.min() * 100,
+    }).T
+
+def benchmark_metrics(returns, benchmark, periods_per_year=PERIODS_PER_YEAR):
+    '''每个策略相对 benchmark（BTC）的 Beta / 年化 Alpha / 相关系数，只用两边都有数据的日子'''
+    returns = to_daily(returns.to_frame() if isinstance(returns, pd.Series) else returns)
+    benchmark = to_daily(benchmark.dropna())
+    common = returns.index.intersection(benchmark.index)
+    returns, benchmark = returns.loc[common], benchmark.loc[common]
+    r = returns - returns.mean()
+    b = benchmark - benchmark.mean()
+    cov = r.mul(b, axis=0).sum() / (len(b) - 1)
+    beta = cov / benchmark.var(ddof=1)
+    return pd.DataFrame({
+        'Beta': beta,
+        'Alpha (ann.) [%]': (returns.mean() - beta * benchmark.mean()) * periods_per_year * 100,
+        'Correlation': cov / (returns.std(ddof=1) * benchmark.std(ddof=1)),
+    }).T
+
+def monthly_returns(returns):
+    '''年 × 月 的复利月收益率（小数），最后一列 Year 是全年'''
+    returns = to_daily(returns)
+    log_returns = np.log1p(returns)
+    monthly = np.expm1(log_returns.groupby([returns.index.year, returns.index.month]).sum()).unstack()
+    monthly = monthly.reindex(columns=range(1, 13))
+    monthly.columns = MONTHS
+    monthly['Year'] = np.expm1(log_returns.groupby(returns.index.year).sum())
+    monthly.index.name = None
+    return monthly
+
+def monthly_returns_md(returns):
+    '''和 BreakoutCatcher/monthlyReturns.md 一样的格式：一行一个月，没有交易（收益为 0）的月份不写'''
+    monthly = monthly_returns(returns).drop(columns='Year').stack().dropna()
+    monthly = monthly[monthly != 0]
+    return '\n'.join(f'{year}-{MONTHS.index(month) + 1:02d}: {value:.2%}' for (year, month), value in monthly.items()) + '\n'
+
+def drawdown_periods(returns, top=5):
+    '''最深的几次回撤：开始、最低点、恢复（还没恢复是 NaT）、回撤幅度、持续天数'''
+    returns = to_daily(returns)
+    drawdown = drawdown_series(returns)
+    in_drawdown = (drawdown < 0).to_numpy()
+    edges = np.diff(np.r_[0, in_drawdown.astype(np.int8), 0])
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return pd.DataFrame(columns=['Start', 'Valley', 'End', 'Drawdown [%]', 'Days'])
+    # 每段回撤的最低点：按 (段, 回撤) 排序后每段的第一个
+    values = drawdown.to_numpy()
+    segment = np.searchsorted(starts, np.arange(len(values)), side='right') - 1
+    order = np.lexsort((values, segment))
+    order = order[segment[order] >= 0]
+    valley = order[np.r_[True, segment[order][1:] != segment[order][:-1]]]
+    depth = values[valley]
+    index = drawdown.index
+    recovered = ends < len(index)
+    periods = pd.DataFrame({
+        'Start': index[starts],
+        'Valley': index[valley],
+        'End': index[np.minimum(ends, len(index) - 1)].where(recovered, pd.NaT),
+        'Drawdown [%]': depth * 100,
+        'Days': ends - starts,
+    })
+    return periods.sort_values('Drawdown [%]', kind='stable').head(top).reset_index(drop=True)
+
+def summary_table(returns, benchmark=None, name='Strategy', benchmark_name='BTC'):
+    metrics = performance_metrics(returns.rename(name))
+    if benchmark is not None:
+        metrics[benchmark_name] = performance_metrics(benchmark.rename(benchmark_name))[benchmark_name]
+        relative = benchmark_metrics(returns.rename(name), benchmark)
+        metrics = pd.concat([metrics, relative])
+    return metrics
+
+def format_value(value, pct=False):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+        return '-'
+    if isinstance(value, (float, np.floating)):
+        return f'{value:.2%}' if pct else f'{value:,.2f}'
+    return str(value)
+
+def markdown_table(frame, pct=False):
+    header = '| |' + '|'.join(str(col) for col in frame.columns) + '|'
+    rows = ['|' + str(idx) + '|' + '|'.join(format_value(v, pct) for v in row) + '|' for idx, row in zip(frame.index, frame.to_numpy(dtype=object))]
+    return '\n'.join([header, '|' + '---|' * (len(frame.columns) + 1)] + rows)
+
+def html_table(frame, pct=False, colored=False):
+    head = ''.join(f'<th>{html.escape(str(col))}</th>' for col in frame.columns)
+    body = []
+    for idx, row in zip(frame.index, frame.to_numpy(dtype=object)):
+        cells = []
+        for value in row:
+            style = ''
+            if colored and isinstance(value, (float, np.floating)) and not np.isnan(value) and value != 0:
+                style = ' class="pos"' if value > 0 else ' class="neg"'
+            cells.append(f'<td{style}>{html.escape(format_value(value, pct))}</td>')
+        body.append(f'<tr><th>{html.escape(str(idx))}</th>{"".join(cells)}</tr>')
+    return f'<table><tr><th></th>{head}</tr>{"".join(body)}</table>'
+
+HTML_STYLE = ('body{font-family:sans-serif;margin:24px}table{border-collapse:collapse;margin-bottom:24px}'
+              'th,td{border:1px solid #ddd;padding:4px 8px;text-align:right}.pos{color:#1a7f37}.neg{color:#cf222e}')
+
+def render_report(returns, benchmark=None, title='Backtest Report', fmt='html'):
+    '''returns/benchmark: 收益率 Series（小时或日线都可以）；fmt 是 'html' 或 'md'''
+    returns = to_daily(returns)
+    benchmark = None if benchmark is None else to_daily(benchmark)
+    sections = [
+        ('Key Metrics', summary_table(returns, benchmark), False, False),
+        ('Monthly Returns', monthly_returns(returns), True, True),
+        ('Worst Drawdowns', drawdown_periods(returns).rename(index=lambda i: i + 1), False, False),
+    ]
+    period = f'{returns.index[0]:%Y-%m-%d} ~ {returns.index[-1]:%Y-%m-%d}'
+    if fmt == 'md':
+        parts = [f'# {title}', period]
+        parts += [f'## {name}\n\n{markdown_table(frame, pct)}' for name, frame, pct, _ in sections]
+        return '\n\n'.join(parts) + '\n'
+    parts = [f'<h1>{html.escape(title)}</h1><p>{period}</p>']
+    parts += [f'<h2>{name}</h2>{html_table(frame, pct, colored)}' for name, frame, pct, colored in sections]
+    return f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>' \
+           f'<style>{HTML_STYLE}</style></head><body>{"".join(parts)}</body></html>'
+
+def write_report(returns, benchmark=None, output='report.html', title='Backtest Report'):
+    '''按扩展名写 .html 或 .md'''
+    fmt = 'md' if output.endswith('.md') else 'html'
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(render_report(returns, benchmark, title, fmt))
+    return output
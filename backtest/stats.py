@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# 不经过 vbt，直接从引擎输出的 size 矩阵和收盘价算组合净值和 pf.stats() 里常看的指标
+# 成交价就是收盘价，手续费按成交额收，和脚本里 Portfolio.from_orders(price=close, fees=fees) 的设置一致
+
+HOURS_PER_YEAR = 365 * 24
+
+def portfolio_value(size, close, init_cash=10000.0, fees=0.001, direction=1):
+    '''每根 bar 收盘后的组合价值；direction=-1 表示 size 是做空的数量（正数开空，负数平空）'''
+    size = np.asarray(size, dtype=float)
+    price = pd.DataFrame(np.asarray(close, dtype=float)).ffill().to_numpy()
+    traded = size * np.nan_to_num(price)
+    cash = init_cash + np.cumsum((-direction * traded - np.abs(traded) * fees).sum(axis=1))
+    position = direction * np.cumsum(size, axis=0)
+    return cash + np.nansum(position * price, axis=1)
+
+def trade_ids(cols, is_close):
+    '''订单已按 (币对, 时间) 排序：每列的第一笔、或者上一笔是平仓单时，开始一笔新交易，返回每笔订单所属的交易编号'''
+    new_trade = np.ones(len(cols), dtype=bool)
+    new_trade[1:] = is_close[:-1] | (cols[1:] != cols[:-1])
+    return np.cumsum(new_trade) - 1
+
+def trade_pnl(size, close, fees=0.001, direction=1):
+    '''
+    每笔完整交易（开仓 → 加仓 → 清仓）的盈亏，含手续费，按 (币对, 时间) 排序
+    引擎只会整笔平仓，负的 size 就是平仓单；最后一根 bar 会强制平仓，所以每列的最后一笔都是平仓
+    '''
+    size = np.asarray(size, dtype=float)
+    rows, cols = np.nonzero(size)
+    order = np.lexsort((rows, cols))
+    rows, cols = rows[order], cols[order]
+    amount = size[rows, cols]
+    traded = amount * np.asarray(close, dtype=float)[rows, cols]
+    flow = -direction * traded - np.abs(traded) * fees
+    is_close = amount < 0
+    trade_id = trade_ids(cols, is_close)
+    n_trades = trade_id[-1] + 1 if len(trade_id) else 0
+    pnl = np.bincount(trade_id, weights=flow, minlength=n_trades)
+    closed = np.bincount(trade_id, weights=is_close, minlength=n_trades) > 0
+    return pnl[closed]
+
+def equity_stats(value, init_cash=10000.0, periods_per_year=HOURS_PER_YEAR):
+    '''只依赖净值曲线的指标，拼接后的样本外净值也用这个'''
+    value = np.asarray(value, dtype=float)
+    returns = np.diff(value, prepend=init_cash) / np.concatenate([[init_cash], value[:-1]])
+    drawdown = 1 - value / np.maximum.accumulate(np.maximum(value, init_cash))
+    max_drawdown = drawdown.max() if len(drawdown) else 0.0
+    total_return = value[-1] / init_cash - 1 if len(value) else 0.0
+    years = len(value) / periods_per_year
+    annualized = (1 + total_return) ** (1 / years) - 1 if years > 0 and total_return > -1 else np.nan
+    std = returns.std(ddof=1) if len(returns) > 1 else np.nan
+    return {
+        'Start Value': float(init_cash),
+        'End Value': value[-1] if len(value) else float(init_cash),
+        'Total Return [%]': total_return * 100,
+        'Max Drawdown [%]': max_drawdown * 100,
+        'Sharpe Ratio': returns.mean() / std * np.sqrt(periods_per_year) if std > 0 else np.nan,
+        'Calmar Ratio': annualized / max_drawdown if max_drawdown > 0 else np.inf,
+    }
+
+def portfolio_stats(size, close, init_cash=10000.0, fees=0.001, direction=1, periods_per_year=HOURS_PER_YEAR):
+    '''返回 pd.Series，指标名和 vbt 的 pf.stats() 一致，方便直接对比'''
+    value = portfolio_value(size, close, init_cash, fees, direction)
+    equity = equity_stats(value, init_cash, periods_per_year)
+
+    size = np.asarray(size, dtype=float)
+    traded = np.abs(size * np.nan_to_num(np.asarray(close, dtype=float)))
+    pnl = trade_pnl(size, close, fees, direction)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+
+    return pd.Series({
+        'Start Value': equity['Start Value'],
+        'End Value': equity['End Value'],
+        'Total Return [%]': equity['Total Return [%]'],
+        'Max Drawdown [%]': equity['Max Drawdown [%]'],
+        'Total Orders': int(np.count_nonzero(size)),
+        'Total Fees Paid': traded.sum() * fees,
+        'Total Trades': len(pnl),
+        'Win Rate [%]': len(wins) / len(pnl) * 100 if len(pnl) else np.nan,
+        'Profit Factor': wins.sum() / -losses.sum() if len(losses) else np.inf,
+        'Expectancy': pnl.mean() if len(pnl) else np.nan,
+        'Sharpe Ratio': equity['Sharpe Ratio'],
+        'Calmar Ratio': equity['Calmar Ratio'],
+    })
+
+def pnl_attribution(sizes, close, init_cash=10000.0, fees=0.001, index=None, directions=None):
+    '''
+    sizes: {策略名: size 矩阵}，共用一个账户的多个策略各自的订单；directions: {策略名: 1 或 -1}，默认都是做多
+    返回每个策略的累计盈亏（含手续费、按收盘价计浮盈）和组合总价值，各策略盈亏之和 + init_cash 就是组合价值
+    '''
+    directions = {} if directions is None else directions
+    attribution = {name: portfolio_value(size, close, 0.0, fees, directions.get(name, 1)) for name, size in sizes.items()}
+    attribution['Total Value'] = init_cash + sum(attribution.values())
+    return pd.DataFrame(attribution, index=index)
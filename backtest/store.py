@@ -0,0 +1,172 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# 把 allpairs/<timeframe> 下几百个单币对 feather 合并成一个 Arrow IPC 文件：
+# 每个币对一个 record batch（按 date 排序），读取时 memory map，零拷贝切片后只转一次 pandas
+# 按日期范围读取时在 batch 里二分查找切片，不需要再按日期分区成多个文件
+# store 是可以随时重建的缓存，放在 gitignore 的 runs/_store/ 下，不写进原始数据目录
+
+STORE_DIR = os.path.join('runs', '_store')
+STORE_FILE = 'ohlcv.arrow'
+MANIFEST_FILE = 'manifest.json'
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+MAX_WORKERS = min(16, os.cpu_count() or 1)
+SCHEMA = pa.schema([('date', pa.timestamp('ns', tz='UTC'))] + [(col, pa.float64()) for col in OHLCV_COLUMNS])
+
+def list_pair_files(data_folder):
+    '''返回 {coin_pair: 文件名}，币对名取文件名 - 前面的部分'''
+    files = {}
+    for filename in sorted(os.listdir(data_folder)):
+        if filename.endswith('.feather'):
+            files[filename.split('-')[0]] = filename
+    return files
+
+def fingerprint(data_folder):
+    '''源文件的大小和修改时间，任何一个变化都会让 store 失效'''
+    result = {}
+    for coin_pair, filename in list_pair_files(data_folder).items():
+        stat = os.stat(os.path.join(data_folder, filename))
+        result[filename] = [stat.st_size, stat.st_mtime_ns]
+    return result
+
+def read_pair_file(file_path):
+    # 直接用 pyarrow 读，读文件和排序都不持有 GIL，线程池才能真正并行
+    table = feather.read_table(file_path)
+    if 'date' not in table.column_names or table.num_rows == 0:
+        return None
+    table = table.select(['date'] + OHLCV_COLUMNS).sort_by('date').cast(SCHEMA)
+    return table.combine_chunks().to_batches()[0]
+
+def read_pair_files(data_folder, files, max_workers=MAX_WORKERS):
+    '''并发读取 {coin_pair: 文件名}，按原顺序返回 [(coin_pair, batch)]，读失败的文件打印后跳过'''
+    def read(item):
+        coin_pair, filename = item
+        try:
+            return coin_pair, read_pair_file(os.path.join(data_folder, filename))
+        except Exception as e:
+            print(f"Error reading {filename}: {e}")
+            return coin_pair, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(read, files.items()))
+    return [(coin_pair, batch) for coin_pair, batch in results if batch is not None]
+
+def store_path(data_folder):
+    '''data_folder 的 store 目录：STORE_DIR/<目录名>_<绝对路径的 hash>，1d、1h 等不同的数据目录互不覆盖'''
+    data_folder = os.path.abspath(data_folder)
+    digest = hashlib.sha1(data_folder.encode()).hexdigest()[:8]
+    return os.path.join(STORE_DIR, f'{os.path.basename(data_folder)}_{digest}')
+
+def build_store(data_folder, max_workers=MAX_WORKERS):
+    store_folder = store_path(data_folder)
+    os.makedirs(store_folder, exist_ok=True)
+    pairs = []
+    tmp_path = os.path.join(store_folder, STORE_FILE + '.tmp')
+    batches = read_pair_files(data_folder, list_pair_files(data_folder), max_workers)
+
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+        for coin_pair, batch in batches:
+            writer.write_batch(batch)
+            pairs.append(coin_pair)
+
+    os.replace(tmp_path, os.path.join(store_folder, STORE_FILE))
+    manifest = {'pairs': pairs, 'fingerprint': fingerprint(data_folder)}
+    with open(os.path.join(store_folder, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+class OhlcvStore:
+    def __init__(self, data_folder):
+        store_folder = store_path(data_folder)
+        with open(os.path.join(store_folder, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.pairs = self.manifest['pairs']
+        self._batch_index = {coin_pair: i for i, coin_pair in enumerate(self.pairs)}
+        self._source = pa.memory_map(os.path.join(store_folder, STORE_FILE), 'r')
+        self._reader = pa.ipc.open_file(self._source)
+
+    def __contains__(self, coin_pair):
+        return coin_pair in self._batch_index
+
+    def read_batch(self, coin_pair, start=None, end=None, columns=None):
+        '''读取单个币对，start/end（含）和 columns 在 Arrow 层零拷贝切片，不会把整段历史转成 pandas'''
+        batch = self._reader.get_batch(self._batch_index[coin_pair])
+        if start is not None or end is not None:
+            dates = batch.column('date').to_numpy(zero_copy_only=True)
+            lo = 0 if start is None else np.searchsorted(dates, pd.Timestamp(start).to_datetime64(), side='left')
+            hi = len(dates) if end is None else np.searchsorted(dates, pd.Timestamp(end).to_datetime64(), side='right')
+            batch = batch.slice(lo, max(hi - lo, 0))
+        if columns is not None:
+            batch = batch.select(['date'] + [col for col in columns if col != 'date'])
+        return batch
+
+    def read_long(self, pairs=None, start=None, end=None, columns=None):
+        '''所有币对拼成一张长表（带 coin_pair 列），对应原来的 pd.concat(all_data)'''
+        pairs = self.pairs if pairs is None else [p for p in pairs if p in self]
+        batches = [self.read_batch(p, start, end, columns) for p in pairs]
+        names = SCHEMA.names if columns is None else ['date'] + [col for col in columns if col != 'date']
+        schema = pa.schema([SCHEMA.field(name) for name in names])
+        table = pa.Table.from_batches(batches, schema=schema)
+        codes = np.repeat(np.arange(len(pairs), dtype=np.int32), [b.num_rows for b in batches])
+        coin_pair = pa.DictionaryArray.from_arrays(codes, pa.array(pairs, pa.string())).cast(pa.string())
+        table = table.append_column('coin_pair', coin_pair)
+        return table.to_pandas()
+
+    def read_frame(self, coin_pair, start=None, end=None, columns=None):
+        df = self.read_batch(coin_pair, start, end, columns).to_pandas()
+        df.set_index('date', inplace=True)
+        return df
+
+def open_store(data_folder, max_workers=MAX_WORKERS):
+    '''打开 store，源文件有变化（新增/删除/更新）时自动重建'''
+    manifest_path = os.path.join(store_path(data_folder), MANIFEST_FILE)
+    stale = True
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            stale = json.load(f).get('fingerprint') != fingerprint(data_folder)
+    if stale:
+        print(f"Building OHLCV store for {data_folder}")
+        build_store(data_folder, max_workers)
+    return OhlcvStore(data_folder)
+
+def load_daily(data_folder, start=None, end=None, columns=None, max_workers=MAX_WORKERS):
+    return open_store(data_folder, max_workers).read_long(start=start, end=end, columns=columns)
+
+def load_ohlcv_dict(data_folder, pairs, start=None, end=None, columns=None, max_workers=MAX_WORKERS):
+    '''start 可以是单个时间，也可以是 {coin_pair: 起始时间}，每个币对只读它用得到的那一段'''
+    store = open_store(data_folder, max_workers)
+    ohlcv_dict = {}
+    for coin_pair in pairs:
+        if coin_pair in store:
+            pair_start = start.get(coin_pair) if isinstance(start, dict) else start
+            ohlcv_dict[coin_pair] = store.read_frame(coin_pair, pair_start, end, columns)
+        else:
+            print(f"File not found: {coin_pair} in {data_folder}")
+    return ohlcv_dict
+
+def pair_windows(df_filtered, warmup):
+    '''每个币对第一次进入 universe 的日期往前推 warmup，作为 1h 数据的读取起点'''
+    return (df_filtered.groupby('coin_pair')['date'].min() - warmup).to_dict()
+
+def load_daily_bars(data_folder_1h, pairs, end=None, max_workers=MAX_WORKERS):
+    '''
+    每个币对完整历史的 1h high/low/close 聚合成日线，返回 [high_1d, low_1d, close_1d]，列是币对
+    和整段 1h 面板上 resample('D') 的结果一样，不受 pair_windows 截断：ATR 是递归平滑的，要从上市第一天算起才和全量读取时一致
+    一个币对读完马上聚合，多占的内存只有日线的大小
+    '''
+    store = open_store(data_folder_1h, max_workers)
+    daily = {}
+    for coin_pair in pairs:
+        if coin_pair in store:
+            frame = store.read_frame(coin_pair, end=end, columns=['high', 'low', 'close'])
+            daily[coin_pair] = frame.resample('D').agg({'high': 'max', 'low': 'min', 'close': 'last'})
+        else:
+            print(f"File not found: {coin_pair} in {data_folder_1h}")
+    return [pd.concat({coin_pair: frame[field] for coin_pair, frame in daily.items()}, axis=1).sort_index()
+            for field in ('high', 'low', 'close')]
@@ -0,0 +1,71 @@
+from backtest.universe import rank_index
+from backtest.indicators import rolling_max, rolling_min
+from backtest.engine import simulate_breakout_nb, simulate_trend_nb
+from backtest.stats import portfolio_stats, portfolio_value
+
+# 参数扫描用的单次回测：输入是共享内存里的面板 {名字: ndarray}，输出 portfolio_stats 的指标
+# 和 vbt 脚本里的流程一致，只是把和扫描参数无关的部分（对齐后的 BTC 过滤、MA20 信号、ATR、各窗口的突破信号）提前在主进程算好
+# start/end 是 bar 的行号范围，walk-forward 的每个 fold 只回测这一段，开头空仓、最后一根 bar 强制平仓
+
+def universe_key(window, top_n):
+    return f'{window}_{top_n}'
+
+def universe_panels(universes, index, columns):
+    '''universes: {(window, top_n): df_filtered}，每个 universe 的 CSR 排名索引各存一份，bar_day 所有 universe 共用'''
+    panels = {}
+    for (window, top_n), df_filtered in universes.items():
+        day_ptr, day_codes, bar_day = rank_index(df_filtered, index, columns)
+        key = universe_key(window, top_n)
+        panels[f'day_ptr:{key}'] = day_ptr
+        panels[f'day_codes:{key}'] = day_codes
+        panels['bar_day'] = bar_day
+    return panels
+
+def breakout_panels(high, low, high_windows, low_windows):
+    '''每个窗口的突破/跌破信号只算一次，存成 bool 面板，所有组合和 fold 共用'''
+    panels = {}
+    for window in set(high_windows):
+        panels[f'breakout:{window}'] = high >= rolling_max(high, window)
+    for window in set(low_windows):
+        panels[f'breakdown:{window}'] = low <= rolling_min(low, window)
+    return panels
+
+def task_result(size, close, init_cash, fees, direction, curve):
+    stats = portfolio_stats(size, close, init_cash, fees, direction)
+    if curve:
+        return {'stats': stats, 'value': portfolio_value(size, close, init_cash, fees, direction)}
+    return stats
+
+def breakout_task(panels, window=11, top_n=32, high_window=30*24, low_window=21*24, max_slots=10, hold_days=2,
+                  init_cash=10000.0, fees=0.001, start=0, end=None, curve=False):
+    '''
+    panels: close/high/low (bar, 币对)，bull/bear 每根 bar 的 BTC 过滤，tradable 每个币对能否入场（BTC 本身不做），timestamps
+    breakout:{窗口}/breakdown:{窗口} 有预先算好的就直接用；universe 的限制由 CSR 排名索引保证，入场 mask 只需要突破 & BTC 过滤
+    '''
+    key = universe_key(window, top_n)
+    rows = slice(start, end)
+    breakout = panels.get(f'breakout:{high_window}')
+    if breakout is None:
+        breakout = panels['high'] >= rolling_max(panels['high'], high_window)
+    breakdown = panels.get(f'breakdown:{low_window}')
+    if breakdown is None:
+        breakdown = panels['low'] <= rolling_min(panels['low'], low_window)
+    close = panels['close'][rows]
+    mask = breakout[rows] & panels['bull'][rows, None] & panels['tradable'][None, :]
+    size, _ = simulate_breakout_nb(close, breakdown[rows], panels['bear'][rows], mask, panels[f'day_ptr:{key}'],
+                                   panels[f'day_codes:{key}'], panels['bar_day'][rows], panels['timestamps'][rows],
+                                   max_slots=max_slots, hold_days=hold_days, init_cash=float(init_cash), fees=fees)
+    return task_result(size, close, init_cash, fees, 1, curve)
+
+def trend_task(panels, window=3, top_n=32, max_slots=10, position_count=3, add_atr=0.25, risk_factor=0.01,
+               stop_loss=0.5, direction=1, init_cash=10000.0, fees=0.001, start=0, end=None, curve=False):
+    '''panels: close/atr/entry/exit (bar, 币对)，entry 已经包含 BTC 过滤，exit 已经包含 MA20 和 BTC 出场'''
+    key = universe_key(window, top_n)
+    rows = slice(start, end)
+    close = panels['close'][rows]
+    size, _ = simulate_trend_nb(close, panels['atr'][rows], panels['exit'][rows], panels['entry'][rows],
+                                panels[f'day_ptr:{key}'], panels[f'day_codes:{key}'], panels['bar_day'][rows],
+                                max_slots=max_slots, position_count=position_count, add_atr=add_atr,
+                                risk_factor=risk_factor, stop_loss=stop_loss, direction=direction,
+                                init_cash=float(init_cash), fees=fees)
+    return task_result(size, close, init_cash, fees, direction, curve)
@@ -0,0 +1,88 @@
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+# 参数扫描：面板数据（numpy 数组）只加载一次，复制进共享内存，参数组合分发到进程池
+# worker 启动时把共享内存直接映射成 ndarray，大数组不经过 pickle，每个组合只传一个参数 dict
+
+MAX_WORKERS = os.cpu_count() or 1
+
+def param_grid(**axes):
+    '''param_grid(a=[1, 2], b=[3]) -> [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]'''
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*axes.values())]
+
+class SharedPanels:
+    '''把 {名字: ndarray} 复制到共享内存，spec 传给 worker 重新映射；用 with，结束时释放共享内存'''
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {}
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, arr.dtype, buffer=block.buf)[...] = arr
+            self.blocks.append(block)
+            self.spec[name] = (block.name, arr.shape, arr.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach(spec):
+    '''worker 里按 spec 映射共享内存，返回 (blocks, {名字: ndarray})，blocks 要一直持有，否则内存会被回收'''
+    blocks = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+_worker = {}
+
+def init_worker(spec, task):
+    import numba
+    # 已经是多进程了，numba 的并行 kernel 在每个 worker 里只用一个线程，避免线程数乘以进程数
+    numba.set_num_threads(1)
+    blocks, panels = attach(spec)
+    _worker.update(blocks=blocks, panels=panels, task=task)
+
+def run_one(params):
+    try:
+        return params, _worker['task'](_worker['panels'], **params), None
+    except Exception as e:
+        return params, None, repr(e)
+
+def run_tasks(task, grid, shared, max_workers=MAX_WORKERS):
+    '''
+    task(panels, **params) 必须是模块里的顶层函数（进程池要 pickle），shared 是已经建好的 SharedPanels，可以多轮复用
+    按 grid 顺序返回 [(params, 结果)]，出错的组合打印后跳过
+    '''
+    results = []
+    # 用 spawn 启动 worker：主进程里跑过 numba 的并行 kernel 之后再 fork，线程池状态会被带进子进程，退出时可能卡住
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=init_worker, initargs=(shared.spec, task)) as executor:
+        for params, result, error in executor.map(run_one, grid):
+            if error is not None:
+                print(f"Error running {params}: {error}")
+                continue
+            results.append((params, result))
+    return results
+
+def run_sweep(task, grid, arrays, max_workers=MAX_WORKERS):
+    '''arrays: {名字: ndarray}，所有组合共用的面板数据；task 返回指标 Series/dict，汇总成每个组合一行的结果表'''
+    with SharedPanels(arrays) as shared:
+        results = run_tasks(task, grid, shared, max_workers)
+    return pd.DataFrame([{**params, **dict(stats)} for params, stats in results])
@@ -0,0 +1,98 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from backtest.store import OHLCV_COLUMNS
+
+# 合成的加密货币行情：和 freqtrade 下载的数据一样，每个币对一个 <币对>-1h.feather / <币对>-1d.feather，
+# 列是 date(UTC) / open / high / low / close / volume，pair_filter、load_ohlcv_dict 可以直接读
+# 价格是几何随机游走：BTC 是市场因子，其他币 = beta * BTC + 自身波动，偶尔有跳涨/跳跌，这样 BTC 牛熊过滤、突破、MA 穿越都会触发
+# 币对陆续上市（BTC 从第一天开始），成交额量级按币对固定，universe 排名会随时间变化但不会每天乱跳
+# 日线由小时线聚合，两份数据完全一致；同样的参数和 seed 生成的数据每次都一样
+
+SYNTHETIC_END = pd.Timestamp('2024-01-01', tz='UTC')
+SPEC_FILE = 'synthetic.json'
+HOURS_PER_DAY = 24
+
+def synthetic_pairs(n_pairs):
+    return ['BTC_USDT'] + [f'SYN{i:04d}_USDT' for i in range(1, n_pairs)]
+
+def market_factor(n_bars, rng, vol=0.006):
+    '''BTC 的小时对数收益：牛熊交替的漂移 + 正态波动'''
+    regime_days = rng.integers(60, 240, n_bars // (60 * HOURS_PER_DAY) + 2)
+    drift = np.repeat(rng.choice([-1.0, 1.0], len(regime_days)) * rng.uniform(0.5, 1.5, len(regime_days)) * 3e-4,
+                      regime_days * HOURS_PER_DAY)[:n_bars]
+    return drift + rng.normal(0.0, vol, n_bars)
+
+def pair_ohlcv(log_returns, rng, start_price, base_volume, vol):
+    '''一个币对的小时 OHLCV，log_returns 是收盘价的对数收益'''
+    n = len(log_returns)
+    close = start_price * np.exp(np.cumsum(log_returns))
+    open_ = np.r_[start_price, close[:-1]]
+    wick = np.abs(rng.normal(0.0, vol * 0.5, (2, n)))
+    high = np.maximum(open_, close) * np.exp(wick[0])
+    low = np.minimum(open_, close) * np.exp(-wick[1])
+    # 波动大的小时成交量也大
+    volume = base_volume * rng.lognormal(0.0, 0.5, n) * (1 + np.abs(log_returns) / vol) / close
+    return np.column_stack([open_, high, low, close, volume])
+
+def hourly_to_daily(values):
+    '''小时数从 00:00 开始、整天的 OHLCV 聚合成日线'''
+    days = values.reshape(-1, HOURS_PER_DAY, len(OHLCV_COLUMNS))
+    return np.column_stack([days[:, 0, 0], days[:, :, 1].max(axis=1), days[:, :, 2].min(axis=1), days[:, -1, 3],
+                            days[:, :, 4].sum(axis=1)])
+
+def write_pair(folder, coin_pair, timeframe, dates, values):
+    frame = pd.DataFrame(values, columns=OHLCV_COLUMNS)
+    frame.insert(0, 'date', dates)
+    frame.to_feather(os.path.join(folder, f'{coin_pair}-{timeframe}.feather'))
+
+def market_folders(root):
+    return os.path.join(root, '1d'), os.path.join(root, '1h')
+
+def write_synthetic_market(root, n_pairs=50, years=1.0, end=SYNTHETIC_END, seed=0, listed_by=0.7):
+    '''
+    在 root/1d、root/1h 下生成 n_pairs 个币对 years 年的数据，返回 (日线目录, 小时线目录, 开始时间, 结束时间)
+    listed_by: 所有币对在前 listed_by 比例的时间里上市；root 里已经有同样参数生成的数据时直接复用
+    '''
+    end = pd.Timestamp(end).normalize()
+    n_days = int(round(years * 365))
+    start = end - pd.Timedelta(days=n_days)
+    spec = {'n_pairs': n_pairs, 'years': years, 'end': end.isoformat(), 'seed': seed, 'listed_by': listed_by}
+    folder_1d, folder_1h = market_folders(root)
+    spec_path = os.path.join(root, SPEC_FILE)
+    if os.path.exists(spec_path):
+        with open(spec_path) as f:
+            if json.load(f) == spec:
+                return folder_1d, folder_1h, start, end
+
+    for folder in (folder_1d, folder_1h):
+        os.makedirs(folder, exist_ok=True)
+        for filename in os.listdir(folder):
+            if filename.endswith('.feather'):
+                os.remove(os.path.join(folder, filename))
+    n_bars = n_days * HOURS_PER_DAY
+    dates_1h = pd.date_range(start, periods=n_bars, freq='h')
+    dates_1d = pd.date_range(start, periods=n_days, freq='D')
+    seeds = np.random.SeedSequence(seed).spawn(n_pairs + 1)
+    btc = market_factor(n_bars, np.random.default_rng(seeds[0]))
+    for i, coin_pair in enumerate(synthetic_pairs(n_pairs)):
+        rng = np.random.default_rng(seeds[i + 1])
+        if i == 0:
+            first_day, log_returns, vol, price, base_volume = 0, btc, 0.006, 20000.0, 5e8
+        else:
+            first_day = int(rng.integers(0, max(int(n_days * listed_by), 1)))
+            vol = rng.uniform(0.008, 0.02)
+            beta = rng.uniform(0.6, 1.6)
+            n = n_bars - first_day * HOURS_PER_DAY
+            jumps = rng.normal(0.0, 0.08, n) * (rng.random(n) < 2e-4)
+            log_returns = beta * btc[-n:] + rng.normal(0.0, vol, n) + jumps
+            price = 10 ** rng.uniform(-3, 3)
+            base_volume = 10 ** rng.uniform(5, 8)
+        values = pair_ohlcv(log_returns, rng, price, base_volume, vol)
+        write_pair(folder_1h, coin_pair, '1h', dates_1h[first_day * HOURS_PER_DAY:], values)
+        write_pair(folder_1d, coin_pair, '1d', dates_1d[first_day:], hourly_to_daily(values))
+
+    with open(spec_path, 'w') as f:
+        json.dump(spec, f)
+    return folder_1d, folder_1h, start, end
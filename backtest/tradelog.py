@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+from backtest.stats import trade_ids
+
+# 从 vbt 的订单记录（pf.orders.values，字段 col / idx / size / price / fees / side）直接还原每笔交易
+# 按 (币对, 时间) 排好序后用 trade_ids 分组，加仓的每一笔、盈亏、累计资金、单笔收益率全部用 bincount / cumsum 算
+# 只有导出 tradelog csv 时才把时间和数字格式化成字符串
+
+BUY, SELL = 0, 1
+
+def trade_table(records, direction=1, init_cash=10000.0, max_tranches=3, index=None, columns=None):
+    '''
+    records: vbt 订单记录的结构化数组；direction=1 时 Sell 是平仓单，-1（做空）时 Buy 是平仓单
+    返回每笔已平仓交易一行，按首次进场时间排序：col / entry_idx / entry_price_k / entry_size_k（k = 1..max_tranches）
+    / exit_idx / exit_price / exit_size / value（所有进场的 价格*数量）/ fees / pnl / capital（累计资金）/ pnl_ratio / trade_return
+    index 是 pf.wrapper.index 时再加 entry_time / exit_time 两列，可以直接给 montecarlo 用；columns 给了时加 coin_pair 列
+    '''
+    order = np.lexsort((records['idx'], records['col']))
+    col = records['col'][order].astype(np.int64)
+    idx = records['idx'][order].astype(np.int64)
+    size = records['size'][order].astype(float)
+    price = records['price'][order].astype(float)
+    fees = records['fees'][order].astype(float)
+    is_sell = records['side'][order] == SELL
+    is_close = is_sell if direction == 1 else ~is_sell
+
+    tid = trade_ids(col, is_close)
+    n_trades = tid[-1] + 1 if len(tid) else 0
+    first = np.flatnonzero(np.r_[True, tid[1:] != tid[:-1]]) if len(tid) else np.empty(0, dtype=np.int64)
+    tranche = np.arange(len(tid)) - first[tid]
+    notional = price * size
+
+    # 每笔交易只有最后一张是平仓单，没平仓的交易（回测结束时还持有）不算
+    close_pos = np.flatnonzero(is_close)
+    closed = np.zeros(n_trades, dtype=bool)
+    closed[tid[close_pos]] = True
+    exit_pos = np.full(n_trades, -1, dtype=np.int64)
+    exit_pos[tid[close_pos]] = close_pos
+
+    value = np.bincount(tid, weights=np.where(is_close, 0.0, notional), minlength=n_trades)
+    total_fees = np.bincount(tid, weights=fees, minlength=n_trades)
+    entries = ~is_close & (tranche < max_tranches)
+    tranche_price = np.full((n_trades, max_tranches), np.nan)
+    tranche_size = np.full((n_trades, max_tranches), np.nan)
+    tranche_price[tid[entries], tranche[entries]] = price[entries]
+    tranche_size[tid[entries], tranche[entries]] = size[entries]
+
+    exit_pos = exit_pos[closed]
+    trades = {'col': col[first][closed], 'entry_idx': idx[first][closed]}
+    for k in range(max_tranches):
+        trades[f'entry_price_{k + 1}'] = tranche_price[closed, k]
+        trades[f'entry_size_{k + 1}'] = tranche_size[closed, k]
+    trades.update({
+        'exit_idx': idx[exit_pos],
+        'exit_price': price[exit_pos],
+        'exit_size': size[exit_pos],
+        'value': value[closed],
+        'fees': total_fees[closed],
+    })
+    trades = pd.DataFrame(trades)
+    trades['pnl'] = direction * (trades['exit_price'] * trades['exit_size'] - trades['value']) - trades['fees']
+    trades = trades.sort_values('entry_idx', kind='stable').reset_index(drop=True)
+
+    # 和原来的 tradelog 一样：按首次进场时间的顺序累计资金
+    trades['capital'] = init_cash + trades['pnl'].cumsum()
+    trades['pnl_ratio'] = trades['pnl'] / trades['capital'] * 100
+    value_nonzero = trades['value'].where(trades['value'] != 0)
+    trades['trade_return'] = (trades['pnl'] / value_nonzero * 100).fillna(0.0)
+    if index is not None:
+        index = pd.Index(index)
+        trades.insert(2, 'entry_time', index[trades['entry_idx'].to_numpy()])
+        trades.insert(3, 'exit_time', index[trades['exit_idx'].to_numpy()])
+    if columns is not None:
+        trades.insert(1, 'coin_pair', np.asarray(columns)[trades['col']])
+    return trades
+
+def tradelog_frame(trades, index, columns, direction=1, max_tranches=3):
+    '''
+    换成原来 gen_tradelog 的中文列名和字符串格式
+    只有一笔进场时是 买入时间/买入价格/买入数量，有加仓时是 首次买入…、加仓k买入…；做空时买入换成卖出、卖出换成买回
+    '''
+    entry_side, exit_side = ('买入', '卖出') if direction == 1 else ('卖出', '买回')
+    first = '' if max_tranches == 1 else '首次'
+    out = {
+        '交易币对': np.asarray(columns)[trades['col']],
+        f'{first}{entry_side}时间': np.asarray(index)[trades['entry_idx']],
+        f'{first}{entry_side}价格': trades['entry_price_1'].to_numpy(),
+        f'{first}{entry_side}数量': trades['entry_size_1'].to_numpy(),
+    }
+    for k in range(1, max_tranches):
+        out[f'加仓{k}{entry_side}价格'] = trades[f'entry_price_{k + 1}'].to_numpy()
+        out[f'加仓{k}{entry_side}数量'] = trades[f'entry_size_{k + 1}'].to_numpy()
+    out.update({
+        f'{exit_side}时间': np.asarray(index)[trades['exit_idx']],
+        f'{exit_side}价格': trades['exit_price'].to_numpy(),
+        f'{exit_side}数量': trades['exit_size'].to_numpy(),
+        'USDT Value': trades['value'].to_numpy(),
+        'Fees': trades['fees'].to_numpy(),
+        'PnL': np.char.mod('%.2f', trades['pnl'].to_numpy()),
+        '总资金': np.char.mod('%.2f', trades['capital'].to_numpy()),
+        'PnL Ratio': np.char.add(np.char.mod('%.2f', trades['pnl_ratio'].to_numpy()), '%'),
+        '单笔收益率': np.char.add(np.char.mod('%.2f', trades['trade_return'].to_numpy()), '%'),
+    })
+    return pd.DataFrame(out)
+
+def write_tradelog(trades, path, index, columns, direction=1, max_tranches=3):
+    tradelog_frame(trades, index, columns, direction, max_tranches).to_csv(path, index=False)
+    print("Tradelog CSV has been generated successfully.")
+    return path
@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from backtest.store import open_store, store_path
+
+# 按 x 日累计成交额选出每天的币对 universe（df_filtered），结果按数据指纹和参数缓存到磁盘
+
+UNIVERSE_DIR = 'universe'
+
+def default_rules(change_date, top_pct=0.2, top_n=32):
+    # change_date 之前币种少，选前 20%；之后固定选前 32 个
+    return [(change_date, 'pct', top_pct), (None, 'top', top_n)]
+
+def select_top_n(date, rank, coin_count, rules):
+    '''rules 是 [(截止日期, 'pct' 或 'top', 数值)]，按顺序取第一个 date <= 截止日期 的规则，截止日期 None 表示不限'''
+    conditions = []
+    thresholds = []
+    for cutoff, kind, value in rules:
+        conditions.append(np.ones(len(date), dtype=bool) if cutoff is None else np.asarray(date <= cutoff))
+        thresholds.append(coin_count * value if kind == 'pct' else np.full(len(date), value, dtype=float))
+    threshold = np.select(conditions, thresholds, default=np.nan)
+    return rank <= threshold
+
+def build_universe(df, window, blacklist, rules):
+    df['turnover'] = (df['open'] + df['high'] + df['low']) / 3 * df['volume']
+
+    # 对DataFrame进行分组并滚动计算x日累计成交额
+    df = df.sort_values(by=['coin_pair', 'date'])
+    df['3_day_turnover'] = df.groupby('coin_pair')['turnover'].rolling(window, min_periods=1).sum().shift(1).reset_index(level=0, drop=True)
+
+    # 排序并筛选每个日期的前20%
+    df['rank'] = df.groupby('date')['3_day_turnover'].rank("dense", ascending=False)
+    df['coin_count'] = df.groupby('date')['coin_pair'].transform('count') # 在排名之前，为每个日期计算币种数量
+    df['select'] = select_top_n(df['date'], df['rank'].values, df['coin_count'].values, rules)
+    df_top = df[df['select']]
+
+    # 排序DataFrame
+    df_top_sorted = df_top.sort_values(by=['date', 'rank'], ascending=[True, True])
+
+    # 排除特定币对
+    df_filtered = df_top_sorted[~df_top_sorted['coin_pair'].isin(blacklist)]
+
+    return df_filtered[['date', 'coin_pair', 'rank']]
+
+def cache_key(obj):
+    payload = json.dumps(obj, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+def pair_filter(data_folder, start_date, end_date, window, blacklist, rules, cache=True):
+    '''返回每天入选的 [date, coin_pair, rank]，数据文件和参数都没变时直接读缓存'''
+    store = open_store(data_folder)
+    data_key = cache_key(store.manifest['fingerprint'])
+    param_key = cache_key({'start_date': start_date, 'end_date': end_date, 'window': window, 'blacklist': sorted(blacklist),
+                           'rules': rules})
+    cache_folder = os.path.join(store_path(data_folder), UNIVERSE_DIR)
+    cache_path = os.path.join(cache_folder, f'{data_key}_{param_key}.feather')
+    if cache and os.path.exists(cache_path):
+        return pd.read_feather(cache_path)
+
+    # 只读取日期范围内（store 里按日期切片，两端都包含）、计算成交额需要的列，date 已经是 UTC 时间
+    df = store.read_long(start=start_date, end=end_date, columns=['open', 'high', 'low', 'volume'])
+    df_filtered = build_universe(df, window, blacklist, rules).reset_index(drop=True)
+
+    if cache:
+        # 数据指纹变了之后，同一组参数用旧数据算出来的缓存删掉，其他日期范围/参数的缓存保留
+        os.makedirs(cache_folder, exist_ok=True)
+        for filename in os.listdir(cache_folder):
+            if filename.endswith(f'_{param_key}.feather') and not filename.startswith(data_key):
+                os.remove(os.path.join(cache_folder, filename))
+        df_filtered.to_feather(cache_path)
+    return df_filtered
+
+def day_positions(index):
+    '''小时索引对应的日期索引，以及每个小时在日期索引里的行号'''
+    days = index.normalize()
+    day_index = days.unique()
+    return day_index, day_index.get_indexer(days)
+
+def scatter_daily(df_filtered, day_index, columns, values, fill):
+    out = np.full((len(day_index), len(columns)), fill, dtype=np.asarray(values).dtype)
+    day_pos = day_index.get_indexer(df_filtered['date'])
+    col_pos = columns.get_indexer(df_filtered['coin_pair'])
+    valid = (day_pos >= 0) & (col_pos >= 0)
+    out[day_pos[valid], col_pos[valid]] = np.asarray(values)[valid]
+    return out
+
+def membership_matrix(df_filtered, index, columns):
+    '''(小时 × 币对) 的 bool 矩阵，小时所在的那一天币对在 df_filtered 里就是 True'''
+    day_index, bar_day = day_positions(index)
+    member = scatter_daily(df_filtered, day_index, columns, np.ones(len(df_filtered), dtype=bool), False)
+    return pd.DataFrame(member[bar_day], index=index, columns=columns)
+
+def legacy_bar_range(df_filtered, index):
+    '''
+    原来的 coin_filter 逐行 .at 赋值后再 [:-1]（"最底下莫名多出来一行"）：universe 有日期不在小时索引里时，
+    .at 会在最后追加一行，[:-1] 删掉的是这一行；日期都在索引里时删掉的是最后一根真实的 bar，mask 因此少一根 bar，
+    强制平仓发生在倒数第二根。返回原来 coin_filter 的小时索引，和 baseline 的结果保持一致
+    '''
+    if df_filtered['date'].isin(index).all():
+        return index[:-1]
+    return index
+
+def rank_index(df_filtered, index, columns):
+    '''
+    CSR 形式的每日排名索引：第 d 天的币对列号按 rank 从小到大存在 day_codes[day_ptr[d]:day_ptr[d + 1]]
+    同时返回每个小时对应的天 bar_day，模拟时 O(k) 就能按排名取出当天的候选币对
+    '''
+    day_index, bar_day = day_positions(index)
+    day_pos = day_index.get_indexer(df_filtered['date'])
+    col_pos = columns.get_indexer(df_filtered['coin_pair'])
+    rank = df_filtered['rank'].to_numpy(dtype=float)
+    valid = (day_pos >= 0) & (col_pos >= 0) & ~np.isnan(rank)
+    day_pos, col_pos, rank = day_pos[valid], col_pos[valid], rank[valid]
+    order = np.lexsort((col_pos, rank, day_pos))
+    day_codes = col_pos[order].astype(np.int64)
+    day_ptr = np.zeros(len(day_index) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(day_pos, minlength=len(day_index)), out=day_ptr[1:])
+    return day_ptr, day_codes, bar_day.astype(np.int64)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from backtest.sweep import SharedPanels, run_tasks, MAX_WORKERS
+from backtest.stats import equity_stats
+
+# walk-forward：按时间切成滚动的样本内/样本外窗口，每个 fold 在样本内挑最优参数，再用它跑紧接着的样本外
+# 所有 fold × 参数组合共用同一份共享内存面板（指标只算一次），样本内一轮、样本外一轮，两轮都在进程池里并行
+# 样本外各段独立从 init_cash 起跑，再按上一段的期末资金等比例缩放后拼接：引擎的仓位都按账户价值的比例下单，缩放前后等价
+
+def walk_forward_folds(timestamps, train, test, step=None, start=None, end=None):
+    '''
+    timestamps: 小时索引；train/test/step 是 Timedelta，step 默认等于 test，样本外首尾相接
+    step 不能小于 test：样本外窗口重叠时拼接的净值会有重复的时间，同一段 bar 被算两次
+    返回 [{'fold', 'train_start', 'train_end', 'test_start', 'test_end'}]，都是 bar 行号，区间左闭右开
+    '''
+    timestamps = pd.DatetimeIndex(timestamps)
+    step = test if step is None else step
+    if step < test:
+        raise ValueError(f"step ({step}) must be >= test ({test}), otherwise out-of-sample windows overlap")
+    t = timestamps[0] if start is None else pd.Timestamp(start)
+    end = timestamps[-1] if end is None else pd.Timestamp(end)
+    folds = []
+    while t + train + test <= end + pd.Timedelta('1h'):
+        bounds = timestamps.searchsorted([t, t + train, t + train + test])
+        folds.append({'fold': len(folds), 'train_start': bounds[0], 'train_end': bounds[1],
+                      'test_start': bounds[1], 'test_end': bounds[2]})
+        t += step
+    return folds
+
+def best_params(in_sample, keys, metric):
+    '''每个 fold 里 metric 最高的参数组合，metric 全是 NaN 的 fold 取第一个组合'''
+    best = in_sample.assign(_score=in_sample[metric].fillna(-np.inf)).sort_values(['fold', '_score'], ascending=[True, False])
+    return best.groupby('fold', sort=True).head(1)[['fold'] + keys]
+
+def walk_forward(task, grid, arrays, folds, timestamps, metric='Sharpe Ratio', init_cash=10000.0, max_workers=MAX_WORKERS):
+    '''
+    task/grid 和 sweep.run_sweep 一样，task 要支持 start/end/curve 参数（见 strategies.py）
+    返回 (样本内结果表, 每个 fold 的最优参数和样本外指标, 拼接后的样本外净值 Series)
+    '''
+    keys = list(dict.fromkeys(k for params in grid for k in params))
+    timestamps = pd.DatetimeIndex(timestamps)
+    test_ranges = sorted((fold['test_start'], fold['test_end']) for fold in folds)
+    if any(hi > lo for (_, hi), (lo, _) in zip(test_ranges, test_ranges[1:])):
+        raise ValueError("Out-of-sample windows overlap, the stitched equity curve would count bars twice")
+    with SharedPanels(arrays) as shared:
+        in_grid = [{**params, 'init_cash': init_cash, 'start': fold['train_start'], 'end': fold['train_end']}
+                   for fold in folds for params in grid]
+        train_fold = {(fold['train_start'], fold['train_end']): fold['fold'] for fold in folds}
+        in_sample = pd.DataFrame([{'fold': train_fold[params['start'], params['end']], **params, **dict(stats)}
+                                  for params, stats in run_tasks(task, in_grid, shared, max_workers)])
+        if in_sample.empty:
+            raise RuntimeError("Every in-sample run failed, see the errors printed above")
+
+        chosen = best_params(in_sample, keys, metric)
+        test_bounds = {fold['fold']: (fold['test_start'], fold['test_end']) for fold in folds}
+        out_grid = []
+        for row in chosen.to_dict('records'):
+            lo, hi = test_bounds[row['fold']]
+            params = {k: row[k] for k in keys}
+            out_grid.append({**params, 'init_cash': init_cash, 'start': lo, 'end': hi, 'curve': True})
+        out_results = run_tasks(task, out_grid, shared, max_workers)
+
+    # 某个 fold 样本内全部出错或者样本外出错时，拼接的净值会缺一段，统计就不对了，直接报错
+    test_fold = {bounds: fold for fold, bounds in test_bounds.items()}
+    missing = sorted(set(test_bounds) - {test_fold[params['start'], params['end']] for params, _ in out_results})
+    if missing:
+        raise RuntimeError(f"Walk-forward folds {missing} have no out-of-sample result, see the errors printed above")
+
+    # 样本外净值按顺序拼接，每段按上一段期末资金缩放
+    capital = init_cash
+    curves = []
+    summary = []
+    for params, result in out_results:
+        fold = test_fold[params['start'], params['end']]
+        scale = capital / init_cash
+        value = result['value'] * scale
+        curves.append(pd.Series(value, index=timestamps[params['start']:params['end']]))
+        summary.append({'fold': fold, 'test_start': timestamps[params['start']], 'test_end': timestamps[params['end'] - 1],
+                        **{k: params[k] for k in keys}, **dict(result['stats'])})
+        capital = value[-1] if len(value) else capital
+    equity = pd.concat(curves) if curves else pd.Series(dtype=float)
+    summary = pd.DataFrame(summary)
+    return in_sample, summary, equity
+
+def walk_forward_stats(equity, init_cash=10000.0):
+    return pd.Series(equity_stats(equity.to_numpy(), init_cash))
@@ -0,0 +1,69 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backtest.synthetic import write_synthetic_market
+from backtest.universe import pair_filter, default_rules, membership_matrix, rank_index
+from backtest.align import DailyToHourly, load_panels
+from backtest.regime import BtcRegime
+from backtest.indicators import rolling_max, rolling_min, crossed_above, average_true_range
+from backtest.store import load_daily_bars
+
+# 所有测试共用一份合成行情（backtest.synthetic），信号和 vbt 脚本里的算法一样，只是不依赖 vbt
+
+N_PAIRS = 16
+YEARS = 0.75
+BTC_MA_WINDOW = 50
+
+@pytest.fixture(scope='session', autouse=True)
+def store_dir(tmp_path_factory):
+    '''store 和 universe 缓存写到临时目录，不留在工作目录的 runs/_store 下'''
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr('backtest.store.STORE_DIR', str(tmp_path_factory.mktemp('store')))
+        yield
+
+@pytest.fixture(scope='session')
+def market(tmp_path_factory):
+    '''小时线面板、universe 和两个策略的信号，都是 numpy 数组（close 等同时保留 DataFrame）'''
+    root = str(tmp_path_factory.mktemp('synthetic'))
+    folder_1d, folder_1h, start_date, end_date = write_synthetic_market(root, N_PAIRS, YEARS, seed=4)
+    change_date = start_date + (end_date - start_date) / 2
+    df_filtered = pair_filter(folder_1d, start_date, end_date, window=3, blacklist=[], rules=default_rules(change_date, top_n=8),
+                              cache=False)
+    high, low, close = load_panels(folder_1h, df_filtered, pd.Timedelta(days=BTC_MA_WINDOW))
+    close_1d = close.resample('D').last()
+    to_hourly = DailyToHourly(close.index, close_1d.index)
+    regime = BtcRegime(close_1d['BTC_USDT'], to_hourly)
+    bull = regime.bull(BTC_MA_WINDOW).to_numpy(dtype=bool)
+    bear = regime.bear(BTC_MA_WINDOW).to_numpy(dtype=bool)
+    member = membership_matrix(df_filtered, close.index, close.columns).to_numpy(dtype=bool)
+    tradable = np.asarray(close.columns != 'BTC_USDT')
+
+    ma20 = close_1d.rolling(20).mean()
+    up = to_hourly(crossed_above(close_1d, ma20)).to_numpy(dtype=bool)
+    down = to_hourly(crossed_above(ma20, close_1d)).to_numpy(dtype=bool)
+    atr_1d = average_true_range(*load_daily_bars(folder_1h, close.columns))
+    atr = DailyToHourly(close.index, atr_1d.index, offset='0h')(atr_1d, fill_value=np.nan)
+    day_ptr, day_codes, bar_day = rank_index(df_filtered, close.index, close.columns)
+    return {
+        'df_filtered': df_filtered,
+        'close_df': close,
+        'close': close.to_numpy(dtype=float),
+        'timestamps': close.index.as_unit('ns').asi8,
+        'day_ptr': day_ptr,
+        'day_codes': day_codes,
+        'bar_day': bar_day,
+        # Breakout：突破 30 日高点 & BTC 牛市入场，跌破 21 日低点或 BTC 熊市出场
+        'breakout_mask': (high >= rolling_max(high, 30*24)).to_numpy(dtype=bool) & member & tradable & bull[:, None],
+        'breakdown': (low <= rolling_min(low, 21*24)).to_numpy(dtype=bool),
+        'bear': bear,
+        # Trend：多头上穿 MA20 & BTC 牛市入场；空头下穿 MA20 & BTC 熊市入场，BTC 本身不做空
+        'atr': atr.to_numpy(dtype=float),
+        'long_mask': up & member & bull[:, None],
+        'long_exit': down | bear[:, None],
+        'short_mask': down & member & tradable & bear[:, None],
+        'short_exit': up | bull[:, None],
+    }
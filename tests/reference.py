@@ -0,0 +1,167 @@
+import os
+import numpy as np
+import pandas as pd
+
+# 原来 BreakoutCatcher_vbt.py / TrendCatcher_vbt.py / TrendCatcherShort_vbt.py 里逐 bar 的 pandas 循环，
+# 只把写死的参数换成了函数参数，用来检查 numba 引擎的 size 和资金曲线没有变；pair_filter_apply 是原来逐行筛选的 universe
+
+CAPITAL_COLUMNS = ['Remaining Cash', 'Available Cash', 'Asset Value']
+
+def breakout_loop(mask, close, is_breakdown, btc_bear_filter_1h, df_filtered, max_slots=10, hold_days=2,
+                  initial_cash=10000, fees=0.001):
+    exits_filter = pd.DataFrame(np.repeat(btc_bear_filter_1h.values[:, None], mask.shape[1], 1),
+                                index=mask.index, columns=mask.columns)
+    holdings = {}
+    exited_coins = set()
+    size = pd.DataFrame(0.0, index=mask.index, columns=mask.columns)
+    capital_df = pd.DataFrame(np.nan, index=mask.index, columns=CAPITAL_COLUMNS)
+    capital_df.iloc[0] = [initial_cash, initial_cash * 0.99, initial_cash]
+
+    def update_capital_and_exit(date, coin_pair, exit_price, exit_size):
+        size.at[date, coin_pair] = -exit_size
+        capital_df.at[date, 'Remaining Cash'] += exit_price * exit_size * (1 - fees)
+        capital_df.at[date, 'Available Cash'] = capital_df.at[date, 'Remaining Cash'] * 0.99
+        del holdings[coin_pair]
+        asset_value_sum = sum(holdings[coin]['entry_price'] * holdings[coin]['size'] for coin in holdings)
+        capital_df.at[date, 'Asset Value'] = capital_df.at[date, 'Remaining Cash'] + asset_value_sum
+        exited_coins.add(coin_pair)
+
+    def update_capital_and_entry(date, coin_pair, current_price, stake_amount):
+        if stake_amount > capital_df.at[date, 'Available Cash']:
+            return
+        trade_size = stake_amount / current_price
+        size.at[date, coin_pair] = trade_size
+        holdings[coin_pair] = {'entry_date': date, 'entry_price': current_price, 'size': trade_size}
+        capital_df.at[date, 'Remaining Cash'] -= trade_size * current_price * (1 + fees)
+        capital_df.at[date, 'Available Cash'] = capital_df.at[date, 'Remaining Cash'] * 0.99
+        asset_value_sum = sum(holdings[coin]['entry_price'] * holdings[coin]['size'] for coin in holdings)
+        capital_df.at[date, 'Asset Value'] = capital_df.at[date, 'Remaining Cash'] + asset_value_sum
+
+    for date, signals_on_date in mask.iterrows():
+        exited_coins.clear()
+        if pd.isna(capital_df.loc[date, 'Remaining Cash']):
+            capital_df.loc[date] = capital_df.loc[capital_df.loc[:date].last_valid_index()]
+        if date == mask.index[-1]:
+            for coin_pair in list(holdings):
+                update_capital_and_exit(date, coin_pair, close.at[date, coin_pair], holdings[coin_pair]['size'])
+            continue
+        for coin_pair in list(holdings):
+            entry_date = holdings[coin_pair]['entry_date']
+            exit_size = holdings[coin_pair]['size']
+            current_price = close.at[date, coin_pair]
+            if is_breakdown.at[date, coin_pair]:
+                update_capital_and_exit(date, coin_pair, current_price, exit_size)
+            elif exits_filter.at[date, coin_pair]:
+                update_capital_and_exit(date, coin_pair, current_price, exit_size)
+            elif date - entry_date > pd.Timedelta(days=hold_days) and date.hour == 0:
+                update_capital_and_exit(date, coin_pair, current_price, exit_size)
+        signals = signals_on_date[signals_on_date].index.tolist()
+        if not signals or len(holdings) >= max_slots:
+            continue
+        rank_on_date = df_filtered[df_filtered['date'] == date.normalize()]
+        rank_on_date = rank_on_date[rank_on_date['coin_pair'].isin(signals)]
+        for coin_pair in rank_on_date.sort_values('rank')['coin_pair'].tolist():
+            if len(holdings) < max_slots and coin_pair not in holdings and coin_pair not in exited_coins:
+                update_capital_and_entry(date, coin_pair, close.at[date, coin_pair],
+                                         capital_df.at[date, 'Asset Value'] / max_slots)
+    return size, capital_df
+
+def trend_loop(mask, exit_mask, close, atr, df_filtered, max_slots=10, position_count=3, add_atr=0.25, risk_factor=0.01,
+               stop_loss=0.5, direction=1, initial_cash=10000, fees=0.001):
+    '''direction=-1 是 TrendCatcherShort 的循环：下跌 add_atr 加仓，没有止损，资金按多头的方式记账'''
+    holdings = {}
+    exited_coins = set()
+    size = pd.DataFrame(0.0, index=mask.index, columns=mask.columns)
+    capital_df = pd.DataFrame(np.nan, index=mask.index, columns=CAPITAL_COLUMNS)
+    capital_df.iloc[0] = [initial_cash, initial_cash * 0.99, initial_cash]
+
+    def holdings_value():
+        return sum(trade['entry_price'] * trade['size'] for coin in holdings for trade in holdings[coin]['trades'])
+
+    def update_capital_and_exit(date, coin_pair, exit_price, exit_size):
+        size.at[date, coin_pair] = -exit_size
+        capital_df.at[date, 'Remaining Cash'] += exit_price * exit_size * (1 - fees)
+        capital_df.at[date, 'Available Cash'] = capital_df.at[date, 'Remaining Cash'] * 0.99
+        del holdings[coin_pair]
+        capital_df.at[date, 'Asset Value'] = capital_df.at[date, 'Remaining Cash'] + holdings_value()
+        exited_coins.add(coin_pair)
+
+    def update_capital_and_entry(date, coin_pair, current_price, stake_amount, update_holdings=True):
+        if stake_amount > capital_df.at[date, 'Available Cash']:
+            return
+        trade_size = stake_amount / current_price
+        size.at[date, coin_pair] = trade_size
+        trade = {'entry_date': date, 'entry_price': current_price, 'size': trade_size}
+        if update_holdings:
+            holdings[coin_pair]['trades'].append(trade)
+        else:
+            holdings[coin_pair] = {'trades': [trade]}
+        capital_df.at[date, 'Remaining Cash'] -= trade_size * current_price * (1 + fees)
+        capital_df.at[date, 'Available Cash'] = capital_df.at[date, 'Remaining Cash'] * 0.99
+        capital_df.at[date, 'Asset Value'] = capital_df.at[date, 'Remaining Cash'] + holdings_value()
+
+    for date, signals_on_date in mask.iterrows():
+        exited_coins.clear()
+        if pd.isna(capital_df.loc[date, 'Remaining Cash']):
+            capital_df.loc[date] = capital_df.loc[capital_df.loc[:date].last_valid_index()]
+        if date == mask.index[-1]:
+            for coin_pair in list(holdings):
+                exit_size = sum(trade['size'] for trade in holdings[coin_pair]['trades'])
+                update_capital_and_exit(date, coin_pair, close.at[date, coin_pair], exit_size)
+            continue
+        for coin_pair in list(holdings):
+            trades = holdings[coin_pair]['trades']
+            exit_size = sum(trade['size'] for trade in trades)
+            current_price = close.at[date, coin_pair]
+            atr_value = atr.at[date, coin_pair]
+            last_entry_price = trades[-1]['entry_price']
+            entry_price = sum(trade['entry_price'] * trade['size'] for trade in trades) / exit_size
+            if direction == 1:
+                add_position = current_price >= last_entry_price + add_atr * atr_value
+            else:
+                add_position = current_price <= last_entry_price - add_atr * atr_value
+            if direction == 1 and current_price <= stop_loss * entry_price:
+                update_capital_and_exit(date, coin_pair, current_price, exit_size)
+            elif exit_mask.at[date, coin_pair]:
+                update_capital_and_exit(date, coin_pair, current_price, exit_size)
+            elif add_position and 1 <= len(trades) <= position_count - 1:
+                first_trade = trades[0]
+                update_capital_and_entry(date, coin_pair, current_price, first_trade['entry_price'] * first_trade['size'])
+        signals = signals_on_date[signals_on_date].index.tolist()
+        if not signals or len(holdings) >= max_slots:
+            continue
+        rank_on_date = df_filtered[df_filtered['date'] == date.normalize()]
+        rank_on_date = rank_on_date[rank_on_date['coin_pair'].isin(signals)]
+        for coin_pair in rank_on_date.sort_values('rank')['coin_pair'].tolist():
+            if len(holdings) < max_slots and coin_pair not in holdings and coin_pair not in exited_coins:
+                entry_price = close.at[date, coin_pair]
+                stake_amount = capital_df.at[date, 'Asset Value'] * risk_factor * entry_price / (atr.at[date, coin_pair] * position_count)
+                update_capital_and_entry(date, coin_pair, entry_price, stake_amount, update_holdings=False)
+    return size, capital_df
+
+def pair_filter_apply(data_folder, start_date, end_date, window, blacklist, change_date):
+    '''原来逐个读 feather、df.apply(select_top_n, axis=1) 逐行筛选的 pair_filter'''
+    def select_top_n(row):
+        if row['date'] <= change_date:
+            return row['rank'] <= row['coin_count'] * 0.2
+        else:
+            return row['rank'] <= 32
+
+    all_data = []
+    for filename in os.listdir(data_folder):
+        if filename.endswith('.feather'):
+            data = pd.read_feather(os.path.join(data_folder, filename))
+            data['coin_pair'] = filename.split('-')[0]
+            all_data.append(data)
+    df = pd.concat([df for df in all_data if not df.empty])
+    df['date'] = pd.to_datetime(df['date'], utc=True)
+    df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+    df['turnover'] = (df['open'] + df['high'] + df['low']) / 3 * df['volume']
+    df = df.sort_values(by=['coin_pair', 'date'])
+    df['3_day_turnover'] = df.groupby('coin_pair')['turnover'].rolling(window, min_periods=1).sum().shift(1).reset_index(level=0, drop=True)
+    df['rank'] = df.groupby('date')['3_day_turnover'].rank("dense", ascending=False)
+    df['coin_count'] = df.groupby('date')['coin_pair'].transform('count')
+    df['select'] = df.apply(select_top_n, axis=1)
+    df_top = df[df['select']].sort_values(by=['date', 'rank'], ascending=[True, True])
+    df_filtered = df_top[~df_top['coin_pair'].isin(blacklist)]
+    return df_filtered[['date', 'coin_pair', 'rank']]
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.align import DailyToHourly
+
+def old_to_hourly(daily, hourly_index, offset, fill_value):
+    '''原来脚本里的对齐方式'''
+    return daily.shift(1, freq=offset).reindex(hourly_index, method='ffill').fillna(fill_value)
+
+@pytest.fixture
+def daily_frames():
+    rng = np.random.default_rng(0)
+    daily_index = pd.date_range('2021-01-03', periods=40, freq='D', tz='UTC')
+    values = rng.normal(size=(len(daily_index), 4))
+    values[:3, 1] = np.nan # 日线本身的 NaN 保持不变，不会被前值填充
+    values[10, 2] = np.nan
+    floats = pd.DataFrame(values, index=daily_index, columns=['A', 'B', 'C', 'D'])
+    return floats, floats > 0
+
+@pytest.mark.parametrize('offset', ['23h', '0h'])
+def test_daily_to_hourly_matches_shift_reindex(daily_frames, offset):
+    floats, signals = daily_frames
+    # 小时线比第一根日线早 2 天开始、晚 1 天结束：最前面的小时没有可用的日线，用 fill_value
+    hourly_index = pd.date_range('2021-01-01', '2021-02-13 23:00', freq='h', tz='UTC')
+    to_hourly = DailyToHourly(hourly_index, floats.index, offset=offset)
+    assert to_hourly.missing.sum() == 48 + pd.Timedelta(offset) // pd.Timedelta('1h')
+
+    pd.testing.assert_frame_equal(to_hourly(signals), old_to_hourly(signals, hourly_index, offset, False), check_dtype=False)
+    assert to_hourly(signals).dtypes.eq(bool).all()
+    pd.testing.assert_frame_equal(to_hourly(floats, fill_value=np.nan), old_to_hourly(floats, hourly_index, offset, np.nan))
+    pd.testing.assert_series_equal(to_hourly(floats['A'], fill_value=0.0), old_to_hourly(floats['A'], hourly_index, offset, 0.0))
+
+def test_daily_to_hourly_signal_waits_for_the_daily_close(daily_frames):
+    '''默认 23h：某天的日线信号从当天 23:00 那根小时线开始生效，之前是前一天的值'''
+    floats, _ = daily_frames
+    hourly_index = pd.date_range('2021-01-03', periods=72, freq='h', tz='UTC')
+    out = DailyToHourly(hourly_index, floats.index)(floats['A'], fill_value=np.nan)
+    assert out.iloc[:23].isna().all()
+    assert (out.iloc[23:47] == floats['A'].iloc[0]).all()
+    assert out.iloc[47] == floats['A'].iloc[1]
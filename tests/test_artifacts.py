@@ -0,0 +1,72 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.artifacts import RunArtifacts, MANIFEST_FILE, list_runs, load_artifact, read_manifest
+from backtest.benchmark import order_records
+from backtest.tradelog import trade_table
+from backtest.montecarlo import trades_from_run, monte_carlo_summary
+
+INDEX = pd.date_range('2021-01-01', periods=6, freq='h', tz='UTC')
+COLUMNS = pd.Index(['AAA_USDT', 'BBB_USDT'])
+
+def ledger():
+    return pd.DataFrame({
+        'cash': np.linspace(10000.0, 9000.0, len(INDEX)),
+        'slots': np.arange(len(INDEX), dtype=np.int64),
+        'bear': np.arange(len(INDEX)) % 2 == 0,
+        'coin_pair': ['AAA_USDT', 'BBB_USDT'] * 3,
+    }, index=pd.Index(INDEX, name='date'))
+
+def sample_trades():
+    '''AAA 一次进出；BBB 两次进场后一起平仓'''
+    size = np.zeros((len(INDEX), len(COLUMNS)))
+    size[1, 0], size[3, 0] = 2.0, -2.0
+    size[0, 1], size[2, 1], size[4, 1] = 1.0, 1.0, -2.0
+    close = np.array([[10.0, 5.0], [10.0, 5.0], [11.0, 6.0], [12.0, 6.0], [12.0, 4.0], [12.0, 4.0]])
+    return trade_table(order_records(size, close), direction=1, max_tranches=2, index=INDEX, columns=COLUMNS)
+
+def test_round_trip_matches_manifest(tmp_path):
+    frames = {'ledger': ledger(), 'stats': pd.Series({'Total Return [%]': 12.5, 'Total Orders': 5.0}, name='value'),
+              'trades': sample_trades(), 'empty': ledger().iloc[:0]}
+    run = RunArtifacts('trend', {'max_slots': 10}, folder=str(tmp_path))
+    for name, frame in frames.items():
+        run.write(name, frame)
+
+    with open(os.path.join(run.path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    assert manifest == read_manifest(run.path)
+    assert manifest['params'] == {'max_slots': 10}
+    assert list(manifest['artifacts']) == list(frames)
+    for name, frame in frames.items():
+        loaded = load_artifact(name, run_id=run.run_id, folder=str(tmp_path))
+        entry = manifest['artifacts'][name]
+        assert entry['rows'] == len(loaded) == len(frame)
+        assert entry['columns'] == {str(col): str(dtype) for col, dtype in loaded.dtypes.items()}
+        expected = frame.to_frame() if isinstance(frame, pd.Series) else frame
+        pd.testing.assert_frame_equal(loaded, expected, check_freq=False)
+    assert isinstance(load_artifact('ledger', run_id=run.run_id, folder=str(tmp_path)).index, pd.DatetimeIndex)
+
+def test_load_latest_run(tmp_path):
+    folder = str(tmp_path)
+    first = RunArtifacts('trend', {'n': 1}, folder=folder, run_id='trend_1')
+    first.write('stats', pd.Series({'a': 1.0}))
+    second = RunArtifacts('trend', {'n': 2}, folder=folder, run_id='trend_2')
+    second.write('stats', pd.Series({'a': 2.0}))
+    RunArtifacts('breakout', {}, folder=folder, run_id='breakout_1')
+    assert list_runs(folder, strategy='trend')['run_id'].tolist() == ['trend_1', 'trend_2']
+    assert load_artifact('stats', strategy='trend', folder=folder).iloc[0, 0] == 2.0
+    with pytest.raises(FileNotFoundError):
+        load_artifact('stats', strategy='breakout', folder=folder)
+
+def test_montecarlo_reads_trades_artifact(tmp_path):
+    trades = sample_trades()
+    run = RunArtifacts('trend', {}, folder=str(tmp_path))
+    run.write('trades', trades)
+    loaded = trades_from_run(strategy='trend', folder=str(tmp_path))
+    expected = trades[['entry_time', 'exit_time', 'pnl']].sort_values('exit_time', kind='stable').reset_index(drop=True)
+    assert len(loaded) == 2
+    pd.testing.assert_frame_equal(loaded, expected)
+    pd.testing.assert_frame_equal(monte_carlo_summary(loaded, n_sims=100, seed=0),
+                                  monte_carlo_summary(expected, n_sims=100, seed=0))
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.engine import simulate_breakout_nb, simulate_trend_nb
+from backtest.checkpoint import simulate_breakout_resumable, simulate_trend_resumable
+from backtest.journal import Journal, journal_frame
+from backtest.universe import rank_index
+from reference import breakout_loop, trend_loop
+
+INIT_CASH = 10000.0
+FEES = 0.001
+# 空头和 TrendCatcherShort_vbt.py 一样：20 个仓位、0.005 的风险系数、没有止损
+TREND_PARAMS = {
+    1: dict(max_slots=10, risk_factor=0.01, stop_loss=0.5, direction=1),
+    -1: dict(max_slots=20, risk_factor=0.005, stop_loss=0.0, direction=-1),
+}
+
+def frame(market, values):
+    close = market['close_df']
+    return pd.DataFrame(values, index=close.index, columns=close.columns)
+
+def trend_masks(market, direction):
+    return (market['long_mask'], market['long_exit']) if direction == 1 else (market['short_mask'], market['short_exit'])
+
+def breakout_args(market, n_bars=None):
+    '''n_bars 截掉后面的 bar，模拟之后再追加 K 线；每日排名索引按截断后的时间重新生成'''
+    m = market
+    bars = slice(None, n_bars)
+    index = m['close_df'].index[bars]
+    day_ptr, day_codes, bar_day = rank_index(m['df_filtered'], index, m['close_df'].columns)
+    return (m['close'][bars], m['breakdown'][bars], m['bear'][bars], m['breakout_mask'][bars], day_ptr, day_codes, bar_day,
+            m['timestamps'][bars])
+
+def trend_args(market, direction, n_bars=None):
+    m = market
+    bars = slice(None, n_bars)
+    mask, exit_mask = trend_masks(market, direction)
+    day_ptr, day_codes, bar_day = rank_index(m['df_filtered'], m['close_df'].index[bars], m['close_df'].columns)
+    return (m['close'][bars], m['atr'][bars], exit_mask[bars], mask[bars], day_ptr, day_codes, bar_day)
+
+def assert_matches_loop(size, records, loop_size, capital_df):
+    np.testing.assert_array_equal(size != 0, loop_size.to_numpy() != 0)
+    np.testing.assert_allclose(size, loop_size.to_numpy(), rtol=1e-9, atol=0)
+    np.testing.assert_allclose(records, capital_df.to_numpy(), rtol=1e-9, atol=0)
+
+def test_breakout_matches_pandas_loop(market):
+    m = market
+    size, records = simulate_breakout_nb(*breakout_args(market), init_cash=INIT_CASH, fees=FEES)
+    loop_size, capital_df = breakout_loop(frame(market, m['breakout_mask']), m['close_df'], frame(market, m['breakdown']),
+                                          pd.Series(m['bear'], index=m['close_df'].index), m['df_filtered'],
+                                          initial_cash=INIT_CASH, fees=FEES)
+    assert (size != 0).sum() > 20
+    assert_matches_loop(size, records, loop_size, capital_df)
+
+@pytest.mark.parametrize('direction', [1, -1])
+def test_trend_matches_pandas_loop(market, direction):
+    m = market
+    mask, exit_mask = trend_masks(market, direction)
+    size, records = simulate_trend_nb(*trend_args(market, direction), init_cash=INIT_CASH, fees=FEES,
+                                      **TREND_PARAMS[direction])
+    loop_size, capital_df = trend_loop(frame(market, mask), frame(market, exit_mask), m['close_df'], frame(market, m['atr']),
+                                       m['df_filtered'], initial_cash=INIT_CASH, fees=FEES, **TREND_PARAMS[direction])
+    assert (size != 0).sum() > 20
+    assert_matches_loop(size, records, loop_size, capital_df)
+
+def test_breakout_resume_matches_full_run(market, tmp_path, capsys):
+    m = market
+    columns = m['close_df'].columns
+    n_bars = len(m['close'])
+    expected = simulate_breakout_nb(*breakout_args(market), init_cash=INIT_CASH, fees=FEES)
+    # 先跑到最后一周之前，再追加最后一周续跑
+    simulate_breakout_resumable(*breakout_args(market, n_bars - 7*24), columns, init_cash=INIT_CASH, fees=FEES,
+                                every=500, folder=str(tmp_path))
+    size, records = simulate_breakout_resumable(*breakout_args(market), columns, init_cash=INIT_CASH, fees=FEES,
+                                                every=500, folder=str(tmp_path))
+    assert 'Resuming breakout from checkpoint' in capsys.readouterr().out
+    np.testing.assert_array_equal(size, expected[0])
+    np.testing.assert_array_equal(records, expected[1])
+
+@pytest.mark.parametrize('direction', [1, -1])
+def test_trend_resume_matches_full_run(market, tmp_path, capsys, direction):
+    m = market
+    columns = m['close_df'].columns
+    n_bars = len(m['close'])
+    params = dict(init_cash=INIT_CASH, fees=FEES, **TREND_PARAMS[direction])
+    expected = simulate_trend_nb(*trend_args(market, direction), **params)
+    simulate_trend_resumable(*trend_args(market, direction, n_bars - 7*24), m['timestamps'][:n_bars - 7*24], columns,
+                             every=500, folder=str(tmp_path), **params)
+    size, records = simulate_trend_resumable(*trend_args(market, direction), m['timestamps'], columns,
+                                             every=500, folder=str(tmp_path), **params)
+    assert 'Resuming trend' in capsys.readouterr().out
+    np.testing.assert_array_equal(size, expected[0])
+    np.testing.assert_array_equal(records, expected[1])
+
+def test_journal_run_ignores_checkpoints(market, tmp_path, capsys):
+    '''有 checkpoint 时要记 journal 也从头跑，events 和不用 checkpoint 的完整回测一样'''
+    m = market
+    index, columns = m['close_df'].index, m['close_df'].columns
+    expected_journal = Journal(1024)
+    expected = simulate_breakout_nb(*breakout_args(market), init_cash=INIT_CASH, fees=FEES, journal=expected_journal)
+    simulate_breakout_resumable(*breakout_args(market), columns, init_cash=INIT_CASH, fees=FEES, every=500,
+                                folder=str(tmp_path))
+    journal = Journal(1024)
+    size, _ = simulate_breakout_resumable(*breakout_args(market), columns, init_cash=INIT_CASH, fees=FEES, every=500,
+                                          folder=str(tmp_path), journal=journal)
+    assert 'journal was requested' in capsys.readouterr().out
+    np.testing.assert_array_equal(size, expected[0])
+    pd.testing.assert_frame_equal(journal_frame(journal, index, columns), journal_frame(expected_journal, index, columns))
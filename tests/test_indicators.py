@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.indicators import rolling_max, rolling_min
+
+def panel(n_rows=300, n_cols=5, seed=0):
+    '''随机游走价格，每列前面若干行是 NaN（币对上市前），中间也夹几个 NaN'''
+    rng = np.random.default_rng(seed)
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_rows, n_cols)), axis=0))
+    for col, lead in enumerate([0, 1, 17, 120, n_rows]):
+        values[:lead, col] = np.nan
+    values[rng.random((n_rows, n_cols)) < 0.03] = np.nan
+    return pd.DataFrame(values, index=pd.date_range('2021-01-01', periods=n_rows, freq='h', tz='UTC'))
+
+@pytest.mark.parametrize('window', [1, 2, 7, 24, 299, 300, 1000])
+@pytest.mark.parametrize('min_periods', [None, 1, 5])
+def test_rolling_extrema_match_pandas(window, min_periods):
+    df = panel()
+    # pandas 要求 min_periods <= window
+    min_periods = None if min_periods is None else min(min_periods, window)
+    rolling = df.rolling(window, min_periods=window if min_periods is None else min_periods)
+    pd.testing.assert_frame_equal(rolling_max(df, window, min_periods), rolling.max())
+    pd.testing.assert_frame_equal(rolling_min(df, window, min_periods), rolling.min())
+
+def test_rolling_extrema_incremental_matches_full():
+    '''追加新 K 线时只传最后 window - 1 行历史，结果和全量计算一样'''
+    df = panel(seed=1)
+    window = 24
+    full = rolling_max(df, window, min_periods=1)
+    new = rolling_max(df.iloc[200:], window, min_periods=1, history=df.iloc[:200])
+    pd.testing.assert_frame_equal(new, full.iloc[200:])
+
+def test_rolling_extrema_series_and_float32():
+    s = panel(seed=2)[2].astype(np.float32)
+    result = rolling_min(s, 10)
+    assert isinstance(result, pd.Series) and result.dtype == np.float32
+    np.testing.assert_array_equal(result.to_numpy(), s.rolling(10).min().to_numpy())
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.engine import simulate_trend_nb, simulate_long_short_nb
+from backtest.stats import portfolio_value, portfolio_stats
+
+INIT_CASH = 10000.0
+FEES = 0.001
+
+def long_short(market, shared_capital, weight=1.0):
+    m = market
+    return simulate_long_short_nb(m['close'], m['atr'], m['bar_day'],
+                                  m['long_exit'], m['long_mask'], m['day_ptr'], m['day_codes'],
+                                  m['short_exit'], m['short_mask'], m['day_ptr'], m['day_codes'],
+                                  long_weight=weight, short_weight=weight, shared_capital=shared_capital,
+                                  init_cash=INIT_CASH, fees=FEES)
+
+def flat_bars(*sizes):
+    '''两个持仓簿都空仓的 bar'''
+    return np.all([np.abs(np.cumsum(size, axis=0)).sum(axis=1) < 1e-9 for size in sizes], axis=0)
+
+def test_separate_long_book_matches_single_engine(market):
+    m = market
+    l_size, _, l_records, _ = long_short(market, shared_capital=False)
+    expected_size, expected_records = simulate_trend_nb(m['close'], m['atr'], m['long_exit'], m['long_mask'], m['day_ptr'],
+                                                        m['day_codes'], m['bar_day'], max_slots=10, risk_factor=0.01,
+                                                        stop_loss=0.5, direction=1, init_cash=INIT_CASH, fees=FEES)
+    np.testing.assert_array_equal(l_size, expected_size)
+    np.testing.assert_array_equal(l_records, expected_records)
+
+def test_separate_short_book_matches_its_stats(market):
+    # 分开记账时空头账户也按真实空头记：台账的现金、净值和 direction=-1 的 portfolio_value / portfolio_stats 是同一套口径
+    close = market['close']
+    _, s_size, _, s_records = long_short(market, shared_capital=False)
+    assert (s_size != 0).any()
+    price = np.nan_to_num(close)
+    flow = (s_size * price).sum(axis=1) - (np.abs(s_size) * price * FEES).sum(axis=1)
+    np.testing.assert_allclose(s_records[:, 0], INIT_CASH + np.cumsum(flow), rtol=1e-9)
+    value = portfolio_value(s_size, close, INIT_CASH, FEES, -1)
+    flat = flat_bars(s_size)
+    assert flat[-1] and (~flat).any()
+    np.testing.assert_allclose(s_records[flat, 2], value[flat], rtol=1e-9)
+    stats = portfolio_stats(s_size, close, INIT_CASH, FEES, direction=-1)
+    assert s_records[-1, 2] == pytest.approx(stats['End Value'], rel=1e-9)
+
+def test_shared_capital_books_short_cash_flows(market):
+    close = market['close']
+    l_size, s_size, records, _ = long_short(market, shared_capital=True, weight=0.5)
+    assert (l_size != 0).any() and (s_size != 0).any()
+    # 多头买入付现金、卖出收现金；空头开仓收现金、平仓付现金；手续费按每边的成交额收
+    price = np.nan_to_num(close)
+    flow = -((l_size - s_size) * price).sum(axis=1) - ((np.abs(l_size) + np.abs(s_size)) * price * FEES).sum(axis=1)
+    np.testing.assert_allclose(records[:, 0], INIT_CASH + np.cumsum(flow), rtol=1e-9)
+    # 两边都空仓时账户价值就是按市值算的组合净值，空头赚的钱要算进去
+    value = portfolio_value(l_size, close, INIT_CASH, FEES, 1) + portfolio_value(s_size, close, INIT_CASH, FEES, -1) - INIT_CASH
+    flat = flat_bars(l_size, s_size)
+    assert flat[-1] and (~flat).any()
+    np.testing.assert_allclose(records[flat, 2], value[flat], rtol=1e-9)
+
+def test_shared_capital_matches_vbt_both(market):
+    vbt = pytest.importorskip('vectorbtpro')
+    l_size, s_size, records, _ = long_short(market, shared_capital=True, weight=0.5)
+    close = market['close_df']
+    # 同一根 bar 同一个币多空都有成交时 vbt 按净额收手续费，这里的比较不适用
+    if ((l_size != 0) & (s_size != 0)).any():
+        pytest.skip('long and short books trade the same pair on the same bar')
+    pf = vbt.Portfolio.from_orders(close=close, price=close, size=pd.DataFrame(l_size - s_size, index=close.index,
+                                   columns=close.columns), size_type='amount', direction='both', cash_sharing=True,
+                                   init_cash=INIT_CASH, fees=FEES, freq='1h')
+    np.testing.assert_allclose(records[:, 0], pf.cash.to_numpy(), rtol=1e-9)
+    flat = flat_bars(l_size, s_size)
+    np.testing.assert_allclose(records[flat, 2], pf.value.to_numpy()[flat], rtol=1e-9)
+
+def test_short_stop_loss_fires_on_adverse_move():
+    # 一个币：开空后先跌（有利）再涨到均价的 1.5 倍以上（不利），stop_loss=0.5 时应该在上涨那根 bar 止损
+    close = np.array([[100.0], [80.0], [120.0], [151.0], [160.0], [170.0]])
+    atr = np.full_like(close, 10.0)
+    mask = np.zeros(close.shape, dtype=bool)
+    mask[0, 0] = True
+    exit_mask = np.zeros(close.shape, dtype=bool)
+    day_ptr = np.array([0, 1])
+    day_codes = np.array([0])
+    bar_day = np.zeros(len(close), dtype=np.int64)
+    size, _ = simulate_trend_nb(close, atr, exit_mask, mask, day_ptr, day_codes, bar_day, position_count=1,
+                                stop_loss=0.5, direction=-1, init_cash=INIT_CASH, fees=FEES)
+    assert size[0, 0] > 0
+    np.testing.assert_array_equal(np.flatnonzero(size[:, 0]), [0, 3])
+    assert size[3, 0] == -size[0, 0]
@@ -0,0 +1,46 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.montecarlo import monte_carlo_summary, trade_years, simulate
+
+def trades(entry, exit, pnl):
+    return pd.DataFrame({'entry_time': pd.to_datetime(entry, utc=True), 'exit_time': pd.to_datetime(exit, utc=True),
+                         'pnl': np.asarray(pnl, dtype=float)})
+
+def summary(trades, **kwargs):
+    # 边界情况不应该有除零或者无效值的 RuntimeWarning
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        return monte_carlo_summary(trades, init_cash=10000.0, n_sims=200, seed=0, **kwargs)
+
+def test_single_trade_has_no_cagr():
+    single = trades(['2021-01-01'], ['2021-01-01'], [500.0])
+    assert trade_years(single) == 0
+    result = summary(single)
+    assert result.loc['Total Return [%]', 'Actual'] == pytest.approx(5.0)
+    assert np.isnan(result.loc['CAGR [%]', 'Actual'])
+    assert result.loc['CAGR [%]', ['Mean', '50%']].isna().all()
+
+def test_trades_at_the_same_time_have_no_cagr():
+    same = trades(['2021-01-01'] * 3, ['2021-01-02'] * 3, [100.0, -50.0, 200.0])
+    assert trade_years(same) > 0
+    same['entry_time'] = same['exit_time']
+    assert trade_years(same) == 0
+    assert np.isnan(summary(same).loc['CAGR [%]', 'Actual'])
+
+def test_loss_beyond_capital_is_minus_100_percent():
+    bust = trades(['2021-01-01', '2021-06-01', '2021-09-01'], ['2021-02-01', '2021-07-01', '2022-01-01'],
+                  [1000.0, -15000.0, 300.0])
+    result = summary(bust)
+    assert result.loc['Total Return [%]', 'Actual'] == pytest.approx(-100.0)
+    assert result.loc['CAGR [%]', 'Actual'] == pytest.approx(-100.0)
+    assert result.loc['Max Drawdown [%]', 'Actual'] == pytest.approx(100.0)
+    assert not result.drop('Loss Probability [%]').isna().any().any()
+
+def test_shuffle_keeps_total_return():
+    returns = np.array([0.1, -0.05, 0.02, -0.2, 0.3])
+    sims = simulate(returns, years=1.0, n_sims=50, method='shuffle', seed=0)
+    np.testing.assert_allclose(sims['Total Return [%]'], (np.prod(1 + returns) - 1) * 100)
+    np.testing.assert_allclose(sims['CAGR [%]'], sims['Total Return [%]'])
+    assert (sims['Max Drawdown [%]'] >= 20 - 1e-9).all()
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.artifacts import RunArtifacts
+from backtest.profiling import Profiler, read_profile, profile_history, reset_peak_rss
+
+BIG_MB = 200
+
+def profile_two_stages():
+    profiler = Profiler('trend')
+    profiler.meta.update(pairs=2)
+    profiler.stage('allocate')
+    block = np.ones(BIG_MB * 1024 * 1024 // 8) # 写满每一页，真正占用 RSS
+    del block
+    with profiler.stage('small'):
+        np.ones(1024).sum()
+    return profiler.finish()
+
+def test_stage_peak_rss_is_reset():
+    if not reset_peak_rss():
+        pytest.skip('/proc/self/clear_refs is not writable, peak RSS is per process')
+    profiler = profile_two_stages()
+    table = profiler.table().set_index('stage')
+    assert list(table.index) == ['allocate', 'small']
+    assert all(record['peak_rss_is_stage'] for record in profiler.stages)
+    # 第一个阶段的峰值包含那块大数组，第二个阶段重置过，峰值回到释放之后的 RSS
+    assert table.loc['allocate', 'peak_rss_mb'] - table.loc['allocate', 'rss_start_mb'] > BIG_MB * 0.9
+    assert table.loc['small', 'peak_rss_mb'] < table.loc['allocate', 'peak_rss_mb'] - BIG_MB * 0.9
+    assert profiler.peak_rss == table['peak_rss_mb'].max()
+
+def test_profile_json_round_trip(tmp_path):
+    folder = str(tmp_path)
+    profiler = profile_two_stages()
+    run = RunArtifacts('trend', {}, folder=folder)
+    path = profiler.write(run.path)
+    profile = read_profile(run.path)
+    assert read_profile(path) == profile
+    assert profile['name'] == 'trend' and profile['meta'] == {'pairs': 2}
+    assert profile['wall_s'] == pytest.approx(profiler.wall_total)
+
+    # 没有 manifest 的 run（比如只写了 profile 的基准测试）用 profile 里的名字当策略
+    other = tmp_path / 'bench_run'
+    other.mkdir()
+    Profiler('bench_trend').stage('only').finish().write(str(other))
+
+    history = profile_history(folder)
+    assert len(history) == 3
+    assert set(history['strategy']) == {'trend', 'bench_trend'}
+    stages = history[history['run_id'] == run.run_id].drop(columns=['run_id', 'strategy', 'started'])
+    expected = pd.DataFrame(profiler.stages)
+    pd.testing.assert_frame_equal(stages.reset_index(drop=True), expected[stages.columns])
+    assert len(profile_history(folder, strategy='trend')) == 2
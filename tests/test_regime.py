@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.align import DailyToHourly
+from backtest.regime import btc_regime, BtcRegime
+
+def expected_regime(btc_close_1d, window):
+    ma = btc_close_1d.rolling(window).mean()
+    return ma < btc_close_1d, ma > btc_close_1d
+
+@pytest.fixture
+def btc_close_1d():
+    rng = np.random.default_rng(5)
+    index = pd.date_range('2021-01-01', periods=300, freq='D', tz='UTC')
+    return pd.Series(30000 * np.exp(np.cumsum(rng.normal(0, 0.03, len(index)))), index=index, name='BTC_USDT')
+
+def assert_regime(result, btc_close_1d, window):
+    for got, want in zip(result, expected_regime(btc_close_1d, window)):
+        pd.testing.assert_series_equal(got, want)
+
+def test_cache_hit_for_the_same_snapshot(btc_close_1d):
+    first = btc_regime(btc_close_1d, 50)
+    # 内容相同的另一个 Series 也命中缓存
+    assert btc_regime(btc_close_1d.copy(), 50) is first
+
+def test_cache_does_not_return_stale_series(btc_close_1d):
+    btc_regime(btc_close_1d, 50)
+    # 不同的数据范围
+    for close in [btc_close_1d.iloc[:200], btc_close_1d.iloc[100:]]:
+        assert_regime(btc_regime(close, 50), close, 50)
+    # 同一范围、不同的 MA 长度
+    assert_regime(btc_regime(btc_close_1d, 20), btc_close_1d, 20)
+    # 同一范围、数据更新（最后一根日线的收盘价变了）
+    updated = btc_close_1d.copy()
+    updated.iloc[-1] = updated.iloc[-2] * 2
+    assert_regime(btc_regime(updated, 50), updated, 50)
+    assert_regime(btc_regime(btc_close_1d, 50), btc_close_1d, 50)
+
+def test_btc_regime_hourly_per_window(btc_close_1d):
+    close = btc_close_1d.iloc[:120]
+    hourly_index = pd.date_range(close.index[0], close.index[-1] + pd.Timedelta(hours=23), freq='h')
+    to_hourly = DailyToHourly(hourly_index, close.index)
+    regime = BtcRegime(close, to_hourly)
+    for window in [50, 20]:
+        bull, bear = expected_regime(close, window)
+        pd.testing.assert_series_equal(regime.bull(window), to_hourly(bull))
+        pd.testing.assert_series_equal(regime.bear(window), to_hourly(bear))
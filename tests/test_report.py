@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.report import performance_metrics, benchmark_metrics, monthly_returns, monthly_returns_md
+
+DATES = pd.date_range('2021-01-30', periods=4, freq='D')
+RETURNS = pd.Series([0.1, -0.2, 0.05, 0.0], index=DATES, name='Strategy')
+
+def test_performance_metrics_by_hand():
+    metrics = performance_metrics(RETURNS)['Strategy']
+    # 净值 1.1 → 0.88 → 0.924 → 0.924
+    assert metrics['Total Return [%]'] == pytest.approx(-7.6)
+    assert metrics['CAGR [%]'] == pytest.approx((0.924 ** (365 / 4) - 1) * 100)
+    # 均值 -0.0125，离差平方和 0.051875
+    assert metrics['Sharpe Ratio'] == pytest.approx(-0.0125 / np.sqrt(0.051875 / 3) * np.sqrt(365))
+    assert metrics['Max Drawdown [%]'] == pytest.approx((0.88 / 1.1 - 1) * 100)
+    assert metrics['Longest Drawdown [days]'] == 3
+
+def test_hourly_returns_compound_to_daily():
+    hourly = pd.Series(0.0, index=pd.date_range('2021-01-30', periods=4 * 24, freq='h'))
+    hourly[hourly.index.hour == 12] = RETURNS.to_numpy()
+    hourly[hourly.index == '2021-01-30 18:00'] = -0.5
+    daily = performance_metrics(hourly.rename('Strategy'))['Strategy']
+    assert daily['Total Return [%]'] == pytest.approx((1.1 * 0.5 * 0.8 * 1.05 - 1) * 100)
+
+def test_monthly_table_by_hand():
+    monthly = monthly_returns(RETURNS)
+    assert monthly.loc[2021, 'Jan'] == pytest.approx(1.1 * 0.8 - 1)
+    assert monthly.loc[2021, 'Feb'] == pytest.approx(0.05)
+    assert monthly.loc[2021, 'Year'] == pytest.approx(-0.076)
+    assert monthly.loc[2021, ['Mar', 'Dec']].isna().all()
+    assert monthly_returns_md(RETURNS) == '2021-01: -12.00%\n2021-02: 5.00%\n'
+
+def test_benchmark_metrics_use_common_days():
+    # BTC 缺 2021-02-01 这一天，不能当成 0% 收益
+    benchmark = pd.Series([0.05, np.nan, 0.02, -0.01], index=DATES)
+    metrics = benchmark_metrics(RETURNS, benchmark)['Strategy']
+    r = np.array([0.1, 0.05, 0.0])
+    b = np.array([0.05, 0.02, -0.01])
+    cov = np.cov(r, b, ddof=1)[0, 1]
+    assert metrics['Beta'] == pytest.approx(cov / b.var(ddof=1))
+    assert metrics['Correlation'] == pytest.approx(np.corrcoef(r, b)[0, 1])
+    assert metrics['Alpha (ann.) [%]'] == pytest.approx((r.mean() - cov / b.var(ddof=1) * b.mean()) * 365 * 100)
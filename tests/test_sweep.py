@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from multiprocessing import shared_memory
+from backtest.sweep import SharedPanels, run_tasks, run_sweep, param_grid
+from backtest.engine import simulate_breakout_nb
+from backtest.stats import portfolio_stats
+
+# worker 用 spawn 启动，task 必须是模块顶层函数，子进程按模块名重新导入
+
+BREAKOUT_PANELS = ['close', 'breakdown', 'bear', 'breakout_mask', 'day_ptr', 'day_codes', 'bar_day', 'timestamps']
+
+def echo_task(panels, name):
+    '''把 worker 里映射到的数组原样返回（会 pickle 回主进程）'''
+    return panels[name].copy()
+
+def breakout_task(panels, max_slots, hold_days):
+    p = panels
+    size, _ = simulate_breakout_nb(p['close'], p['breakdown'], p['bear'], p['breakout_mask'], p['day_ptr'], p['day_codes'],
+                                   p['bar_day'], p['timestamps'], max_slots=max_slots, hold_days=hold_days)
+    return portfolio_stats(size, p['close'])
+
+def test_shared_panels_round_trip_and_unlink():
+    arrays = {
+        'f64': np.random.default_rng(0).normal(size=(50, 7)),
+        'f32_fortran': np.asfortranarray(np.arange(60, dtype=np.float32).reshape(6, 10)),
+        'flags': np.arange(40) % 3 == 0,
+        'codes': np.arange(12, dtype=np.int64),
+        'empty': np.empty((0, 4)),
+    }
+    with SharedPanels(arrays) as shared:
+        names = [block_name for block_name, _, _ in shared.spec.values()]
+        results = run_tasks(echo_task, [{'name': name} for name in arrays], shared, max_workers=2)
+    assert [params['name'] for params, _ in results] == list(arrays)
+    for params, result in results:
+        expected = arrays[params['name']]
+        assert result.dtype == expected.dtype and result.shape == expected.shape
+        np.testing.assert_array_equal(result, expected)
+    # 退出 with 之后共享内存已经 unlink，再按名字打开会失败
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+def test_sweep_matches_sequential_runs(market):
+    arrays = {name: market[name] for name in BREAKOUT_PANELS}
+    grid = param_grid(max_slots=[5, 10], hold_days=[2])
+    result = run_sweep(breakout_task, grid, arrays, max_workers=2)
+    expected = pd.DataFrame([{**params, **dict(breakout_task(arrays, **params))} for params in grid])
+    assert result['Total Orders'].gt(0).all()
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,89 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from backtest.synthetic import write_synthetic_market
+from backtest.store import open_store, store_path
+from backtest.universe import UNIVERSE_DIR, pair_filter, default_rules, select_top_n, legacy_bar_range
+from reference import pair_filter_apply
+
+# 币对数要超过 32，change_date 之后固定选前 32 个的规则才真正起作用
+N_PAIRS = 48
+WINDOW = 11
+BLACKLIST = ['SYN0003_USDT']
+
+@pytest.fixture(scope='module')
+def daily_market(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('universe'))
+    folder_1d, _, start_date, end_date = write_synthetic_market(root, N_PAIRS, 1.0, seed=2)
+    change_date = start_date + (end_date - start_date) / 2
+    return folder_1d, start_date, end_date, change_date
+
+def test_pair_filter_matches_row_apply(daily_market):
+    folder_1d, start_date, end_date, change_date = daily_market
+    expected = pair_filter_apply(folder_1d, start_date, end_date, WINDOW, BLACKLIST, change_date).reset_index(drop=True)
+    result = pair_filter(folder_1d, start_date, end_date, window=WINDOW, blacklist=BLACKLIST,
+                         rules=default_rules(change_date), cache=False)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    assert result['date'].dt.unit == 'ns'
+    # change_date 之前是前 20%，之后是前 32 个，而且之后确实有超过 32 个币对可选
+    per_day = result.groupby('date').size()
+    before, after = per_day[per_day.index <= change_date], per_day[per_day.index > change_date]
+    assert len(before) > 0 and before.max() < 32
+    # 黑名单在选完前 32 个之后才去掉，所以有的日子只剩 31 个
+    assert 31 <= after.max() <= 32
+
+def test_select_top_n_is_faster_than_row_apply(daily_market):
+    folder_1d, start_date, end_date, change_date = daily_market
+    df = open_store(folder_1d).read_long(start=start_date, end=end_date)
+    df['rank'] = df.groupby('date')['volume'].rank('dense', ascending=False)
+    df['coin_count'] = df.groupby('date')['coin_pair'].transform('count')
+
+    def select_row(row):
+        if row['date'] <= change_date:
+            return row['rank'] <= row['coin_count'] * 0.2
+        return row['rank'] <= 32
+
+    def best_of(func, repeat=3):
+        times = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            out = func()
+            times.append(time.perf_counter() - t)
+        return min(times), np.asarray(out, dtype=bool)
+
+    apply_time, expected = best_of(lambda: df.apply(select_row, axis=1))
+    vector_time, result = best_of(lambda: select_top_n(df['date'], df['rank'].values, df['coin_count'].values,
+                                                        default_rules(change_date)))
+    np.testing.assert_array_equal(result, expected)
+    assert apply_time / vector_time >= 50
+
+def test_legacy_bar_range_drops_the_row_the_old_slice_dropped():
+    index = pd.date_range('2021-01-01', periods=72, freq='h', tz='UTC')
+    inside = pd.DataFrame({'date': index[::24], 'coin_pair': 'SYN0001_USDT', 'rank': 1.0})
+    # 日期都在索引里：原来的 [:-1] 删掉最后一根真实的 bar
+    assert legacy_bar_range(inside, index).equals(index[:-1])
+    # 最后一天不在索引里：.at 追加的那一行被删掉，小时索引不变
+    beyond = pd.concat([inside, pd.DataFrame({'date': [index[-1].normalize() + pd.Timedelta(days=1)],
+                                              'coin_pair': 'SYN0001_USDT', 'rank': 1.0})])
+    assert legacy_bar_range(beyond, index).equals(index)
+
+def test_cache_evicts_only_the_same_parameters(tmp_path):
+    folder_1d, _, start_date, end_date = write_synthetic_market(str(tmp_path), 8, 0.5, seed=3)
+    change_date = start_date + (end_date - start_date) / 2
+    ranges = [(start_date, end_date), (change_date, end_date)]
+    for start, end in ranges:
+        pair_filter(folder_1d, start, end, window=WINDOW, blacklist=[], rules=default_rules(change_date))
+    cache_folder = os.path.join(store_path(folder_1d), UNIVERSE_DIR)
+    before = set(os.listdir(cache_folder))
+    # 第二个日期范围不会把第一个的缓存删掉
+    assert len(before) == 2
+
+    # 数据更新后重算第一个范围：只替换它自己的旧缓存，第二个范围的缓存还在
+    filename = sorted(f for f in os.listdir(folder_1d) if f.endswith('.feather'))[0]
+    os.utime(os.path.join(folder_1d, filename), ns=(0, 0))
+    result = pair_filter(folder_1d, *ranges[0], window=WINDOW, blacklist=[], rules=default_rules(change_date))
+    after = set(os.listdir(cache_folder))
+    assert len(after) == 2 and len(after & before) == 1
+    assert (result['date'] >= ranges[0][0]).all() and (result['date'] <= ranges[0][1]).all()
@@ -0,0 +1,21 @@
+import pandas as pd
+import pytest
+from backtest.walkforward import walk_forward_folds, walk_forward
+
+TIMESTAMPS = pd.date_range('2021-01-01', periods=24 * 400, freq='h', tz='UTC')
+
+def test_folds_tile_out_of_sample():
+    folds = walk_forward_folds(TIMESTAMPS, pd.Timedelta(days=100), pd.Timedelta(days=30))
+    assert len(folds) == 10
+    for prev, fold in zip(folds, folds[1:]):
+        assert fold['test_start'] == prev['test_end']
+
+def test_overlapping_step_is_rejected():
+    with pytest.raises(ValueError):
+        walk_forward_folds(TIMESTAMPS, pd.Timedelta(days=100), pd.Timedelta(days=30), step=pd.Timedelta(days=10))
+
+def test_overlapping_folds_are_rejected():
+    folds = [{'fold': 0, 'train_start': 0, 'train_end': 100, 'test_start': 100, 'test_end': 200},
+             {'fold': 1, 'train_start': 50, 'train_end': 150, 'test_start': 150, 'test_end': 250}]
+    with pytest.raises(ValueError):
+        walk_forward(None, [{}], {}, folds, TIMESTAMPS)